@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+
+# Measures the overhead of authenticating API requests with a token,
+# with DRF's TokenAuthentication and with chisubmit's
+# CachingTokenAuthentication: both the cost of authenticating a request
+# on its own, and the total time of a full request to a cheap endpoint
+# (GET /user/), along with the number of queries each one needs. The
+# test database is created with whatever backend is configured in the
+# settings (SQLite by default).
+#
+# Usage: python3 benchmarks/bench_auth.py [--requests N] [--tokens T]
+
+from __future__ import print_function
+import click
+import os
+import random
+import timeit
+from unittest import mock
+
+import django
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chisubmit.backend.settings")
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
+
+from chisubmit.backend.api.authentication import CachingTokenAuthentication,\
+    get_token_cache
+from chisubmit.backend.api.views import AuthUserDetail
+
+AUTHENTICATION_CLASSES = [("TokenAuthentication", TokenAuthentication),
+                          ("CachingTokenAuthentication", CachingTokenAuthentication)]
+
+def create_tokens(ntokens):
+    User.objects.bulk_create([User(username = "user%05i" % i) for i in range(ntokens)])
+    users = User.objects.filter(username__startswith = "user")
+    Token.objects.bulk_create([Token(user = u, key = Token.generate_key()) for u in users])
+    return list(Token.objects.values_list("key", flat=True))
+
+def bench_authenticate(auth_class, keys, nrequests):
+    authenticator = auth_class()
+    factory = APIRequestFactory()
+    requests = [factory.get("/", HTTP_AUTHORIZATION = "Token " + random.choice(keys)) for _ in range(nrequests)]
+
+    def authenticate():
+        for request in requests:
+            authenticator.authenticate(request)
+
+    with CaptureQueriesContext(connection) as queries:
+        authenticate()
+    nqueries = len(queries.captured_queries)
+    t = min(timeit.repeat(authenticate, number = 1, repeat = 3)) / nrequests
+
+    return t, nqueries / nrequests
+
+def bench_requests(auth_class, keys, nrequests):
+    client = APIClient()
+    url = reverse("auth-user-detail")
+    tokens = [random.choice(keys) for _ in range(nrequests)]
+
+    def get_users():
+        for key in tokens:
+            response = client.get(url, HTTP_AUTHORIZATION = "Token " + key)
+            assert response.status_code == 200, response.status_code
+
+    # The views' authentication classes are set when they are defined
+    with mock.patch.object(AuthUserDetail, "authentication_classes", (auth_class,)):
+        with CaptureQueriesContext(connection) as queries:
+            get_users()
+        # Each request resets the connection's query log
+        nqueries = len(queries.captured_queries)
+        t = min(timeit.repeat(get_users, number = 1, repeat = 3)) / nrequests
+
+    return t, nqueries / nrequests
+
+@click.command()
+@click.option("--requests", "nrequests", type=int, default=2000)
+@click.option("--tokens", "ntokens", type=int, default=20)
+def bench_auth(nrequests, ntokens):
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+
+    try:
+        keys = create_tokens(ntokens)
+
+        print("%i requests using %i different tokens" % (nrequests, ntokens))
+        print()
+        print("%-28s %18s %18s %18s %18s" % ("", "Auth (us/req)", "Auth queries/req",
+                                             "Request (us/req)", "Request queries/req"))
+        for name, auth_class in AUTHENTICATION_CLASSES:
+            # Start each run with a cold cache
+            get_token_cache().clear()
+            t_auth, q_auth = bench_authenticate(auth_class, keys, nrequests)
+            get_token_cache().clear()
+            t_request, q_request = bench_requests(auth_class, keys, nrequests)
+            print("%-28s %18.1f %18.3f %18.1f %18.3f" % (name, t_auth * 1e6, q_auth, t_request * 1e6, q_request))
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+
+if __name__ == "__main__":
+    bench_auth()
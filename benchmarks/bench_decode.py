@@ -0,0 +1,237 @@
+#!/usr/bin/python3
+
+# Measures how fast the client library turns an API response into
+# ChisubmitAPIObjects, with the attribute decoders compiled once per
+# class/type (chisubmit.client.types) and with the previous
+# implementation, which dispatched on the attribute type (and parsed
+# timestamps with strptime) for every attribute of every object. The
+# response is a real GET /courses/:course/teams/ response, with the
+# students and the assignments (with their grades) of every team, for
+# a synthetic course created in a test database. All the related
+# objects are decoded (see bench_memory.py for the effect of decoding
+# them only when they are accessed).
+#
+# Usage: python3 benchmarks/bench_decode.py [--students N] [--assignments A]
+#                                           [--rubric-components R] [--repeat R]
+
+from __future__ import print_function
+import click
+import datetime
+import json
+import timeit
+from unittest import mock
+
+import pytz
+from six import string_types
+
+# Also sets up Django
+from bench_queries import create_course, COURSE_ID
+
+from django.test.runner import DiscoverRunner
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from chisubmit.client.team import Team
+from chisubmit.client.types import ChisubmitAPIObject, AttributeType,\
+    AttributeTypeException, NoSuchAttributeException,\
+    UnexpectedRelationshipURLException
+from chisubmit.common.utils import parse_timedelta
+
+
+class BenchmarkAPIClient(object):
+    _deferred_save = False
+    _keep_raw_data = True
+
+
+# The implementation before the decoders were compiled
+
+def legacy_to_python(self, value, headers, api_client):
+    if self.attrtype == AttributeType.STRING:
+        if not isinstance(value, string_types):
+            raise AttributeTypeException(value, self)
+        return value
+    elif self.attrtype == AttributeType.INTEGER:
+        if not isinstance(value, (int, int)):
+            raise AttributeTypeException(value, self)
+        return value
+    elif self.attrtype == AttributeType.DECIMAL:
+        try:
+            return float(value)
+        except ValueError:
+            raise AttributeTypeException(value, self)
+    elif self.attrtype == AttributeType.BOOLEAN:
+        if not isinstance(value, bool):
+            raise AttributeTypeException(value, self)
+        return value
+    elif self.attrtype == AttributeType.DATETIME:
+        if not isinstance(value, string_types):
+            raise AttributeTypeException(value, self)
+        try:
+            if value[19] == ".":
+                dt = datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ")
+            else:
+                dt = datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+            dt = pytz.utc.localize(dt)
+        except ValueError as ve:
+            raise AttributeTypeException(value, self)
+        return dt
+    elif self.attrtype == AttributeType.TIMEDELTA:
+        if not isinstance(value, string_types):
+            raise AttributeTypeException(value, self)
+        try:
+            return parse_timedelta(value)
+        except ValueError as ve:
+            raise AttributeTypeException(value, self)
+    elif self.attrtype == AttributeType.LIST:
+        if not isinstance(value, (list, tuple)):
+            raise AttributeTypeException(value, self)
+        rvalue = []
+        for item in value:
+            rvalue.append(self.subtype.to_python(item, headers, api_client))
+        return rvalue
+    elif self.attrtype == AttributeType.DICT:
+        if not isinstance(value, dict):
+            raise AttributeTypeException(value, self)
+        rvalue = {}
+        for k, item in list(value.items()):
+            rvalue[k] = self.subtype.to_python(item, headers, api_client)
+        return rvalue
+    elif self.attrtype == AttributeType.OBJECT:
+        if not isinstance(value, dict):
+            raise AttributeTypeException(value, self)
+        return self.subtype(api_client, headers, value)
+
+    raise AttributeTypeException(value, self)
+
+def legacy_init(self, api_client, headers, attributes):
+    self._api_client = api_client
+    self._headers = headers
+    self._rawData = attributes
+    if self._api_client._deferred_save:
+        self.dirty = {api_attr: False for api_attr in self._api_attributes}
+    self._initAttributes()
+    self._updateAttributes(attributes)
+
+def legacy_is_relationship_attr(self, attrname):
+    if attrname.endswith("_url"):
+        rel_name = attrname[:-4]
+    else:
+        rel_name = attrname
+    return rel_name in self._api_relationships
+
+def legacy_update_attributes(self, attributes):
+    for attrname, attrvalue in list(attributes.items()):
+        if attrname == "url":
+            object.__setattr__(self, attrname, attrvalue)
+        elif legacy_is_relationship_attr(self, attrname):
+            if attrname.endswith("_url"):
+                object.__setattr__(self, attrname, attrvalue)
+            else:
+                rel = self._api_relationships[attrname]
+                rel_values = [rel.reltype.to_python(elem, self._headers, self._api_client) for elem in attrvalue]
+                setattr(self, "_rel_" + attrname, rel_values)
+        else:
+            if attrname.endswith("_url"):
+                raise UnexpectedRelationshipURLException(attrname, attrvalue)
+            api_attr = self._api_attributes.get(attrname)
+            if api_attr is None:
+                raise NoSuchAttributeException(attrname, attrvalue)
+            else:
+                if attrvalue is None:
+                    checked_value = None
+                else:
+                    checked_value = api_attr.to_python(attrvalue, self._headers, self._api_client)
+                object.__setattr__(self, attrname, checked_value)
+
+
+def get_teams_content(instructor):
+    client = APIClient()
+    client.force_authenticate(user = instructor)
+    url = reverse("team-list", args=[COURSE_ID])
+    response = client.get(url, {"include": ["students", "assignments", "assignments__grades"]})
+    assert response.status_code == 200
+    return response.content
+
+def get_teams_response(instructor):
+    return json.loads(get_teams_content(instructor).decode("utf-8"))
+
+def hydrate(obj):
+    # Decodes all the related objects (which are otherwise only
+    # decoded when they are first accessed)
+    for name in obj._api_relationships:
+        for related in getattr(obj, "_rel_" + name, []):
+            hydrate(related)
+
+def decode(data, lazy = False, keep_raw_data = True):
+    api_client = BenchmarkAPIClient()
+    api_client._keep_raw_data = keep_raw_data
+    teams = [Team(api_client, {}, team) for team in data]
+    if not lazy:
+        for team in teams:
+            hydrate(team)
+    return teams
+
+def decode_legacy(data):
+    with mock.patch.object(AttributeType, "to_python", legacy_to_python), \
+         mock.patch.object(ChisubmitAPIObject, "__init__", legacy_init), \
+         mock.patch.object(ChisubmitAPIObject, "_updateAttributes", legacy_update_attributes):
+        return decode(data)
+
+def count_objects(data):
+    count = [0]
+    init = ChisubmitAPIObject.__init__
+    def counting_init(self, *args, **kwargs):
+        count[0] += 1
+        init(self, *args, **kwargs)
+    with mock.patch.object(ChisubmitAPIObject, "__init__", counting_init):
+        decode(data)
+    return count[0]
+
+def check_same(teams, legacy_teams):
+    def dump(obj):
+        if isinstance(obj, ChisubmitAPIObject):
+            names = ["url"] + list(obj._api_attributes) + \
+                    [name + "_url" for name in obj._api_relationships] + \
+                    ["_rel_" + name for name in obj._api_relationships]
+            return dict([(name, dump(getattr(obj, name))) for name in names if hasattr(obj, name)])
+        elif isinstance(obj, list):
+            return [dump(v) for v in obj]
+        elif isinstance(obj, dict):
+            return dict([(k, dump(v)) for k, v in obj.items()])
+        else:
+            return obj
+
+    assert dump(teams) == dump(legacy_teams)
+
+@click.command()
+@click.option("--students", type=int, default=1200)
+@click.option("--assignments", type=int, default=4)
+@click.option("--rubric-components", type=int, default=4)
+@click.option("--repeat", "-r", type=int, default=5)
+def bench_decode(students, assignments, rubric_components, repeat):
+    runner = DiscoverRunner(verbosity=0)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+
+    try:
+        print("Creating course with %i students, %i teams, %i assignments, %i rubric components per assignment..."
+              % (students, students // 2, assignments, rubric_components))
+        _, instructor = create_course(students, assignments, rubric_components)
+        data = get_teams_response(instructor)
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+
+    check_same(decode(data), decode_legacy(data))
+    nobjects = count_objects(data)
+
+    print("%i teams, %i objects (best of %i)" % (len(data), nobjects, repeat))
+    results = []
+    for name, f in (("Before", decode_legacy), ("After", decode)):
+        t = min(timeit.repeat(lambda: f(data), number=1, repeat=repeat))
+        results.append(t)
+        print("  %-8s %8.2f ms %10i objects/s" % (name, t * 1000, nobjects / t))
+    print("  speedup  %8.1fx" % (results[0] / results[1]))
+
+if __name__ == "__main__":
+    bench_decode()
@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+
+# Measures the objects and the memory that the client library allocates
+# when decoding a GET /courses/:course/teams/ response (with the
+# students and the assignments, with their grades, of every team) for
+# a synthetic course, depending on how much of the response is actually
+# used. Related objects (e.g., a team's registrations, or a
+# registration's grades) are only decoded when they are first accessed,
+# so a command that only reads the teams doesn't pay for the rest.
+# Decoding everything is what every command paid before.
+#
+# The memory is what is still allocated once the response (parsed
+# into JSON) is no longer referenced, with and without keeping the
+# JSON of each object around (in _rawData). The defaults are a course
+# with 5,000 registrations.
+#
+# Usage: python3 benchmarks/bench_memory.py [--students N] [--assignments A]
+#                                           [--rubric-components R]
+
+from __future__ import print_function
+import click
+import gc
+import json
+import timeit
+import tracemalloc
+from unittest import mock
+
+# Also sets up Django
+from bench_queries import create_course
+from bench_decode import get_teams_content, decode, hydrate
+
+from django.test.runner import DiscoverRunner
+
+from chisubmit.client.types import ChisubmitAPIObject
+
+
+def read_team_ids(teams):
+    return [team.team_id for team in teams]
+
+def read_team_members(teams):
+    return [[tm.student.user.username for tm in team._rel_students] for team in teams]
+
+def read_assignment_grades(teams):
+    # The grades of a single assignment
+    grades = []
+    for team in teams:
+        for registration in team._rel_assignments:
+            if registration.assignment_id == "pa00":
+                grades += [grade.points for grade in registration._rel_grades]
+    return grades
+
+def read_everything(teams):
+    for team in teams:
+        hydrate(team)
+
+SCENARIOS = [("Team ids", read_team_ids),
+             ("Team members", read_team_members),
+             ("One assignment's grades", read_assignment_grades),
+             ("Everything (as before)", read_everything)]
+
+def measure(content, read, keep_raw_data):
+    count = [0]
+    init = ChisubmitAPIObject.__init__
+    def counting_init(self, *args, **kwargs):
+        count[0] += 1
+        init(self, *args, **kwargs)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with mock.patch.object(ChisubmitAPIObject, "__init__", counting_init):
+            data = json.loads(content)
+            teams = decode(data, lazy = True, keep_raw_data = keep_raw_data)
+            read(teams)
+            del data
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    del teams
+    data = json.loads(content)
+    t = min(timeit.repeat(lambda: read(decode(data, lazy = True, keep_raw_data = keep_raw_data)), number=1, repeat=3))
+
+    return count[0], current, peak, t
+
+@click.command()
+@click.option("--students", type=int, default=2500)
+@click.option("--assignments", type=int, default=4)
+@click.option("--rubric-components", type=int, default=4)
+def bench_memory(students, assignments, rubric_components):
+    runner = DiscoverRunner(verbosity=0)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+
+    try:
+        print("Creating course with %i students, %i teams, %i assignments, %i rubric components per assignment..."
+              % (students, students // 2, assignments, rubric_components))
+        _, instructor = create_course(students, assignments, rubric_components)
+        content = get_teams_content(instructor).decode("utf-8")
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+
+    print("%i registrations, %.2f MB response" % ((students // 2) * assignments, len(content) / 1e6))
+    for keep_raw_data in (True, False):
+        print()
+        print("With _rawData" if keep_raw_data else "Without _rawData")
+        print("%-26s %10s %12s %12s %10s" % ("Reading", "Objects", "Memory (MB)", "Peak (MB)", "Time (ms)"))
+        for name, read in SCENARIOS:
+            nobjects, current, peak, t = measure(content, read, keep_raw_data)
+            print("%-26s %10i %12.2f %12.2f %10.2f" % (name, nobjects, current / 1e6, peak / 1e6, t * 1000))
+
+if __name__ == "__main__":
+    bench_memory()
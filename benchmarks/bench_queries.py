@@ -0,0 +1,219 @@
+#!/usr/bin/python3
+
+# Loads a synthetic large course into a test database, and reports the
+# query plans and timings of the lookup helpers in
+# chisubmit.backend.api.helpers, both without and with the indexes added
+# in migration 0010. The test database is created with whatever backend
+# is configured in the settings (SQLite by default).
+#
+# Usage: python3 benchmarks/bench_queries.py [--students N] [--assignments A]
+#                                            [--rubric-components R]
+#                                            [--repeat N] [--no-plans]
+
+from __future__ import print_function
+import click
+import os
+import timeit
+from datetime import timedelta
+
+import django
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chisubmit.backend.settings")
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from chisubmit.backend.api.models import Course, Instructor, Student, Team,\
+    TeamMember, Assignment, RubricComponent, Registration, Submission, Grade,\
+    CourseRoles
+from chisubmit.backend.api.helpers import get_course, get_course_person,\
+    get_assignment, get_rubric_component, get_team, get_team_member,\
+    get_registration, get_submission, get_grade, prefetch_teams
+from chisubmit.common.utils import get_datetime_now_utc
+
+COURSE_ID = "cmsc99999"
+
+# The models with the indexes added in migration 0010
+INDEXED_MODELS = [Registration, TeamMember]
+
+def create_course(nstudents, nassignments, nrubric_components):
+    now = get_datetime_now_utc()
+
+    course = Course.objects.create(course_id = COURSE_ID, name = "Benchmark course")
+    instructor = User.objects.create(username = "instructor")
+    Instructor.objects.create(course = course, user = instructor)
+
+    User.objects.bulk_create([User(username = "student%05i" % i) for i in range(nstudents)])
+    users = User.objects.filter(username__startswith = "student").order_by("username")
+    Student.objects.bulk_create([Student(course = course, user = u) for u in users])
+    students = list(Student.objects.filter(course = course).order_by("user__username"))
+
+    # Teams of two students
+    Team.objects.bulk_create([Team(course = course, team_id = "team%05i" % i) for i in range(nstudents // 2)])
+    teams = list(Team.objects.filter(course = course).order_by("team_id"))
+    TeamMember.objects.bulk_create([TeamMember(team = team, student = students[2*i + j], confirmed = True)
+                                    for i, team in enumerate(teams) for j in range(2)])
+
+    Assignment.objects.bulk_create([Assignment(course = course, assignment_id = "pa%02i" % i,
+                                               name = "Assignment %i" % i,
+                                               deadline = now + timedelta(days = i))
+                                    for i in range(nassignments)])
+    assignments = list(Assignment.objects.filter(course = course))
+    RubricComponent.objects.bulk_create([RubricComponent(assignment = a, order = i,
+                                                         description = "Component %i" % i, points = 10)
+                                         for a in assignments for i in range(nrubric_components)])
+
+    Registration.objects.bulk_create([Registration(team = t, assignment = a) for t in teams for a in assignments])
+    registrations = list(Registration.objects.filter(assignment__course = course))
+
+    Submission.objects.bulk_create([Submission(registration = r, extensions_used = 0, commit_sha = "0" * 40)
+                                    for r in registrations])
+    final_submissions = dict(Submission.objects.filter(registration__assignment__course = course)
+                                               .values_list("registration_id", "pk"))
+    for r in registrations:
+        r.final_submission_id = final_submissions[r.pk]
+    Registration.objects.bulk_update(registrations, ["final_submission"], batch_size = 500)
+
+    rubric_components = {}
+    for rc in RubricComponent.objects.filter(assignment__course = course):
+        rubric_components.setdefault(rc.assignment_id, []).append(rc)
+    Grade.objects.bulk_create([Grade(registration = r, rubric_component = rc, points = 5)
+                               for r in registrations for rc in rubric_components[r.assignment_id]],
+                              batch_size = 500)
+
+    return course, instructor
+
+def get_lookups(course, instructor, nstudents, nassignments):
+    # Look up objects in the middle of the course, so they're
+    # not trivially at the start of a table or an index
+    roles = set([CourseRoles.INSTRUCTOR])
+    team_id = "team%05i" % (nstudents // 4)
+    student_username = "student%05i" % (nstudents // 2)
+    assignment_id = "pa%02i" % (nassignments // 2)
+
+    registration = Registration.objects.get(team__course = course, team__team_id = team_id,
+                                            assignment__assignment_id = assignment_id)
+    rubric_component_id = registration.assignment.rubriccomponent_set.all()[0].pk
+    submission_id = registration.final_submission_id
+    grade_id = registration.grade_set.all()[0].pk
+
+    def get_course_lookup():
+        request = Request(APIRequestFactory().get("/"))
+        request.user = instructor
+        get_course(request, COURSE_ID)
+
+    return [("get_course", get_course_lookup),
+            ("get_course_person", lambda: get_course_person(course, instructor, roles, Student, student_username)),
+            ("get_assignment", lambda: get_assignment(course, instructor, roles, assignment_id)),
+            ("Course.get_assignment", lambda: course.get_assignment(assignment_id)),
+            ("get_rubric_component", lambda: get_rubric_component(course, instructor, roles, assignment_id, rubric_component_id)),
+            ("get_team", lambda: get_team(course, instructor, roles, team_id)),
+            ("get_team_member", lambda: get_team_member(course, instructor, roles, team_id, "student%05i" % (nstudents // 2))),
+            ("get_registration", lambda: get_registration(course, instructor, roles, team_id, assignment_id)),
+            ("get_submission", lambda: get_submission(course, instructor, roles, team_id, assignment_id, submission_id)),
+            ("get_grade", lambda: get_grade(course, instructor, roles, team_id, assignment_id, grade_id)),
+            ("Assignment.get_stats", lambda: Assignment.objects.get(course = course, assignment_id = assignment_id).get_stats()),
+            ("prefetch_teams", lambda: list(prefetch_teams(course.get_teams(), ["students", "assignments__grades"])))]
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(connection.ops.explain_query_prefix() + " " + sql)
+        rows = cursor.fetchall()
+    # SQLite returns (id, parent, notused, detail) tuples,
+    # other backends return one line of text per row
+    return [str(row[-1]) for row in rows]
+
+def run_lookups(lookups, repeat, plans):
+    results = {}
+    for name, lookup in lookups:
+        with CaptureQueriesContext(connection) as queries:
+            lookup()
+        selects = [q["sql"] for q in queries.captured_queries if q["sql"].startswith("SELECT")]
+
+        # Heavier lookups are run fewer times
+        if name in ("prefetch_teams", "Assignment.get_stats"):
+            number = 1
+        else:
+            number = repeat
+
+        t = min(timeit.repeat(lookup, number = number, repeat = 3)) / number
+
+        if plans:
+            query_plans = [(sql, explain(sql)) for sql in selects]
+        else:
+            query_plans = []
+        results[name] = (t, len(selects), query_plans)
+
+    return results
+
+def print_results(lookups, before, after, plans):
+    print("%-24s %8s %14s %14s %9s" % ("Lookup", "Queries", "Before (ms)", "After (ms)", "Speedup"))
+    for name, _ in lookups:
+        t_before, nqueries, _ = before[name]
+        t_after, _, _ = after[name]
+        print("%-24s %8i %14.3f %14.3f %8.2fx" % (name, nqueries, t_before * 1000, t_after * 1000, t_before / t_after))
+
+    if plans:
+        for name, _ in lookups:
+            print()
+            print(name)
+            print("-" * len(name))
+            for (sql, plan_before), (_, plan_after) in zip(before[name][2], after[name][2]):
+                print()
+                print("  " + (sql if len(sql) <= 200 else sql[:197] + "..."))
+                print("  Before:")
+                for line in plan_before:
+                    print("    " + line)
+                print("  After:")
+                for line in plan_after:
+                    print("    " + line)
+
+@click.command()
+@click.option("--students", type=int, default=2000)
+@click.option("--assignments", type=int, default=10)
+@click.option("--rubric-components", type=int, default=8)
+@click.option("--repeat", "-r", type=int, default=200)
+@click.option("--no-plans", is_flag=True)
+def bench_queries(students, assignments, rubric_components, repeat, no_plans):
+    runner = DiscoverRunner(verbosity=0)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+
+    try:
+        print("Creating course with %i students, %i teams, %i assignments, %i rubric components per assignment..."
+              % (students, students // 2, assignments, rubric_components))
+        course, instructor = create_course(students, assignments, rubric_components)
+        lookups = get_lookups(course, instructor, students, assignments)
+
+        # Drop the indexes, and then add them back (rolling back the
+        # migrations would also undo the ones that came after 0010)
+        with connection.schema_editor() as schema_editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    schema_editor.remove_index(model, index)
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+        before = run_lookups(lookups, repeat, not no_plans)
+
+        with connection.schema_editor() as schema_editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    schema_editor.add_index(model, index)
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+        after = run_lookups(lookups, repeat, not no_plans)
+
+        print()
+        print_results(lookups, before, after, not no_plans)
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+
+if __name__ == "__main__":
+    bench_queries()
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+# Compares the cost of generating the hyperlinks in the API responses
+# with rest_framework's reverse() against the per-request URL templates
+# in chisubmit.backend.api.helpers.
+#
+# Usage: python3 benchmarks/bench_urls.py [--objects N] [--repeat R]
+
+from __future__ import print_function
+import click
+import os
+import timeit
+
+import django
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chisubmit.backend.settings")
+django.setup()
+
+from rest_framework.request import Request
+from rest_framework.reverse import reverse
+from rest_framework.test import APIRequestFactory
+
+from chisubmit.backend.api.helpers import URLTemplates
+
+# The links generated for each team in a TeamList response that
+# includes students and assignments (with a single student and a
+# single assignment per team)
+LINKS = [('team-detail', 2),
+         ('teammember-list', 2),
+         ('registration-list', 2),
+         ('teammember-detail', 3),
+         ('student-detail', 2),
+         ('registration-detail', 3),
+         ('submission-list', 3),
+         ('grade-list', 3)]
+
+def get_args(i, nargs):
+    return ["cmsc40100", "team%i" % i, "pa1"][:nargs]
+
+def with_reverse(request, n):
+    for i in range(n):
+        for viewname, nargs in LINKS:
+            reverse(viewname, args=get_args(i, nargs), request=request)
+
+def with_templates(request, n):
+    # A new URLTemplates per run, since they are built once per request
+    url_templates = URLTemplates(request)
+    for i in range(n):
+        for viewname, nargs in LINKS:
+            url_templates.reverse(viewname, get_args(i, nargs))
+
+@click.command()
+@click.option("--objects", "-n", type=int, default=600)
+@click.option("--repeat", "-r", type=int, default=5)
+def bench_urls(objects, repeat):
+    request = Request(APIRequestFactory().get("/api/v1/courses/cmsc40100/teams/", SERVER_NAME="localhost"))
+
+    # Sanity check: both must produce the same links
+    url_templates = URLTemplates(request)
+    for i in range(objects):
+        for viewname, nargs in LINKS:
+            args = get_args(i, nargs)
+            assert url_templates.reverse(viewname, args) == reverse(viewname, args=args, request=request)
+
+    print("%i objects, %i links per object (best of %i)" % (objects, len(LINKS), repeat))
+    results = []
+    for name, f in (("reverse()", with_reverse), ("URL templates", with_templates)):
+        t = min(timeit.repeat(lambda: f(request, objects), number=1, repeat=repeat))
+        results.append(t)
+        print("  %-14s %8.2f ms" % (name, t * 1000))
+    print("  speedup        %8.1fx" % (results[0] / results[1]))
+
+if __name__ == "__main__":
+    bench_urls()
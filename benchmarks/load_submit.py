@@ -0,0 +1,199 @@
+#!/usr/bin/python3
+
+# Simulates the rush of submissions right before a deadline: loads a
+# synthetic course into a test database, starts a local development
+# server in a background thread, and fires concurrent submissions
+# (from both members of each team, so the same registration is often
+# being submitted to concurrently) at the submit endpoint. Reports
+# the latency percentiles and throughput, and then checks that the
+# final submissions and extensions are consistent.
+#
+# The test database is created with whatever backend is configured in
+# the settings. With SQLite, a file database is used, so each server
+# thread gets its own connection.
+#
+# Usage: python3 benchmarks/load_submit.py [--teams N] [--requests R]
+#                                          [--concurrency C]
+#                                          [--extension-policy per-team|per-student]
+
+from __future__ import print_function
+import click
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import django
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chisubmit.backend.settings")
+django.setup()
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from chisubmit.backend.api.models import Course, Student, Team, TeamMember,\
+    Assignment, Registration, Submission, check_extensions_ledger
+from chisubmit.common.utils import get_datetime_now_utc
+
+COURSE_ID = "cmsc99999"
+ASSIGNMENT_ID = "pa1"
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+def create_course(nteams, extension_policy):
+    course = Course.objects.create(course_id = COURSE_ID, name = "Benchmark course",
+                                   extension_policy = extension_policy)
+
+    User.objects.bulk_create([User(username = "student%05i" % i) for i in range(nteams * 2)])
+    users = list(User.objects.filter(username__startswith = "student").order_by("username"))
+    Token.objects.bulk_create([Token(user = u, key = Token.generate_key()) for u in users])
+    Student.objects.bulk_create([Student(course = course, user = u, extensions = 2) for u in users])
+    students = list(Student.objects.filter(course = course).order_by("user__username"))
+
+    # The deadline was an hour ago, so every submission needs an extension
+    assignment = Assignment.objects.create(course = course, assignment_id = ASSIGNMENT_ID,
+                                           name = "Assignment 1", max_students = 2,
+                                           deadline = get_datetime_now_utc() - timedelta(hours = 1))
+
+    Team.objects.bulk_create([Team(course = course, team_id = "team%05i" % i, extensions = 2) for i in range(nteams)])
+    teams = list(Team.objects.filter(course = course).order_by("team_id"))
+    TeamMember.objects.bulk_create([TeamMember(team = team, student = students[2*i + j], confirmed = True)
+                                    for i, team in enumerate(teams) for j in range(2)])
+    Registration.objects.bulk_create([Registration(team = team, assignment = assignment) for team in teams])
+
+    # (team_id, token) for each student
+    tokens = dict(Token.objects.values_list("user__username", "key"))
+    return [(team.team_id, tokens[students[2*i + j].user.username])
+            for i, team in enumerate(teams) for j in range(2)]
+
+def start_server():
+    httpd = ThreadedWSGIServer(("localhost", 0), QuietRequestHandler)
+    httpd.set_app(get_wsgi_application())
+    thread = threading.Thread(target = httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return httpd, "http://localhost:%i" % httpd.server_address[1]
+
+def fire(server_url, submitters, nrequests, concurrency):
+    local = threading.local()
+
+    def submit(i):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        team_id, token = random.choice(submitters)
+        url = server_url + reverse("submit", args = [COURSE_ID, team_id, ASSIGNMENT_ID])
+        start = time.time()
+        response = local.session.post(url, json = {"commit_sha": "%040x" % i},
+                                      headers = {"Authorization": "Token " + token})
+        return time.time() - start, response.status_code
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers = concurrency) as executor:
+        results = list(executor.map(submit, range(nrequests)))
+    elapsed = time.time() - start
+
+    return results, elapsed
+
+def percentile(values, p):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(p / 100.0 * len(values))) - 1))
+    return values[k]
+
+def check_consistency(nsubmitted):
+    problems = []
+
+    nsubmissions = Submission.objects.filter(registration__assignment__course__course_id = COURSE_ID).count()
+    if nsubmissions != nsubmitted:
+        problems.append("%i successful submissions, but %i submissions in the database" % (nsubmitted, nsubmissions))
+
+    # Submissions are serialized per registration, so the final
+    # submission must be the last one that was created
+    for registration in Registration.objects.filter(assignment__course__course_id = COURSE_ID) \
+                                            .select_related("team", "final_submission"):
+        last = registration.submission_set.order_by("-pk").first()
+        if last != registration.final_submission:
+            problems.append("%s: final submission is %s, but the last submission is %s"
+                            % (registration.team.team_id,
+                               registration.final_submission.pk if registration.final_submission else None,
+                               last.pk if last else None))
+
+    for obj, extensions_used, actual_extensions_used in check_extensions_ledger():
+        problems.append("%s: %i extensions used in the ledger, but %i in the submissions"
+                        % (obj, extensions_used, actual_extensions_used))
+
+    for team in Team.objects.filter(course__course_id = COURSE_ID).select_related("course"):
+        if team.get_extensions_available() < 0:
+            problems.append("%s: negative number of extensions available" % team.team_id)
+
+    return problems
+
+@click.command()
+@click.option("--teams", type=int, default=50)
+@click.option("--requests", "nrequests", type=int, default=500)
+@click.option("--concurrency", "-c", type=int, default=50)
+@click.option("--extension-policy", type=click.Choice([Course.EXT_PER_TEAM, Course.EXT_PER_STUDENT]),
+              default=Course.EXT_PER_STUDENT)
+def load_submit(teams, nrequests, concurrency, extension_policy):
+    db_settings = settings.DATABASES["default"]
+    if db_settings["ENGINE"] == "django.db.backends.sqlite3":
+        db_dir = tempfile.mkdtemp()
+        db_settings.setdefault("TEST", {})["NAME"] = os.path.join(db_dir, "load_submit.sqlite3")
+    else:
+        db_dir = None
+
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases()
+
+    try:
+        print("Creating course with %i teams of 2 students..." % teams)
+        submitters = create_course(teams, extension_policy)
+        # The server threads open their own connections
+        connections.close_all()
+
+        httpd, server_url = start_server()
+        print("Sending %i submissions to %s with %i concurrent clients..." % (nrequests, server_url, concurrency))
+        try:
+            results, elapsed = fire(server_url, submitters, nrequests, concurrency)
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+        latencies = [t for t, _ in results]
+        statuses = Counter([s for _, s in results])
+
+        print()
+        print("Status codes:    %s" % ", ".join("%i x %i" % (s, n) for s, n in sorted(statuses.items())))
+        print("Throughput:      %.1f submissions/s" % (nrequests / elapsed))
+        print("Latency (ms):    mean %.1f, p50 %.1f, p90 %.1f, p99 %.1f, max %.1f"
+              % (1000 * sum(latencies) / len(latencies), 1000 * percentile(latencies, 50),
+                 1000 * percentile(latencies, 90), 1000 * percentile(latencies, 99),
+                 1000 * max(latencies)))
+
+        problems = check_consistency(statuses[201])
+        if problems:
+            print("Consistency:     %i problems" % len(problems))
+            for problem in problems:
+                print("  " + problem)
+        else:
+            print("Consistency:     OK")
+    finally:
+        connections.close_all()
+        runner.teardown_databases(old_config)
+        if db_dir is not None:
+            shutil.rmtree(db_dir)
+
+if __name__ == "__main__":
+    load_submit()
@@ -67,7 +67,7 @@ setup(name='chisubmit',
       extras_require = {
                          "server" : ["django-auth-ldap >= 1.7.0",
                                      "djangorestframework >= 3.8.2", 
-                                     "Django >= 2.1.1",
+                                     "Django >= 2.2",
                                      "jsonfield >= 2.0.2",
                                      "python-ldap >= 3.1.0" 
                                      ] 
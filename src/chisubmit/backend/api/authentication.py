@@ -0,0 +1,142 @@
+from builtins import object
+from collections import OrderedDict
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+
+DEFAULT_TOKEN_CACHE_SETTINGS = {
+    # Maximum number of tokens kept in each server process
+    "MAX_SIZE": 1024,
+    # Seconds a validated token is trusted before it is looked up again
+    "TTL": 60,
+    # Django cache (from settings.CACHES) shared by all the server
+    # processes, or None to only cache tokens in each process
+    "CACHE_ALIAS": None
+}
+
+class TokenCache(object):
+    """
+    A bounded LRU cache of validated tokens (mapping each token key to
+    a (user, token) tuple), whose entries expire after a TTL. Optionally
+    backed by a Django cache, so that tokens validated by one server
+    process can be reused by the others.
+    """
+
+    KEY_PREFIX = "chisubmit:token:"
+
+    def __init__(self, max_size, ttl, cache_alias = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_shared_cache(self):
+        if self.cache_alias is None:
+            return None
+        else:
+            return caches[self.cache_alias]
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self.entries.move_to_end(key)
+                    return value
+                else:
+                    del self.entries[key]
+
+        shared_cache = self.get_shared_cache()
+        if shared_cache is not None:
+            value = shared_cache.get(self.KEY_PREFIX + key)
+            if value is not None:
+                self.set(key, value, shared = False)
+                return value
+
+        return None
+
+    def set(self, key, value, shared = True):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last = False)
+
+        shared_cache = self.get_shared_cache()
+        if shared and shared_cache is not None:
+            shared_cache.set(self.KEY_PREFIX + key, value, self.ttl)
+
+    def invalidate(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+        shared_cache = self.get_shared_cache()
+        if shared_cache is not None and len(keys) > 0:
+            shared_cache.delete_many([self.KEY_PREFIX + key for key in keys])
+
+    def invalidate_user(self, user_id, keys = ()):
+        # Tokens cached in this process are found by user; tokens in the
+        # shared cache can only be found by key
+        with self.lock:
+            user_keys = [key for key, (_, (user, _)) in self.entries.items() if user.pk == user_id]
+        self.invalidate(list(set(user_keys) | set(keys)))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+def get_token_cache():
+    global _token_cache
+
+    with _token_cache_lock:
+        if _token_cache is None:
+            token_cache_settings = dict(DEFAULT_TOKEN_CACHE_SETTINGS)
+            token_cache_settings.update(getattr(settings, "CHISUBMIT_TOKEN_CACHE", {}))
+            _token_cache = TokenCache(token_cache_settings["MAX_SIZE"],
+                                      token_cache_settings["TTL"],
+                                      token_cache_settings["CACHE_ALIAS"])
+        return _token_cache
+
+@receiver(setting_changed)
+def token_cache_setting_changed(setting, **kwargs):
+    global _token_cache
+
+    if setting in ("CHISUBMIT_TOKEN_CACHE", "CACHES"):
+        with _token_cache_lock:
+            _token_cache = None
+
+
+class CachingTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that doesn't query the database for tokens that
+    were recently validated. Cached tokens are invalidated when they are
+    deleted (e.g., when they are reset) and when their user is modified.
+    """
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = super(CachingTokenAuthentication, self).authenticate_credentials(key)
+            token_cache.set(key, (user, token))
+        else:
+            user, token = cached
+
+        # Each request gets its own copy of the user, in case a view
+        # modifies it
+        return (copy.copy(user), token)
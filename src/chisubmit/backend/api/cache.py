@@ -0,0 +1,104 @@
+from builtins import object
+from collections import Counter
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from rest_framework.response import Response
+
+DEFAULT_READ_CACHE_SETTINGS = {
+    # Django cache (from settings.CACHES) where the responses are
+    # stored, or None to disable the read cache
+    "CACHE_ALIAS": "default",
+    # Seconds a cached response is kept
+    "TIMEOUT": 300
+}
+
+def get_read_cache_settings():
+    read_cache_settings = dict(DEFAULT_READ_CACHE_SETTINGS)
+    read_cache_settings.update(getattr(settings, "CHISUBMIT_READ_CACHE", {}))
+    return read_cache_settings
+
+def get_read_cache():
+    cache_alias = get_read_cache_settings()["CACHE_ALIAS"]
+    if cache_alias is None:
+        return None
+    else:
+        return caches[cache_alias]
+
+
+class ReadCacheStats(object):
+    """
+    Hits and misses of the read cache in this process, per view.
+    """
+
+    def __init__(self):
+        self.hits = Counter()
+        self.misses = Counter()
+        self.lock = threading.Lock()
+
+    def hit(self, view_name):
+        with self.lock:
+            self.hits[view_name] += 1
+
+    def miss(self, view_name):
+        with self.lock:
+            self.misses[view_name] += 1
+
+    def get(self):
+        with self.lock:
+            view_names = sorted(set(self.hits) | set(self.misses))
+            return dict([(view_name, {"hits": self.hits[view_name], "misses": self.misses[view_name]})
+                         for view_name in view_names])
+
+    def reset(self):
+        with self.lock:
+            self.hits.clear()
+            self.misses.clear()
+
+read_cache_stats = ReadCacheStats()
+
+
+def get_cached_response(request, course_obj, roles, view_name, get_response, per_user = False):
+    """
+    Returns the response to a GET request on a course, using the read
+    cache if possible. The response is cached by course, roles and query
+    parameters (and by user, if per_user is true) and is only computed,
+    with get_response(), on a cache miss. Only successful responses
+    are cached.
+
+    The caller is responsible for checking that the user can access the
+    course, and anything that depends on who the user is (beyond their
+    roles) should be cached per_user.
+    """
+    cache = get_read_cache()
+
+    # Data read inside a transaction could be rolled back
+    if cache is None or connection.in_atomic_block:
+        return get_response()
+
+    params = sorted([(k, sorted(v)) for k, v in request.query_params.lists()])
+    key_parts = (view_name, request.build_absolute_uri(request.path), params,
+                 sorted([r.name for r in roles]), request.user.pk if per_user else None)
+    # The course's version (see record_course_changes) changes whenever
+    # anything in the course changes, so including it in the key
+    # invalidates all the course's cached responses at once (in every
+    # process, since the version is read from the database)
+    key = "chisubmit:read:%i:%i:%s" % (course_obj.pk, course_obj.version,
+                                       hashlib.sha1(repr(key_parts).encode("utf-8")).hexdigest())
+
+    data = cache.get(key)
+    if data is not None:
+        read_cache_stats.hit(view_name)
+        response = Response(data)
+        response["X-Chisubmit-Cache"] = "hit"
+        return response
+
+    read_cache_stats.miss(view_name)
+    response = get_response()
+    if response.status_code == 200:
+        cache.set(key, response.data, get_read_cache_settings()["TIMEOUT"])
+    response["X-Chisubmit-Cache"] = "miss"
+    return response
@@ -1,22 +1,126 @@
 from django.http.response import Http404
 from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Prefetch, F
+from django.http.response import StreamingHttpResponse
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+from rest_framework.reverse import reverse
+from operator import attrgetter
+from functools import wraps
+import csv
+import hashlib
 from chisubmit.backend.api.models import Assignment, Team, TeamMember, Course,\
-    CourseRoles, RubricComponent, Registration, Submission, Grade
+    CourseRoles, RubricComponent, Registration, Submission, Grade, Student
 
 def get_course(request, course_id):
-    try:
-        course_obj = Course.objects.get(course_id=course_id)
-    except Course.DoesNotExist:
-        raise Http404                           
-    
-    roles = course_obj.get_roles(request.user)
+    # The course and the user's roles in it are memoized for the
+    # lifetime of the request.
+    courses = getattr(request, "_chisubmit_courses", None)
+    if courses is None:
+        courses = {}
+        request._chisubmit_courses = courses
     
+    key = (request.user.pk, course_id)
+    if key not in courses:
+        try:
+            course_obj = Course.annotate_roles(Course.objects.all(), request.user).get(course_id=course_id)
+        except Course.DoesNotExist:
+            raise Http404                           
+        
+        courses[key] = (course_obj, course_obj.get_annotated_roles(request.user))
+
+    course_obj, roles = courses[key]
+
     if len(roles) == 0:
         raise Http404
     
     return course_obj, roles
 
 
+def get_course_etag(request, course_obj, roles):
+    # A weak ETag for a GET request on a course. The course's version
+    # changes whenever anything in the course changes, so the ETag only
+    # needs to distinguish between the different requests (and
+    # users, since responses depend on who's asking) on the same
+    # version of the course.
+    params = sorted([(k, sorted(v)) for k, v in request.query_params.lists()])
+    key = (request.build_absolute_uri(request.path), params, request.META.get("HTTP_ACCEPT"),
+           sorted([r.name for r in roles]), request.user.pk)
+    return 'W/"%i-%i-%s"' % (course_obj.pk, course_obj.version,
+                             hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20])
+
+def course_etag(get):
+    # Decorator for the GET method of views on a course. Successful
+    # responses include the ETag for the request, and, if it matches
+    # the request's If-None-Match, a 304 response is returned without
+    # calling the view.
+    @wraps(get)
+    def wrapper(self, request, course_id, *args, **kwargs):
+        course_obj, roles = get_course(request, course_id)
+        etag = get_course_etag(request, course_obj, roles)
+
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match is not None:
+            # ETags are compared with the weak comparison function
+            etags = [e[2:] if e.startswith("W/") else e for e in parse_etags(if_none_match)]
+            if etag[2:] in etags or "*" in etags:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                response["ETag"] = etag
+                return response
+
+        response = get(self, request, course_id, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+        return response
+
+    return wrapper
+
+
+class URLTemplates(object):
+    # Reversing a URL resolves the URLconf and builds an absolute URI,
+    # which adds up when serializing long lists. Instead, each view name
+    # is reversed once per request with sentinel arguments, and the
+    # result is turned into a format string. The sentinels are all
+    # digits, so they match every argument pattern in urls.py.
+    SENTINEL = "830197526401{:02d}"
+
+    def __init__(self, request):
+        self.request = request
+        self.templates = {}
+
+    def _build_template(self, viewname, nargs):
+        sentinels = [self.SENTINEL.format(i) for i in range(nargs)]
+        url = reverse(viewname, args=sentinels, request=self.request)
+        template = url.replace("{", "{{").replace("}", "}}")
+        for i, sentinel in enumerate(sentinels):
+            # Fall back on reverse() if we can't tell where the
+            # argument goes.
+            if template.count(sentinel) != 1:
+                return None
+            template = template.replace(sentinel, "{%i}" % i)
+        return template
+
+    def reverse(self, viewname, args):
+        if viewname not in self.templates:
+            self.templates[viewname] = self._build_template(viewname, len(args))
+
+        template = self.templates[viewname]
+        if template is None:
+            return reverse(viewname, args=args, request=self.request)
+        else:
+            return template.format(*args)
+
+def get_url_templates(request):
+    url_templates = getattr(request, "_chisubmit_url_templates", None)
+    if url_templates is None:
+        url_templates = URLTemplates(request)
+        request._chisubmit_url_templates = url_templates
+    return url_templates
+
 def get_course_person(course_obj, request_user, roles, course_user_class, username):
     try:
         if len(roles) == 1 and CourseRoles.STUDENT in roles:
@@ -39,7 +143,7 @@ def get_assignment(course_obj, request_user, roles, assignment_id):
     
 def get_rubric_component(course_obj, request_user, roles, assignment_id, rubric_component_id):
     try:
-        return RubricComponent.objects.get(assignment__assignment_id=assignment_id, pk=rubric_component_id)
+        return RubricComponent.objects.get(assignment__course=course_obj, assignment__assignment_id=assignment_id, pk=rubric_component_id)
     except RubricComponent.DoesNotExist:
         raise Http404      
     
@@ -92,4 +196,208 @@ def get_grade(course_obj, request_user, roles, team_id, assignment_id, grade_id)
         
         return grade_obj
     except (Team.DoesNotExist, Registration.DoesNotExist, Grade.DoesNotExist):
-        raise Http404                  
\ No newline at end of file
+        raise Http404
+
+
+def lock_rows(queryset):
+    # Locks the rows in the queryset until the end of the current
+    # transaction, and returns them as a list. SQLite has no
+    # SELECT ... FOR UPDATE, so we issue a no-op UPDATE instead, which
+    # makes the transaction take the database write lock right away
+    # (otherwise two transactions can both read, and then one of them
+    # fails with "database is locked" when it tries to write). This
+    # only works if it is done before anything else in the transaction.
+    if connection.features.has_select_for_update:
+        return list(queryset.select_for_update())
+    else:
+        pk = queryset.model._meta.pk.attname
+        queryset.update(**{pk: F(pk)})
+        return list(queryset)
+
+
+def prefetch_teams(teams, include):
+    # Fetches everything the team serializers (and their nested serializers)
+    # will need for the requested includes, so that serializing a list of
+    # teams takes a constant number of queries, regardless of team count.
+    if "students" in include:
+        teammembers = TeamMember.objects.select_related("student__user")
+        teams = teams.prefetch_related(Prefetch("teammember_set", queryset=teammembers))
+
+    if "assignments" in include or "assignments__grades" in include:
+        registrations = Registration.objects.select_related("assignment",
+                                                            "grader__user",
+                                                            "final_submission__submitted_by",
+                                                            "final_submission__registration__team",
+                                                            "final_submission__registration__assignment")
+        conflicts = Student.objects.select_related("user")
+        registrations = registrations.prefetch_related(Prefetch("grader__conflicts", queryset=conflicts))
+
+        if "assignments__grades" in include:
+            grades = Grade.objects.select_related("rubric_component__assignment")
+            registrations = registrations.prefetch_related(Prefetch("grade_set", queryset=grades))
+
+        teams = teams.prefetch_related(Prefetch("registration_set", queryset=registrations))
+
+    return teams
+
+
+def get_requested_fields(request):
+    # The fields requested with ?fields=a,b (or ?fields=a&fields=b), 
+    # or None if the request doesn't restrict the fields
+    values = request.query_params.getlist("fields")
+    
+    if len(values) == 0:
+        return None
+    
+    return frozenset([f.strip() for v in values for f in v.split(",") if f.strip() != ""])
+
+def only_requested_fields(request, queryset, serializer_class, key = None):
+    # Restricts the queryset to the model fields needed to serialize the
+    # fields requested with ?fields=, plus the foreign keys of any related
+    # objects that are selected or prefetched, and the model field the
+    # objects are paginated by (key). If we can't tell what model fields
+    # are needed, the queryset is returned unchanged.
+    fields = get_requested_fields(request)
+    if fields is None:
+        return queryset
+    
+    model_fields = serializer_class.get_model_fields(fields)
+    if model_fields is None:
+        return queryset
+
+    concrete_fields = set([f.name for f in queryset.model._meta.concrete_fields])
+    if not model_fields.issubset(concrete_fields):
+        return queryset
+    
+    related = [f.name for f in queryset._known_related_objects]
+    if isinstance(queryset.query.select_related, dict):
+        related += list(queryset.query.select_related.keys())
+    for lookup in queryset._prefetch_related_lookups:
+        if isinstance(lookup, Prefetch):
+            lookup = lookup.prefetch_through
+        related.append(lookup)
+    if key is not None:
+        related.append(key)
+    
+    for lookup in related:
+        name = lookup.split("__")[0]
+        if name in concrete_fields:
+            model_fields.add(name)
+
+    return queryset.only(*model_fields)
+
+
+def paginate(request, queryset, key):
+    # Opt-in keyset pagination: if the request includes a page_size
+    # parameter, return at most that many objects, ordered by key, starting
+    # after the key specified in the cursor parameter. Also returns the
+    # URL of the next page (or None if this is the last page)
+    page_size = request.query_params.get("page_size")
+    
+    if page_size is None:
+        return queryset, None
+    
+    try:
+        page_size = int(page_size)
+        if page_size < 1:
+            raise ValueError
+    except ValueError:
+        raise ValidationError({"page_size": ["page_size must be a positive integer"]})
+    
+    queryset = queryset.order_by(key)
+    
+    cursor = request.query_params.get("cursor")
+    if cursor is not None:
+        queryset = queryset.filter(**{key + "__gt": cursor})
+    
+    page = list(queryset[:page_size + 1])
+    
+    if len(page) <= page_size:
+        return page, None
+    
+    page = page[:page_size]
+    
+    params = request.query_params.copy()
+    params["cursor"] = attrgetter(key.replace("__", "."))(page[-1])
+    next_url = request.build_absolute_uri(request.path) + "?" + params.urlencode()
+    
+    return page, next_url
+
+
+def get_pagination_headers(next_url):
+    if next_url is None:
+        return {}
+    else:
+        return {"Link": '<%s>; rel="next"' % next_url}
+
+
+STREAM_CHUNK_SIZE = 100
+
+def is_streaming_request(request):
+    return request.query_params.get("stream", "false") in ("true", "True")
+
+def iterate_in_chunks(queryset, key, chunk_size = STREAM_CHUNK_SIZE):
+    # Similar to queryset.iterator(chunk_size), but fetching each chunk
+    # with a keyset query, so that any prefetch_related lookups in the
+    # queryset are still honored.
+    queryset = queryset.order_by(key)
+    get_key = attrgetter(key.replace("__", "."))
+    
+    chunk = list(queryset[:chunk_size])
+    while len(chunk) > 0:
+        for obj in chunk:
+            yield obj
+        
+        if len(chunk) < chunk_size:
+            break
+        
+        chunk = list(queryset.filter(**{key + "__gt": get_key(chunk[-1])})[:chunk_size])
+
+def get_streaming_response(objects, serialize):
+    # Renders a JSON list one element at a time, so the complete list
+    # never has to be held in memory
+    def render():
+        renderer = JSONRenderer()
+        yield b"["
+        first = True
+        for obj in objects:
+            if not first:
+                yield b","
+            first = False
+            yield renderer.render(serialize(obj))
+        yield b"]"
+    
+    return StreamingHttpResponse(render(), content_type="application/json")
+
+class _Echo(object):
+    # File-like object that just returns what is written to it,
+    # so csv.writer can be used to render one row at a time
+    def write(self, value):
+        return value
+
+def get_csv_streaming_response(columns):
+    # Renders a list of (column name, values) tuples as CSV, 
+    # one row at a time
+    def render():
+        writer = csv.writer(_Echo(), lineterminator="\n")
+        yield writer.writerow([name for name, _ in columns])
+        for row in zip(*[values for _, values in columns]):
+            yield writer.writerow(["" if v is None else v for v in row])
+
+    return StreamingHttpResponse(render(), content_type="text/csv")
+
+def get_columnar_streaming_response(columns):
+    # Renders a list of (column name, values) tuples as a JSON
+    # object mapping each column name to its list of values
+    def render():
+        renderer = JSONRenderer()
+        yield b"{"
+        first = True
+        for name, values in columns:
+            if not first:
+                yield b","
+            first = False
+            yield renderer.render(name) + b":" + renderer.render(values)
+        yield b"}"
+
+    return StreamingHttpResponse(render(), content_type="application/json")
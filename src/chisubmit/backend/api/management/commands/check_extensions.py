@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from chisubmit.backend.api.models import Course, Team, check_extensions_ledger
+
+
+class Command(BaseCommand):
+    help = "Checks the extensions used by each team and student against their submissions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--course", action="append", dest="course_ids", metavar="COURSE_ID",
+                            help="Only check this course (can be specified multiple times)")
+        parser.add_argument("--fix", action="store_true",
+                            help="Rebuild the extensions used by the teams and students that don't match")
+
+    def handle(self, *args, **options):
+        if options["course_ids"]:
+            courses = list(Course.objects.filter(course_id__in = options["course_ids"]))
+            missing = set(options["course_ids"]) - set([c.course_id for c in courses])
+            if len(missing) > 0:
+                raise CommandError("No such course(s): %s" % ", ".join(sorted(missing)))
+        else:
+            courses = None
+
+        with transaction.atomic():
+            mismatches = check_extensions_ledger(courses, fix = options["fix"])
+
+        for obj, extensions_used, actual_extensions_used in mismatches:
+            if isinstance(obj, Team):
+                name = "Team %s" % obj.team_id
+            else:
+                name = "Student %s" % obj.user.username
+            self.stdout.write("%s (%s): %i extensions used, should be %i" % (name, obj.course.course_id,
+                                                                            extensions_used, actual_extensions_used))
+
+        if len(mismatches) == 0:
+            self.stdout.write("The extensions used by all teams and students are correct.")
+        elif options["fix"]:
+            self.stdout.write("Fixed %i teams and students." % len(mismatches))
+        else:
+            raise CommandError("%i teams and students have incorrect extensions used. Run with --fix to rebuild them." % len(mismatches))
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_gradescope'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['assignment', 'team'], name='api_registr_assignm_6f53ce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teammember',
+            index=models.Index(fields=['team', 'student'], name='api_teammem_team_id_9cb8ae_idx'),
+        ),
+    ]
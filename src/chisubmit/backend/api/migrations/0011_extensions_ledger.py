@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:56
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, IntegerField
+from django.db.models.functions import Coalesce
+
+
+def build_extensions_ledger(apps, schema_editor):
+    Registration = apps.get_model('api', 'Registration')
+    Team = apps.get_model('api', 'Team')
+    Student = apps.get_model('api', 'Student')
+
+    team_extensions_used = Registration.objects.filter(team = OuterRef("pk")) \
+                                               .order_by() \
+                                               .values("team") \
+                                               .annotate(extensions_used = Sum("final_submission__extensions_used")) \
+                                               .values("extensions_used")
+    Team.objects.update(extensions_used = Coalesce(Subquery(team_extensions_used, output_field = IntegerField()), 0))
+
+    student_extensions_used = Registration.objects.filter(team__teammember__student = OuterRef("pk")) \
+                                                  .order_by() \
+                                                  .values("team__teammember__student") \
+                                                  .annotate(extensions_used = Sum("final_submission__extensions_used")) \
+                                                  .values("extensions_used")
+    Student.objects.update(extensions_used = Coalesce(Subquery(student_extensions_used, output_field = IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='extensions_used',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='extensions_used',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(build_extensions_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_extensions_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
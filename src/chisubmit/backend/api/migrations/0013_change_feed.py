@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_course_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grade',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='registration',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='Deletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('team', 'Team'), ('registration', 'Registration'), ('submission', 'Submission'), ('grade', 'Grade')], max_length=16)),
+                ('team_id', models.SlugField(max_length=128)),
+                ('assignment_id', models.SlugField(blank=True, max_length=128)),
+                ('object_id', models.IntegerField(null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('course', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='api.course')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletion',
+            name='students',
+            field=models.ManyToManyField(db_constraint=False, to='api.Student'),
+        ),
+    ]
@@ -1,14 +1,23 @@
 from builtins import object
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, Q, Sum, Case, When, Count,\
+    F, Min, Subquery, IntegerField
+from django.db.models.functions import Coalesce
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from django.contrib.auth.models import User
 from enum import Enum
 from datetime import timedelta
+from decimal import Decimal
 from django.db.utils import IntegrityError
+from chisubmit.backend.api.authentication import get_token_cache
 from chisubmit.common.utils import compute_extensions_needed,\
     is_submission_ready_for_grading
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 import jsonfield
 
 class CourseRoles(Enum):
@@ -35,6 +44,21 @@ def get_user_by_username(username):
     except User.DoesNotExist:
         return None    
 
+def get_saved_fields(instance, excluded_fields, update_fields = None):
+    # The fields to save when saving an existing object, leaving out the
+    # ones that are only changed with UPDATE queries (e.g., counters that
+    # concurrent requests change), so saving an object doesn't write back
+    # the value that was loaded earlier
+    if instance._state.adding:
+        return update_fields
+    
+    if update_fields is None:
+        deferred_fields = instance.get_deferred_fields()
+        update_fields = [f.name for f in instance._meta.concrete_fields 
+                         if not f.primary_key and f.attname not in deferred_fields]
+        
+    return [f for f in update_fields if f not in excluded_fields]
+
 class Course(models.Model):
     course_id = models.SlugField(unique = True)
     name = models.CharField(max_length=64)
@@ -46,9 +70,18 @@ class Course(models.Model):
 
     gradescope_id = models.IntegerField(null=True, blank=True)
     
+    # Incremented whenever anything in the course changes
+    # (see record_course_changes)
+    version = models.IntegerField(default=0)
+    
     def __unicode__(self):
         return u"%s: %s" % (self.course_id, self.name)
     
+    def save(self, *args, **kwargs):
+        if not kwargs.get("force_insert"):
+            kwargs["update_fields"] = get_saved_fields(self, ["version"], kwargs.get("update_fields"))
+        super(Course, self).save(*args, **kwargs)
+    
     @classmethod
     def get_by_course_id(cls, course_id):
         try:
@@ -84,26 +117,45 @@ class Course(models.Model):
             return None        
 
     def has_user(self, user):
-        return self.has_student(user) or self.has_instructor(user) or self.has_grader(user) 
+        return Course.filter_by_user(Course.objects.filter(pk=self.pk), user).exists()
     
     def has_access(self, user):
         return user.is_staff or user.is_superuser or self.has_user(user)
     
-    def get_roles(self, user):
+    @classmethod
+    def annotate_roles(cls, queryset, user):
+        # Annotates each course with whether the user is an instructor,
+        # grader, or student in it (resolved in the same query as the
+        # courses themselves)
+        return queryset.annotate(user_is_instructor = Exists(Instructor.objects.filter(course=OuterRef("pk"), user=user)),
+                                 user_is_grader = Exists(Grader.objects.filter(course=OuterRef("pk"), user=user)),
+                                 user_is_student = Exists(Student.objects.filter(course=OuterRef("pk"), user=user)))
+
+    @classmethod
+    def filter_by_user(cls, queryset, user):
+        queryset = cls.annotate_roles(queryset, user)
+        return queryset.filter(Q(user_is_instructor=True) | Q(user_is_grader=True) | Q(user_is_student=True))
+
+    def get_annotated_roles(self, user):
+        # Only valid on courses obtained through annotate_roles(..., user)
         roles = set()
-        if self.has_instructor(user):
+        if self.user_is_instructor:
             roles.add(CourseRoles.INSTRUCTOR)
-        if self.has_grader(user):
+        if self.user_is_grader:
             roles.add(CourseRoles.GRADER)
-        if self.has_student(user):
+        if self.user_is_student:
             roles.add(CourseRoles.STUDENT)
         if user.is_staff or user.is_superuser:
             roles.add(CourseRoles.ADMIN)
         return roles
     
+    def get_roles(self, user):
+        course = Course.annotate_roles(Course.objects.filter(pk=self.pk), user).get()
+        return course.get_annotated_roles(user)
+    
     def get_assignment(self, assignment_id):
         try:
-            return Assignment.objects.get(course__course_id=self.course_id, assignment_id=assignment_id)
+            return Assignment.objects.get(course=self, assignment_id=assignment_id)
         except Assignment.DoesNotExist:
             return None
         
@@ -119,6 +171,103 @@ class Course(models.Model):
     def get_teams_with_students(self, students):
         return self.team_set.filter(students__in = students).distinct()
     
+    def get_teams_by_members(self, students, assignment):
+        # Indexes the teams that any of the given students are in by their
+        # members. Returns a dict mapping the sorted usernames of a team's
+        # members to a list of (team pk, whether the team is registered for
+        # the assignment) tuples. Uses a single query.
+        registered = Registration.objects.filter(team = OuterRef("team"), assignment = assignment)
+        members = TeamMember.objects.filter(team__in = self.team_set.filter(students__in = students)) \
+                                    .annotate(registered = Exists(registered)) \
+                                    .values_list("team_id", "student__user__username", "registered")
+        
+        teams = {}
+        for team_pk, username, is_registered in members:
+            usernames, _ = teams.get(team_pk, ((), False))
+            teams[team_pk] = (usernames + (username,), is_registered)
+        
+        index = {}
+        for team_pk, (usernames, is_registered) in teams.items():
+            index.setdefault(tuple(sorted(usernames)), []).append((team_pk, is_registered))
+        return index
+    
+    def get_gradebook(self, detailed = False):
+        # Returns the gradebook as a list of (column name, values) tuples, 
+        # with one value per student who hasn't dropped the course. Only
+        # registrations with a final submission are included. If a student
+        # has more than one of those for an assignment, the first one is
+        # used, and this is reported in a Warnings column (which is only
+        # included if there are any warnings).
+        # The points of each registration (per rubric component, if
+        # detailed, and in total) are aggregated in a single query. 
+        # Grade adjustments are stored as JSON, so those are added up here.
+        students = list(self.student_set.filter(dropped = False)
+                                        .select_related("user")
+                                        .order_by("user__last_name", "user__username"))
+        assignments = list(self.assignment_set.order_by("deadline")
+                                              .prefetch_related("rubriccomponent_set"))
+
+        annotations = {"total_points": Sum("grade__points")}
+        if detailed:
+            for assignment in assignments:
+                for rc in assignment.rubriccomponent_set.all():
+                    annotations["rc_%i_points" % rc.pk] = Sum(Case(When(grade__rubric_component = rc, 
+                                                                         then = "grade__points")))
+
+        registrations = Registration.objects.filter(assignment__course = self, 
+                                                    final_submission__isnull = False) \
+                                            .order_by("pk") \
+                                            .annotate(**annotations)
+
+        team_students = {}
+        team_ids = {}
+        for team_pk, team_id, student_id in TeamMember.objects.filter(team__course = self) \
+                                                               .values_list("team_id", "team__team_id", "student_id"):
+            team_students.setdefault(team_pk, []).append(student_id)
+            team_ids[team_pk] = team_id
+
+        student_registrations = {}
+        for registration in registrations:
+            for student_id in team_students.get(registration.team_id, []):
+                student_registrations.setdefault((student_id, registration.assignment_id), []).append(registration)
+
+        columns = [("Username", [s.user.username for s in students]),
+                   ("Last Name", [s.user.last_name for s in students]),
+                   ("First Name", [s.user.first_name for s in students])]
+
+        warnings = [[] for _ in students]
+
+        for assignment in assignments:
+            registrations = []
+            for student, student_warnings in zip(students, warnings):
+                student_assignment_registrations = student_registrations.get((student.pk, assignment.pk), [None])
+                if len(student_assignment_registrations) > 1:
+                    conflicting_team_ids = [team_ids[r.team_id] for r in student_assignment_registrations]
+                    student_warnings.append("%s: submitted in more than one team (%s), using %s" % 
+                                            (assignment.assignment_id, ", ".join(conflicting_team_ids), 
+                                             conflicting_team_ids[0]))
+                registrations.append(student_assignment_registrations[0])
+            totals = [r.get_total_grade() if r is not None else None for r in registrations]
+
+            if detailed:
+                for rc in assignment.rubriccomponent_set.all():
+                    points = [getattr(r, "rc_%i_points" % rc.pk) if r is not None else None for r in registrations]
+                    columns.append(("%s - %s" % (assignment.assignment_id, rc.description), points))
+
+                penalties = [r.get_total_penalties() if r is not None else None for r in registrations]
+                bonuses = [r.get_total_bonuses() if r is not None else None for r in registrations]
+
+                columns.append(("%s - Penalties" % assignment.assignment_id, penalties))
+                columns.append(("%s - Bonuses" % assignment.assignment_id, bonuses))
+                columns.append(("%s - Total" % assignment.assignment_id, totals))
+            else:
+                columns.append((assignment.assignment_id, totals))
+
+        if any(warnings):
+            columns.append(("Warnings", ["; ".join(w) if len(w) > 0 else None for w in warnings]))
+
+        return columns
+    
     # OPTIONS
     GIT_USERNAME_USER = 'user-id'
     GIT_USERNAME_CUSTOM = 'custom'
@@ -178,20 +327,34 @@ class Student(models.Model):
     extensions = models.IntegerField(default=0, validators = [MinValueValidator(0)])
     dropped = models.BooleanField(default = False)
     
+    # Extensions used in the final submissions of all the teams the
+    # student is in (see update_extensions_ledger)
+    extensions_used = models.IntegerField(default=0)
+    
     def __unicode__(self):
         return u"Student %s of %s" % (self.user.username, self.course.course_id)     
     
-    def get_extensions_available(self):
-        extensions_used = 0
-        
-        teams = self.course.get_teams_with_students([self])
-        
-        for team in teams:
-            for registration in team.registration_set.all():
-                if registration.final_submission is not None:
-                    extensions_used += registration.final_submission.extensions_used
+    def save(self, *args, **kwargs):
+        # The ledger is only changed by update_extensions_ledger
+        if not kwargs.get("force_insert"):
+            kwargs["update_fields"] = get_saved_fields(self, ["extensions_used"], kwargs.get("update_fields"))
+        super(Student, self).save(*args, **kwargs)
+    
+    @classmethod
+    def get_extensions_used_subquery(cls):
+        # Computes extensions_used from the final submissions
+        extensions_used = Registration.objects.filter(team__teammember__student = OuterRef("pk")) \
+                                              .order_by() \
+                                              .values("team__teammember__student") \
+                                              .annotate(extensions_used = Sum("final_submission__extensions_used")) \
+                                              .values("extensions_used")
+        return Coalesce(Subquery(extensions_used, output_field = IntegerField()), 0)
+    
+    def get_extensions_used(self):
+        return self.extensions_used
 
-        return self.extensions - extensions_used    
+    def get_extensions_available(self):
+        return self.extensions - self.extensions_used
     
     class Meta(object):
         unique_together = ("user", "course")    
@@ -228,6 +391,65 @@ class Assignment(models.Model):
         except RubricComponent.DoesNotExist:
             return None
 
+    def get_stats(self):
+        # Computes how many students/teams have signed up for and 
+        # submitted this assignment, using a fixed number of aggregate 
+        # queries. Teams that include a dropped student are not counted 
+        # as teams (but their other students do count as signed up).
+        students = Student.objects.filter(course = self.course_id)
+        registered = Q(team_member_in__registration__assignment = self)
+
+        student_counts = students.aggregate(students = Count("pk", filter = Q(dropped = False)),
+                                            dropped = Count("pk", filter = Q(dropped = True)))
+
+        unregistered_students = list(students.filter(dropped = False)
+                                             .exclude(registered)
+                                             .select_related("user")
+                                             .order_by("user__last_name", "user__username"))
+
+        students_multiple_teams = list(students.filter(dropped = False)
+                                               .annotate(nteams = Count("team_member_in", filter = registered))
+                                               .filter(nteams__gt = 1)
+                                               .values_list("user__username", flat = True))
+
+        not_dropped = Q(team__teammember__student__dropped = False)
+        registrations = Registration.objects.filter(assignment = self) \
+                                            .annotate(nmembers = Count("team__teammember"),
+                                                      ndropped = Count("team__teammember", filter = ~not_dropped),
+                                                      nunconfirmed = Count("team__teammember", 
+                                                                           filter = not_dropped & Q(team__teammember__confirmed = False))) \
+                                            .order_by("team__team_id") \
+                                            .values_list("team__team_id", "final_submission_id", 
+                                                         "nmembers", "ndropped", "nunconfirmed")
+
+        nteams = 0
+        nteams_submitted = 0
+        nstudents_submitted = 0
+        unsubmitted_teams = []
+        unconfirmed_teams = []
+        for team_id, final_submission_id, nmembers, ndropped, nunconfirmed in registrations:
+            if ndropped == 0:
+                nteams += 1
+                if final_submission_id is not None:
+                    nteams_submitted += 1
+                    nstudents_submitted += nmembers
+                else:
+                    unsubmitted_teams.append(team_id)
+
+            if nunconfirmed > 0:
+                unconfirmed_teams.append(team_id)
+
+        return {"students": student_counts["students"],
+                "dropped_students": student_counts["dropped"],
+                "students_registered": student_counts["students"] - len(unregistered_students),
+                "teams": nteams,
+                "teams_submitted": nteams_submitted,
+                "students_submitted": nstudents_submitted,
+                "unsubmitted_teams": unsubmitted_teams,
+                "unconfirmed_teams": unconfirmed_teams,
+                "unregistered_students": [s.user for s in unregistered_students],
+                "students_in_multiple_teams": students_multiple_teams}
+
     class Meta(object):
         unique_together = ("assignment_id", "course")    
 
@@ -248,6 +470,13 @@ class Team(models.Model):
     extensions = models.IntegerField(default=0, validators = [MinValueValidator(0)])
     active = models.BooleanField(default = True)
     
+    # Extensions used in the team's final submissions
+    # (see update_extensions_ledger)
+    extensions_used = models.IntegerField(default=0)
+    
+    # Last time the team or its members changed (see the change feed)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
     students = models.ManyToManyField(Student, through='TeamMember', related_name="team_member_in")
     
     registrations = models.ManyToManyField(Assignment, through='Registration') 
@@ -255,6 +484,12 @@ class Team(models.Model):
     def __unicode__(self):
         return u"Team %s in %s" % (self.team_id, self.course.course_id)         
     
+    def save(self, *args, **kwargs):
+        # The ledger is only changed by update_extensions_ledger
+        if not kwargs.get("force_insert"):
+            kwargs["update_fields"] = get_saved_fields(self, ["extensions_used"], kwargs.get("update_fields"))
+        super(Team, self).save(*args, **kwargs)
+    
     def is_registered_for_assignment(self, assignment):
         return self.registrations.filter(assignment_id = assignment.assignment_id).exists()
     
@@ -276,22 +511,26 @@ class Team(models.Model):
         except TeamMember.DoesNotExist:
             return None        
         
+    @classmethod
+    def get_extensions_used_subquery(cls):
+        # Computes extensions_used from the final submissions
+        extensions_used = Registration.objects.filter(team = OuterRef("pk")) \
+                                              .order_by() \
+                                              .values("team") \
+                                              .annotate(extensions_used = Sum("final_submission__extensions_used")) \
+                                              .values("extensions_used")
+        return Coalesce(Subquery(extensions_used, output_field = IntegerField()), 0)
+        
     def get_extensions_used(self):
-        extensions = 0
-        for r in self.registration_set.all():
-            if r.final_submission is not None:
-                extensions += r.final_submission.extensions_used
-        return extensions 
+        return self.extensions_used
         
     def get_extensions_available(self):
         if self.course.extension_policy == Course.EXT_PER_TEAM:
-            return self.extensions - self.get_extensions_used()    
+            return self.extensions - self.extensions_used    
         elif self.course.extension_policy == Course.EXT_PER_STUDENT:
-            student_extensions_available = []
-            for student in self.students.all():
-                a = student.get_extensions_available()
-                student_extensions_available.append(a)
-            return min(student_extensions_available)
+            # The smallest number of extensions available to any
+            # of the students in the team
+            return self.students.aggregate(extensions_available = Min(F("extensions") - F("extensions_used")))["extensions_available"]
         else:
             raise IntegrityError("course.extension_policy has invalid value: %s" % (self.course.extension_policy))          
     
@@ -305,7 +544,9 @@ class TeamMember(models.Model):
     confirmed = models.BooleanField(default = False)
     
     class Meta(object):
-        unique_together = ("student", "team")        
+        unique_together = ("student", "team")
+        # Same as above, for looking up the members of a team
+        indexes = [models.Index(fields = ["team", "student"])]        
         
 class Registration(models.Model):
     team = models.ForeignKey(Team, on_delete=models.CASCADE)
@@ -317,6 +558,8 @@ class Registration(models.Model):
     grading_started = models.BooleanField(default=False)
     gradescope_uploaded = models.BooleanField(default=False)
 
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
     def is_ready_for_grading(self):
         if self.final_submission is None:
             return False
@@ -326,8 +569,33 @@ class Registration(models.Model):
                                                    extensions_used=self.final_submission.extensions_used,
                                                    assignment_grace_period=self.assignment.grace_period)
 
+    def get_grade_adjustments(self):
+        if self.grade_adjustments is None:
+            return []
+        else:
+            return [Decimal(str(v)) for v in self.grade_adjustments.values()]
+
+    def get_total_penalties(self):
+        return sum([v for v in self.get_grade_adjustments() if v < 0])
+
+    def get_total_bonuses(self):
+        return sum([v for v in self.get_grade_adjustments() if v >= 0])
+
+    def get_total_grade(self):
+        # Uses the total_points annotation, if available, to avoid
+        # fetching the grades
+        if hasattr(self, "total_points"):
+            total_points = self.total_points
+        else:
+            total_points = self.grade_set.aggregate(Sum("points"))["points__sum"]
+
+        return (total_points or 0) + sum(self.get_grade_adjustments())
+
     class Meta(object):
         unique_together = ("team", "assignment")
+        # The unique index on (team, assignment) can't be used to
+        # look up all the registrations for an assignment
+        indexes = [models.Index(fields = ["assignment", "team"])]
 
 
 class SubmissionValidationException(Exception):
@@ -342,6 +610,7 @@ class Submission(models.Model):
     submitted_at = models.DateTimeField(auto_now_add=True)
     submitted_by = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
     in_grace_period = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
     
     @classmethod
     def create(cls, registration, commit_sha, submitted_at, submitted_by, extensions_override):
@@ -363,7 +632,8 @@ class Submission(models.Model):
                 
         if extensions_available < 0:
             msg = "The number of available extensions is negative"
-            return False, Response({"fatal": [msg]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR), None           
+            response = Response({"fatal": [msg]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            raise SubmissionValidationException(response)
 
         if registration.final_submission is not None:
             extensions_used_in_existing_submission = registration.final_submission.extensions_used
@@ -422,7 +692,296 @@ class Grade(models.Model):
     rubric_component = models.ForeignKey(RubricComponent, on_delete=models.CASCADE)
     
     points = models.DecimalField(max_digits=5, decimal_places=2)
+
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
     
+    @classmethod
+    def upsert(cls, grades):
+        # Takes a list of (registration, rubric_component, points) tuples,
+        # fetches the existing grades with a single query, and then
+        # updates and creates grades in bulk. Should be called inside
+        # a transaction. Returns the number of grades created and updated.
+        registration_ids = set([registration.pk for registration, _, _ in grades])
+        existing = dict([((g.registration_id, g.rubric_component_id), g) 
+                          for g in cls.objects.filter(registration__in=registration_ids)])
+
+        # bulk_update doesn't send pre_save (see the change feed)
+        now = timezone.now()
+
+        to_create = {}
+        to_update = {}
+        for registration, rubric_component, points in grades:
+            key = (registration.pk, rubric_component.pk)
+            if key in existing:
+                grade = existing[key]
+                grade.points = points
+                grade.updated_at = now
+                to_update[key] = grade
+            else:
+                to_create[key] = cls(registration = registration,
+                                     rubric_component = rubric_component,
+                                     points = points)
+
+        cls.objects.bulk_update(list(to_update.values()), ["points", "updated_at"])
+        cls.objects.bulk_create(list(to_create.values()))
+
+        return len(to_create), len(to_update)
+
     class Meta(object):
-        unique_together = ("registration", "rubric_component")    
-    
+        unique_together = ("registration", "rubric_component")
+
+
+class Deletion(models.Model):
+    # A deleted team, registration, submission or grade (see the change feed)
+    TEAM = "team"
+    REGISTRATION = "registration"
+    SUBMISSION = "submission"
+    GRADE = "grade"
+
+    KIND_CHOICES = (
+        (TEAM, "Team"),
+        (REGISTRATION, "Registration"),
+        (SUBMISSION, "Submission"),
+        (GRADE, "Grade"),
+    )
+
+    # Deletions are recorded while a course is being deleted, after its
+    # related objects have been collected, so they are removed separately
+    # (see course_deleted) and the foreign key can't be enforced
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, db_constraint=False)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    team_id = models.SlugField(max_length=128)
+    assignment_id = models.SlugField(max_length=128, blank=True)
+    # The primary key of a deleted submission or grade
+    object_id = models.IntegerField(null=True)
+    # The students in a deleted team, who can no longer be found through
+    # the team's members (this isn't enforced either, for the same reason)
+    students = models.ManyToManyField(Student, db_constraint=False)
+
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+# Extension ledger
+#
+# Team.extensions_used and Student.extensions_used hold the extensions
+# used in the final submissions of a team and of all of a student's
+# teams, so the extensions available can be read without going through
+# the submissions. Whenever a final submission is set, replaced or
+# cancelled, a submission is edited or deleted, or a team's membership
+# changes, they are recomputed for the affected team and students from
+# the Submission rows, in the same transaction as the change.
+#
+# Recomputing (instead of adding and subtracting the difference) keeps
+# the ledger correct when deletes cascade (e.g., deleting a team deletes
+# its registrations and members, in an order we don't control).
+
+def update_extensions_ledger(team_ids = (), student_ids = ()):
+    # Recomputes the ledger for the given teams, the students in
+    # them, and the given students
+    if len(team_ids) > 0:
+        Team.objects.filter(pk__in = team_ids).update(extensions_used = Team.get_extensions_used_subquery())
+    if len(team_ids) > 0 or len(student_ids) > 0:
+        students = Student.objects.filter(Q(pk__in = student_ids) | Q(teammember__team__in = team_ids))
+        Student.objects.filter(pk__in = students.values("pk")).update(extensions_used = Student.get_extensions_used_subquery())
+
+def check_extensions_ledger(courses = None, fix = False):
+    # Compares the ledger against the Submission rows, and returns the
+    # teams and students that don't match as a list of
+    # (team or student, extensions_used in the ledger, actual extensions_used)
+    # tuples. If fix is True, the ledger is rebuilt for those teams
+    # and students.
+    teams = Team.objects.all()
+    students = Student.objects.all()
+    if courses is not None:
+        teams = teams.filter(course__in = courses)
+        students = students.filter(course__in = courses)
+    
+    teams = teams.annotate(actual_extensions_used = Team.get_extensions_used_subquery()) \
+                 .exclude(extensions_used = F("actual_extensions_used")) \
+                 .select_related("course")
+    students = students.annotate(actual_extensions_used = Student.get_extensions_used_subquery()) \
+                       .exclude(extensions_used = F("actual_extensions_used")) \
+                       .select_related("course", "user")
+
+    mismatches = [(obj, obj.extensions_used, obj.actual_extensions_used) for obj in list(teams) + list(students)]
+    
+    if fix and len(mismatches) > 0:
+        update_extensions_ledger(team_ids = [obj.pk for obj, _, _ in mismatches if isinstance(obj, Team)],
+                                 student_ids = [obj.pk for obj, _, _ in mismatches if isinstance(obj, Student)])
+    
+    return mismatches
+
+@receiver(post_save, sender=Registration)
+def registration_saved(sender, instance, created, raw, update_fields, **kwargs):
+    if created and instance.final_submission_id is None:
+        return
+    if update_fields is not None and "final_submission" not in update_fields:
+        return
+    update_extensions_ledger(team_ids = [instance.team_id])
+    
+@receiver(post_delete, sender=Registration)
+def registration_deleted(sender, instance, **kwargs):
+    if instance.final_submission_id is not None:
+        update_extensions_ledger(team_ids = [instance.team_id])
+
+@receiver(post_save, sender=Submission)
+def submission_saved(sender, instance, created, raw, **kwargs):
+    # A new submission can't be a final submission yet (except
+    # when loading fixtures)
+    if created and not raw:
+        return
+    team_ids = list(Registration.objects.filter(final_submission = instance).values_list("team_id", flat=True))
+    if len(team_ids) > 0:
+        update_extensions_ledger(team_ids = team_ids)
+
+@receiver(post_delete, sender=Submission)
+def submission_deleted(sender, instance, **kwargs):
+    # By now, the registration's final_submission has been set to null
+    update_extensions_ledger(team_ids = list(Registration.objects.filter(pk = instance.registration_id)
+                                                                 .values_list("team_id", flat=True)))
+
+@receiver(post_save, sender=TeamMember)
+@receiver(post_delete, sender=TeamMember)
+def teammember_changed(sender, instance, **kwargs):
+    update_extensions_ledger(student_ids = [instance.student_id])
+
+def record_course_changes(course_ids):
+    # Bumps the version of the courses, which changes the ETags of all
+    # their GET responses, and invalidates their cached responses
+    # (see get_cached_response). Anything that changes a course without
+    # sending post_save/post_delete signals (e.g., bulk updates) must
+    # call this.
+    course_ids = set(course_ids)
+    if len(course_ids) == 0:
+        return
+    
+    # The version is bumped once the changes are committed, so writes
+    # in the same course don't all have to wait to update the course
+    # (and nothing is bumped if they're rolled back)
+    transaction.on_commit(lambda: Course.objects.filter(pk__in = course_ids).update(version = F("version") + 1))
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    record_course_changes([instance.pk])
+
+@receiver(post_save, sender=Instructor)
+@receiver(post_delete, sender=Instructor)
+@receiver(post_save, sender=Grader)
+@receiver(post_delete, sender=Grader)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+def course_object_changed(sender, instance, **kwargs):
+    record_course_changes([instance.course_id])
+
+# The related objects are looked up with queries, not through the
+# instance, because they may have already been deleted if the course
+# is being deleted.
+@receiver(post_save, sender=RubricComponent)
+@receiver(post_delete, sender=RubricComponent)
+def rubric_component_changed(sender, instance, **kwargs):
+    record_course_changes(Assignment.objects.filter(pk = instance.assignment_id).values_list("course_id", flat=True))
+
+@receiver(post_save, sender=TeamMember)
+@receiver(post_delete, sender=TeamMember)
+@receiver(post_save, sender=Registration)
+@receiver(post_delete, sender=Registration)
+def team_object_changed(sender, instance, **kwargs):
+    record_course_changes(Team.objects.filter(pk = instance.team_id).values_list("course_id", flat=True))
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+def registration_object_changed(sender, instance, **kwargs):
+    record_course_changes(Registration.objects.filter(pk = instance.registration_id)
+                                              .values_list("team__course_id", flat=True))
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_course_changed(sender, instance, **kwargs):
+    record_course_changes(Course.objects.filter(Q(instructor__user = instance) | 
+                                                Q(grader__user = instance) | 
+                                                Q(student__user = instance))
+                                        .values_list("pk", flat=True))
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    get_token_cache().invalidate([instance.key])
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # The cached tokens include the user (and whether they are active,
+    # staff, etc.)
+    get_token_cache().invalidate_user(instance.pk, Token.objects.filter(user_id = instance.pk)
+                                                              .values_list("key", flat=True))
+
+
+# Change feed
+#
+# Teams, registrations, submissions and grades have an updated_at
+# timestamp, and their deletions are recorded as Deletion rows, so the
+# objects that changed in a course since a given time can be fetched
+# without going through the whole course (see CourseChanges). Anything
+# that changes them without calling save() (e.g., bulk updates) must set
+# updated_at itself. Changes to a team's members count as changes to the
+# team.
+#
+# updated_at is set here, and not with auto_now, so that it also gets
+# a value when loading fixtures that don't include it.
+
+@receiver(pre_save, sender=Team)
+@receiver(pre_save, sender=Registration)
+@receiver(pre_save, sender=Submission)
+@receiver(pre_save, sender=Grade)
+def change_feed_object_saved(sender, instance, raw, **kwargs):
+    if not raw:
+        instance.updated_at = timezone.now()
+
+@receiver(post_save, sender=TeamMember)
+@receiver(post_delete, sender=TeamMember)
+def teammember_team_changed(sender, instance, **kwargs):
+    Team.objects.filter(pk = instance.team_id).update(updated_at = timezone.now())
+
+@receiver(pre_delete, sender=Team)
+def team_pre_deletion(sender, instance, **kwargs):
+    # The team's members are deleted before the team
+    instance._deleted_student_ids = list(instance.teammember_set.values_list("student_id", flat=True))
+
+@receiver(post_delete, sender=Team)
+def team_deletion(sender, instance, **kwargs):
+    deletion = Deletion.objects.create(course_id = instance.course_id, kind = Deletion.TEAM, 
+                                       team_id = instance.team_id)
+    deletion.students.add(*getattr(instance, "_deleted_student_ids", []))
+
+@receiver(post_delete, sender=Registration)
+def registration_deletion(sender, instance, **kwargs):
+    teams = Team.objects.filter(pk = instance.team_id).values_list("course_id", "team_id")
+    assignment_ids = Assignment.objects.filter(pk = instance.assignment_id).values_list("assignment_id", flat=True)
+    for course_id, team_id in teams:
+        for assignment_id in assignment_ids:
+            Deletion.objects.create(course_id = course_id, kind = Deletion.REGISTRATION, 
+                                    team_id = team_id, assignment_id = assignment_id)
+
+@receiver(post_delete, sender=Submission)
+@receiver(post_delete, sender=Grade)
+def registration_object_deletion(sender, instance, **kwargs):
+    if sender is Submission:
+        kind = Deletion.SUBMISSION
+    else:
+        kind = Deletion.GRADE
+    registrations = Registration.objects.filter(pk = instance.registration_id) \
+                                        .values_list("team__course_id", "team__team_id", "assignment__assignment_id")
+    for course_id, team_id, assignment_id in registrations:
+        Deletion.objects.create(course_id = course_id, kind = kind, team_id = team_id, 
+                                assignment_id = assignment_id, object_id = instance.pk)
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    Deletion.objects.filter(course_id = instance.pk).delete()
@@ -0,0 +1,46 @@
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def _get_lines(stream, parser_context):
+    encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+    return codecs.iterdecode(stream, encoding)
+
+
+class CSVParser(BaseParser):
+    """
+    Parses a CSV file with a header row into a list of dicts
+    (one per row, mapping each column name to its value).
+    """
+
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return [dict(row) for row in csv.DictReader(_get_lines(stream, parser_context))]
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ParseError("CSV parse error - %s" % str(e))
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON (one JSON value per line) into
+    a list of values. Blank lines are ignored.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        values = []
+        try:
+            for lineno, line in enumerate(_get_lines(stream, parser_context), 1):
+                if line.strip() != "":
+                    values.append(json.loads(line))
+        except ValueError as e:
+            raise ParseError("NDJSON parse error in line %i - %s" % (lineno, str(e)))
+        return values
@@ -4,38 +4,131 @@ from chisubmit.backend.api.models import Course, GradersAndStudents, AllExceptAd
     OwnerPermissions, Read, RubricComponent, TeamMember, Registration,\
     Submission, Grade
 from django.contrib.auth.models import User
-from rest_framework.reverse import reverse
-from rest_framework.relations import RelatedField
+from chisubmit.backend.api.helpers import get_url_templates, get_requested_fields
+from rest_framework.fields import SkipField
+from rest_framework.relations import RelatedField, PKOnlyObject
+from collections import OrderedDict
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils.encoding import smart_text
 from django.utils.translation import ugettext_lazy
 
 class ChisubmitSerializer(serializers.Serializer):
     
-    def to_representation(self, obj):
-        # TODO: Avoid generating the representation for fields that
-        # aren't going to be returned anyways
-        data = super(ChisubmitSerializer, self).to_representation(obj)
-
-        course = self.context.get("course", None)
-        request = self.context.get("request", None)
-        if request is not None:
-            user = request.user
-        else:
-            user = None
+    # The names of the fields in hidden_fields that are hidden for
+    # a given set of roles, keyed by (serializer class, roles, is_owner)
+    _hidden_field_names = {}
+    
+    # The model fields used by each SerializerMethodField (so querysets
+    # can be restricted to the fields requested with ?fields=)
+    method_field_sources = {}
+    
+    @classmethod
+    def get_hidden_field_names(cls, roles, is_owner):
+        key = (cls, frozenset(roles), is_owner)
+        hidden_field_names = ChisubmitSerializer._hidden_field_names.get(key)
+        
+        if hidden_field_names is None:
+            hidden_fields = getattr(cls, "hidden_fields", {})
+            owner_override = getattr(cls, "owner_override", {})
+            hidden_field_names = set()
+            for f, hidden_for in hidden_fields.items():
+                if not (is_owner and OwnerPermissions.READ in owner_override.get(f, [])):
+                    if key[1].issubset(hidden_for):
+                        hidden_field_names.add(f)
+            hidden_field_names = frozenset(hidden_field_names)
+            ChisubmitSerializer._hidden_field_names[key] = hidden_field_names
+            
+        return hidden_field_names
+    
+    def get_hidden_fields_for_request(self):
+        # Fields are only hidden when serializing for a user in a course.
+        # Since the context doesn't change, this is computed once per
+        # serializer (with many=True, the same child serializer is used
+        # for every object)
+        if not hasattr(self, "_hidden_fields_for_request"):
+            course = self.context.get("course", None)
+            request = self.context.get("request", None)
+            
+            if course is not None and request is not None and request.user is not None:
+                self._hidden_fields_for_request = self.get_hidden_field_names(self.context.get("roles", set()),
+                                                                              self.context.get("is_owner", False))
+            else:
+                self._hidden_fields_for_request = frozenset()
+                
+        return self._hidden_fields_for_request
+    
+    def get_requested_fields(self):
+        # The fields requested with ?fields= (or with a "fields" entry
+        # in the context), or None if all fields were requested. This
+        # only applies to the objects at the top level of the response,
+        # not to nested objects.
+        if not hasattr(self, "_requested_fields"):
+            if "fields" in self.context:
+                fields = self.context["fields"]
+            elif self.context.get("request", None) is not None:
+                fields = get_requested_fields(self.context["request"])
+            else:
+                fields = None
+                
+            parent = self.parent
+            if isinstance(parent, serializers.ListSerializer):
+                parent = parent.parent
+            if parent is not None:
+                fields = None
+                
+            self._requested_fields = fields
+        
+        return self._requested_fields
+    
+    @classmethod
+    def get_model_fields(cls, field_names):
+        # Returns the names of the model fields needed to serialize the
+        # given fields, or None if we can't tell (a SerializerMethodField
+        # not included in method_field_sources)
+        model_fields = set()
+        for name in field_names:
+            field = cls._declared_fields.get(name)
+            if field is None:
+                continue
+            elif isinstance(field, serializers.SerializerMethodField):
+                if name not in cls.method_field_sources:
+                    return None
+                model_fields.update(cls.method_field_sources[name])
+            else:
+                source = field.source or name
+                if source == "*":
+                    return None
+                model_fields.add(source.split(".")[0])
+        return model_fields
+    
+    def reverse(self, viewname, args):
+        return get_url_templates(self.context["request"]).reverse(viewname, args)
 
-        if course is not None and user is not None:
-            is_owner = self.context.get("is_owner", False)
-            owner_override = getattr(self, "owner_override", {})
+    def to_representation(self, obj):
+        # Same as Serializer.to_representation, except fields that are
+        # hidden to the user, or that weren't requested, are skipped
+        # before getting their value (so, e.g., SerializerMethodFields
+        # for those fields are never called)
+        hidden = self.get_hidden_fields_for_request()
+        requested = self.get_requested_fields()
+        data = OrderedDict()
+        
+        for field in self._readable_fields:
+            if field.field_name in hidden:
+                continue
+            if requested is not None and field.field_name not in requested:
+                continue
             
-            if hasattr(self, "hidden_fields"):
-                roles = self.context.get("roles", set())
-                fields = list(data.keys())
-                for f in fields:
-                    if f in self.hidden_fields:
-                        if not (is_owner and OwnerPermissions.READ in owner_override.get(f, [])):
-                            if roles.issubset(self.hidden_fields[f]):
-                                data.pop(f)
+            try:
+                attribute = field.get_attribute(obj)
+            except SkipField:
+                continue
+
+            check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            if check_for_none is None:
+                data[field.field_name] = None
+            else:
+                data[field.field_name] = field.to_representation(attribute)
         
         return data
     
@@ -126,23 +219,30 @@ class CourseSerializer(ChisubmitSerializer):
                         "default_extensions": AllExceptAdmin
                       }
 
+    method_field_sources = { "url": ["course_id"],
+                             "instructors_url": ["course_id"],
+                             "graders_url": ["course_id"],
+                             "students_url": ["course_id"],
+                             "assignments_url": ["course_id"],
+                             "teams_url": ["course_id"] }
+
     def get_url(self, obj):
-        return reverse('course-detail', args=[obj.course_id], request=self.context["request"])
+        return self.reverse('course-detail', [obj.course_id])
 
     def get_instructors_url(self, obj):
-        return reverse('instructor-list', args=[obj.course_id], request=self.context["request"])    
+        return self.reverse('instructor-list', [obj.course_id])    
 
     def get_graders_url(self, obj):
-        return reverse('grader-list', args=[obj.course_id], request=self.context["request"])    
+        return self.reverse('grader-list', [obj.course_id])    
     
     def get_students_url(self, obj):
-        return reverse('student-list', args=[obj.course_id], request=self.context["request"])    
+        return self.reverse('student-list', [obj.course_id])    
     
     def get_assignments_url(self, obj):
-        return reverse('assignment-list', args=[obj.course_id], request=self.context["request"])      
+        return self.reverse('assignment-list', [obj.course_id])      
 
     def get_teams_url(self, obj):
-        return reverse('team-list', args=[obj.course_id], request=self.context["request"])      
+        return self.reverse('team-list', [obj.course_id])      
     
     def create(self, validated_data):
         return Course.objects.create(**validated_data)
@@ -201,8 +301,10 @@ class InstructorSerializer(ChisubmitSerializer):
     owner_override = {"git_username": ReadWrite,
                       "git_staging_username": ReadWrite }
     
+    method_field_sources = { "url": ["user"] }
+
     def get_url(self, obj):
-        return reverse('instructor-detail', args=[self.context["course"].course_id, obj.user.username], request=self.context["request"])
+        return self.reverse('instructor-detail', [self.context["course"].course_id, obj.user.username])
     
     def create(self, validated_data):
         return Instructor.objects.create(**validated_data)
@@ -236,8 +338,10 @@ class StudentSerializer(ChisubmitSerializer):
     
     owner_override = { "git_username": ReadWrite }
         
+    method_field_sources = { "url": ["user"] }
+
     def get_url(self, obj):
-        return reverse('student-detail', args=[self.context["course"].course_id, obj.user.username], request=self.context["request"])
+        return self.reverse('student-detail', [self.context["course"].course_id, obj.user.username])
     
     def create(self, validated_data):
         if "extensions" not in validated_data and self.context["course"].extension_policy == "per-student":
@@ -278,6 +382,8 @@ class GraderSerializer(ChisubmitSerializer):
     owner_override = {"git_username": ReadWrite,
                       "git_staging_username": ReadWrite }    
 
+    method_field_sources = { "url": ["user"] }
+
     def get_fields(self, *args, **kwargs):
         fields = super(GraderSerializer, self).get_fields(*args, **kwargs)
         qs = fields['conflicts_usernames'].child_relation.queryset 
@@ -285,7 +391,7 @@ class GraderSerializer(ChisubmitSerializer):
         return fields
     
     def get_url(self, obj):
-        return reverse('grader-detail', args=[self.context["course"].course_id, obj.user.username], request=self.context["request"])
+        return self.reverse('grader-detail', [self.context["course"].course_id, obj.user.username])
     
     def create(self, validated_data):
         return Grader.objects.create(**validated_data)
@@ -324,11 +430,14 @@ class AssignmentSerializer(ChisubmitSerializer):
                         "max_students": GradersAndStudents
                       }       
     
+    method_field_sources = { "url": ["assignment_id"],
+                             "rubric_url": ["assignment_id"] }
+
     def get_url(self, obj):
-        return reverse('assignment-detail', args=[self.context["course"].course_id, obj.assignment_id], request=self.context["request"])
+        return self.reverse('assignment-detail', [self.context["course"].course_id, obj.assignment_id])
 
     def get_rubric_url(self, obj):
-        return reverse('rubric-list', args=[self.context["course"].course_id, obj.assignment_id], request=self.context["request"])
+        return self.reverse('rubric-list', [self.context["course"].course_id, obj.assignment_id])
     
     def create(self, validated_data):
         return Assignment.objects.create(**validated_data)
@@ -359,8 +468,10 @@ class RubricComponentSerializer(ChisubmitSerializer):
                         "points": GradersAndStudents
                       }       
     
+    method_field_sources = { "url": ["assignment"] }
+
     def get_url(self, obj):
-        return reverse('rubric-detail', args=[self.context["course"].course_id, obj.assignment.assignment_id, obj.pk], request=self.context["request"])
+        return self.reverse('rubric-detail', [self.context["course"].course_id, obj.assignment.assignment_id, obj.pk])
     
     def create(self, validated_data):
         return RubricComponent.objects.create(**validated_data)
@@ -387,14 +498,18 @@ class TeamSerializer(ChisubmitSerializer):
                         "extensions": GradersAndStudents
                       }       
     
+    method_field_sources = { "url": ["team_id"],
+                             "students_url": ["team_id"],
+                             "assignments_url": ["team_id"] }
+
     def get_url(self, obj):
-        return reverse('team-detail', args=[self.context["course"].course_id, obj.team_id], request=self.context["request"])
+        return self.reverse('team-detail', [self.context["course"].course_id, obj.team_id])
 
     def get_students_url(self, obj):
-        return reverse('teammember-list', args=[self.context["course"].course_id, obj.team_id], request=self.context["request"])
+        return self.reverse('teammember-list', [self.context["course"].course_id, obj.team_id])
 
     def get_assignments_url(self, obj):
-        return reverse('registration-list', args=[self.context["course"].course_id, obj.team_id], request=self.context["request"])
+        return self.reverse('registration-list', [self.context["course"].course_id, obj.team_id])
     
     def create(self, validated_data):
         return Team.objects.create(**validated_data)
@@ -402,7 +517,7 @@ class TeamSerializer(ChisubmitSerializer):
     def update(self, instance, validated_data):
         instance.team_id = validated_data.get('team_id', instance.team_id)
         instance.extensions = validated_data.get('extensions', instance.extensions)
-        instance.active = validated_data.get('active', instance.min_students)
+        instance.active = validated_data.get('active', instance.active)
         instance.save()
         return instance         
     
@@ -419,6 +534,8 @@ class TeamMemberSerializer(ChisubmitSerializer):
     
     readonly_fields = { "confirmed": GradersAndStudents }        
 
+    method_field_sources = { "url": ["team", "student"] }
+
     def get_fields(self, *args, **kwargs):
         fields = super(TeamMemberSerializer, self).get_fields(*args, **kwargs)
         qs = fields['username'].queryset 
@@ -426,7 +543,7 @@ class TeamMemberSerializer(ChisubmitSerializer):
         return fields
 
     def get_url(self, obj):
-        return reverse('teammember-detail', args=[self.context["course"].course_id, obj.team.team_id, obj.student.user.username], request=self.context["request"])
+        return self.reverse('teammember-detail', [self.context["course"].course_id, obj.team.team_id, obj.student.user.username])
     
     def create(self, validated_data):
         return TeamMember.objects.create(**validated_data)
@@ -455,13 +572,15 @@ class SubmissionSerializer(ChisubmitSerializer):
                       "submitted_by": GradersAndStudents
                       }   
 
+    method_field_sources = { "url": ["registration"] }
+
     def get_url(self, obj):
         if obj.pk is None:
             # If we do a dry-run submission, we will be seralizing a Submission object that has not
             # been saved, and thus doesn't have a primary key (or an endpoint)
             return None
         else:
-            return reverse('submission-detail', args=[self.context["course"].course_id, obj.registration.team.team_id, obj.registration.assignment.assignment_id, obj.pk], request=self.context["request"])
+            return self.reverse('submission-detail', [self.context["course"].course_id, obj.registration.team.team_id, obj.registration.assignment.assignment_id, obj.pk])
     
     def create(self, validated_data):
         return Submission.objects.create(**validated_data)
@@ -516,6 +635,10 @@ class RegistrationSerializer(ChisubmitSerializer):
                     }   
 
 
+    method_field_sources = { "url": ["team", "assignment"],
+                             "submissions_url": ["team", "assignment"],
+                             "grades_url": ["team", "assignment"] }
+
     def get_fields(self, *args, **kwargs):
         fields = super(RegistrationSerializer, self).get_fields(*args, **kwargs)
 
@@ -528,13 +651,13 @@ class RegistrationSerializer(ChisubmitSerializer):
         return fields
 
     def get_url(self, obj):
-        return reverse('registration-detail', args=[self.context["course"].course_id, obj.team.team_id, obj.assignment.assignment_id], request=self.context["request"])
+        return self.reverse('registration-detail', [self.context["course"].course_id, obj.team.team_id, obj.assignment.assignment_id])
 
     def get_submissions_url(self, obj):
-        return reverse('submission-list', args=[self.context["course"].course_id, obj.team.team_id, obj.assignment.assignment_id], request=self.context["request"])
+        return self.reverse('submission-list', [self.context["course"].course_id, obj.team.team_id, obj.assignment.assignment_id])
 
     def get_grades_url(self, obj):
-        return reverse('grade-list', args=[self.context["course"].course_id, obj.team.team_id, obj.assignment.assignment_id], request=self.context["request"])
+        return self.reverse('grade-list', [self.context["course"].course_id, obj.team.team_id, obj.assignment.assignment_id])
     
     def create(self, validated_data):
         return Registration.objects.create(**validated_data)
@@ -586,8 +709,10 @@ class GradeSerializer(ChisubmitSerializer):
         
     readonly_fields = { "points": GradersAndStudents }       
     
+    method_field_sources = { "url": ["registration"] }
+
     def get_url(self, obj):
-        return reverse('grade-detail', args=[self.context["course"].course_id, obj.registration.team.team_id, obj.registration.assignment.assignment_id, obj.pk], request=self.context["request"])
+        return self.reverse('grade-detail', [self.context["course"].course_id, obj.registration.team.team_id, obj.registration.assignment.assignment_id, obj.pk])
         
     def create(self, validated_data):
         return Grade.objects.create(**validated_data)
@@ -599,3 +724,46 @@ class GradeSerializer(ChisubmitSerializer):
     
           
   
+class GradeBatchGradeSerializer(serializers.Serializer):
+    rubric_component_id = serializers.IntegerField()
+    points = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+class GradeBatchRegistrationSerializer(serializers.Serializer):
+    team_id = serializers.SlugField()
+    grades = GradeBatchGradeSerializer(many=True, required=False)
+    grade_adjustments = serializers.DictField(required=False,
+                                              child=serializers.DecimalField(max_digits=5, decimal_places=2))
+
+class GradeBatchRequestSerializer(serializers.Serializer):
+    registrations = GradeBatchRegistrationSerializer(many=True)
+
+class TeamBatchTeamSerializer(serializers.Serializer):
+    team_id = serializers.SlugField()
+    students = serializers.ListField(child = serializers.CharField())
+    assignments = serializers.ListField(child = serializers.SlugField(), required=False)
+    extensions = serializers.IntegerField(required=False, min_value=0)
+    active = serializers.BooleanField(required=False)
+
+class TeamBatchRequestSerializer(serializers.Serializer):
+    teams = TeamBatchTeamSerializer(many=True)
+    dry_run = serializers.BooleanField(default=False)
+
+class RosterEntrySerializer(UserSerializer):
+    type = serializers.ChoiceField(choices=["student", "instructor", "grader"])
+
+class RosterRequestSerializer(serializers.Serializer):
+    users = serializers.ListField(child = serializers.DictField())
+    sync = serializers.BooleanField(default=False)
+    dry_run = serializers.BooleanField(default=False)
+
+class AssignmentStatsSerializer(serializers.Serializer):
+    students = serializers.IntegerField()
+    dropped_students = serializers.IntegerField()
+    students_registered = serializers.IntegerField()
+    teams = serializers.IntegerField()
+    teams_submitted = serializers.IntegerField()
+    students_submitted = serializers.IntegerField()
+    unsubmitted_teams = serializers.ListField(child=serializers.SlugField())
+    unconfirmed_teams = serializers.ListField(child=serializers.SlugField())
+    unregistered_students = UserSerializer(many=True)
+    students_in_multiple_teams = serializers.ListField(child=serializers.CharField())
@@ -7,6 +7,8 @@ URL_PREFIX = r"^api/v1/"
 urlpatterns = [
     url(URL_PREFIX + r'courses/$', views.CourseList.as_view(), name="course-list"),
     url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/$', views.CourseDetail.as_view(), name="course-detail"),
+    url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/gradebook$', views.Gradebook.as_view(), name="gradebook"),
+    url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/changes$', views.CourseChanges.as_view(), name="course-changes"),
 
     url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/instructors/$', views.InstructorList.as_view(), name="instructor-list"),
     url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/instructors/(?P<username>[a-zA-Z0-9_-]+)$', views.InstructorDetail.as_view(), name="instructor-detail"),
@@ -17,6 +19,8 @@ urlpatterns = [
     url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/students/$', views.StudentList.as_view(), name="student-list"),
     url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/students/(?P<username>[a-zA-Z0-9_-]+)$', views.StudentDetail.as_view(), name="student-detail"),
 
+    url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/roster/$', views.RosterImport.as_view(), name="roster-import"),
+
     url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/assignments/$', views.AssignmentList.as_view(), name="assignment-list"),
     url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/assignments/(?P<assignment_id>[a-zA-Z0-9_-]+)$', views.AssignmentDetail.as_view(), name="assignment-detail"),
 
@@ -24,8 +28,11 @@ urlpatterns = [
     url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/assignments/(?P<assignment_id>[a-zA-Z0-9_-]+)/rubric/(?P<rubric_component_id>[0-9]+)$', views.RubricDetail.as_view(), name="rubric-detail"),
 
     url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/assignments/(?P<assignment_id>[a-zA-Z0-9_-]+)/register', views.Register.as_view(), name="register"),
+    url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/assignments/(?P<assignment_id>[a-zA-Z0-9_-]+)/grades$', views.GradeBatch.as_view(), name="grade-batch"),
+    url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/assignments/(?P<assignment_id>[a-zA-Z0-9_-]+)/stats$', views.AssignmentStats.as_view(), name="assignment-stats"),
 
     url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/teams/$', views.TeamList.as_view(), name="team-list"),
+    url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/teams/batch/$', views.TeamBatch.as_view(), name="team-batch"),
     url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/teams/(?P<team_id>[a-zA-Z0-9_-]+)$', views.TeamDetail.as_view(), name="team-detail"),
 
     url(URL_PREFIX + r'courses/(?P<course_id>[a-zA-Z0-9_-]+)/teams/(?P<team_id>[a-zA-Z0-9_-]+)/students/$', views.TeamMemberList.as_view(), name="teammember-list"),
@@ -48,6 +55,8 @@ urlpatterns = [
     
     url(URL_PREFIX + r'user/$', views.AuthUserDetail.as_view(), name="auth-user-detail"),
     url(URL_PREFIX + r'user/token/$', views.AuthUserToken.as_view(), name="auth-user-token"),
+
+    url(URL_PREFIX + r'cache/stats/$', views.CacheStats.as_view(), name="cache-stats"),
 ]
 
 urlpatterns = format_suffix_patterns(urlpatterns)
\ No newline at end of file
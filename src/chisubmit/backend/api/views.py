@@ -4,24 +4,40 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from chisubmit.backend.api.models import Course, Student, Instructor, Grader,\
-    Assignment, Team, RubricComponent, get_user_by_username, TeamMember,\
-    Registration, Submission, Grade, CourseRoles, SubmissionValidationException
+    Assignment, Team, RubricComponent, TeamMember,\
+    Registration, Submission, Grade, CourseRoles, SubmissionValidationException,\
+    record_course_changes, Deletion, update_extensions_ledger
 from chisubmit.backend.api.serializers import CourseSerializer,\
     StudentSerializer, InstructorSerializer, GraderSerializer,\
     AssignmentSerializer, TeamSerializer, UserSerializer,\
     RubricComponentSerializer, RegistrationRequestSerializer, RegistrationSerializer, TeamMemberSerializer,\
     RegistrationResponseSerializer, SubmissionSerializer,\
-    SubmissionRequestSerializer, SubmissionResponseSerializer, GradeSerializer
+    SubmissionRequestSerializer, SubmissionResponseSerializer, GradeSerializer,\
+    GradeBatchRequestSerializer, AssignmentStatsSerializer,\
+    TeamBatchRequestSerializer, RosterRequestSerializer, RosterEntrySerializer
 from rest_framework.exceptions import PermissionDenied
 from django.contrib.auth.models import User
-from django.db import Error
-from rest_framework.authentication import BasicAuthentication,\
-    TokenAuthentication
+from django.db import Error, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
+from rest_framework.fields import DateTimeField
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.parsers import JSONParser
+from chisubmit.backend.api.parsers import CSVParser, NDJSONParser
+from chisubmit.backend.api.authentication import CachingTokenAuthentication
+from chisubmit.backend.api.cache import get_cached_response, read_cache_stats
 from rest_framework.authtoken.models import Token
 from chisubmit.common.utils import get_datetime_now_utc
 from chisubmit.backend.api.helpers import get_course_person, get_assignment,\
     get_team, get_course, get_rubric_component, get_team_member,\
-    get_registration, get_submission, get_grade
+    get_registration, get_submission, get_grade, prefetch_teams, paginate,\
+    get_pagination_headers, is_streaming_request, iterate_in_chunks,\
+    get_streaming_response, get_csv_streaming_response,\
+    get_columnar_streaming_response, lock_rows, only_requested_fields,\
+    course_etag
+from django.db.models import Prefetch, Q
 
 class CourseList(APIView):
     def get(self, request, format=None):
@@ -31,7 +47,8 @@ class CourseList(APIView):
         else:
             courses = Course.objects.filter(archived=False)
         if not (request.user.is_staff or request.user.is_superuser):
-            courses = [c for c in courses if c.has_user(request.user)]
+            courses = Course.filter_by_user(courses, request.user)
+        courses = only_requested_fields(request, courses, CourseSerializer)
         response_courses = []
         for course in courses:
             serializer = CourseSerializer(course, context={'request': request, 'course': course})
@@ -59,8 +76,13 @@ class CourseList(APIView):
   
 class CourseDetail(APIView):
             
+    @course_etag
     def get(self, request, course_id, format=None):
         course_obj, roles = get_course(request, course_id)
+        return get_cached_response(request, course_obj, roles, "course-detail",
+                                   lambda: self._get(request, course_obj, roles))
+
+    def _get(self, request, course_obj, roles):
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
         
         serializer = CourseSerializer(course_obj, context=serializer_context)
@@ -93,6 +115,7 @@ class CourseDetail(APIView):
                 
  
 class PersonList(APIView):
+    @course_etag
     def get(self, request, course_id, format=None):
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
@@ -100,10 +123,12 @@ class PersonList(APIView):
         if not (CourseRoles.ADMIN in roles or CourseRoles.INSTRUCTOR in roles or CourseRoles.GRADER in roles):
             raise PermissionDenied
         
-        persons = self.person_class.objects.filter(course = course_obj)
+        persons = self.person_class.objects.filter(course = course_obj).select_related("user")
+        persons = only_requested_fields(request, persons, self.person_serializer, "user__username")
+        persons, next_url = paginate(request, persons, "user__username")
         
         serializer = self.person_serializer(persons, many=True, context=serializer_context)
-        return Response(serializer.data)
+        return Response(serializer.data, headers=get_pagination_headers(next_url))
 
     def post(self, request, course_id, format=None):
         course_obj, roles = get_course(request, course_id)
@@ -131,6 +156,7 @@ class PersonDetail(APIView):
     def get_person(self, request, course_obj, roles, username):
         return get_course_person(course_obj, request.user, roles, self.person_class, username)
             
+    @course_etag
     def get(self, request, course_id, username, format=None):
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}        
@@ -201,31 +227,190 @@ class StudentDetail(PersonDetail):
     person_str = "student"    
     
     
+class RosterImport(APIView):
+    # The roster can also be sent as a CSV file (with a header row) or
+    # as NDJSON, with sync and dry_run in the query string
+    parser_classes = (JSONParser, CSVParser, NDJSONParser)
+
+    def post(self, request, course_id, format=None):
+        # Adds all the users in a roster to the course, creating the ones
+        # that don't exist yet, with a constant number of queries.
+        # Entries with errors are skipped, and the errors are reported
+        # for each entry.
+        course_obj, roles = get_course(request, course_id)
+
+        if not CourseRoles.ADMIN in roles:
+            raise PermissionDenied
+
+        if isinstance(request.data, list):
+            request_data = {"users": request.data}
+            for param in ("sync", "dry_run"):
+                if param in request.query_params:
+                    request_data[param] = request.query_params[param]
+        else:
+            request_data = request.data
+
+        serializer = RosterRequestSerializer(data=request_data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = serializer.validated_data["users"]
+        sync = serializer.validated_data["sync"]
+        dry_run = serializer.validated_data["dry_run"]
+
+        # Students in the roster are never dropped, even if their
+        # entries have errors
+        roster_students = set([e.get("username") for e in entries if e.get("type") == "student"])
+        usernames = set([e.get("username") for e in entries])
+
+        if course_obj.extension_policy == Course.EXT_PER_STUDENT:
+            default_extensions = course_obj.default_extensions
+        else:
+            default_extensions = 0
+
+        with transaction.atomic():
+            student_objs = dict([(s.user.username, s) for s in lock_rows(course_obj.student_set.select_related("user"))])
+            user_objs = dict([(u.username, u) for u in User.objects.filter(username__in = usernames)])
+            persons = {"student": set(student_objs),
+                       "instructor": set(course_obj.instructor_set.filter(user__username__in = usernames)
+                                                                  .values_list("user__username", flat=True)),
+                       "grader": set(course_obj.grader_set.filter(user__username__in = usernames)
+                                                          .values_list("user__username", flat=True))}
+
+            results = []
+            new_users = []
+            new_persons = []
+            undropped_students = []
+            seen = set()
+
+            for entry in entries:
+                entry_serializer = RosterEntrySerializer(data=entry)
+                if not entry_serializer.is_valid():
+                    errors = ["%s: %s" % (field, msg) for field, msgs in sorted(entry_serializer.errors.items()) for msg in msgs]
+                    results.append({"username": entry.get("username"), "errors": errors})
+                    continue
+
+                username = entry_serializer.validated_data["username"]
+                person_type = entry_serializer.validated_data["type"]
+                result = {"username": username, "type": person_type}
+
+                if (username, person_type) in seen:
+                    result["errors"] = ["User '%s' appears more than once as a %s" % (username, person_type)]
+                    results.append(result)
+                    continue
+                seen.add((username, person_type))
+
+                if username in user_objs:
+                    result["user"] = "exists"
+                else:
+                    user_objs[username] = User(username = username,
+                                               first_name = entry_serializer.validated_data["first_name"],
+                                               last_name = entry_serializer.validated_data["last_name"],
+                                               email = entry_serializer.validated_data["email"])
+                    new_users.append(username)
+                    result["user"] = "created"
+
+                if username not in persons[person_type]:
+                    persons[person_type].add(username)
+                    new_persons.append((person_type, username))
+                    result["person"] = "added"
+                elif person_type == "student" and student_objs[username].dropped:
+                    student_objs[username].dropped = False
+                    undropped_students.append(student_objs[username])
+                    result["person"] = "undropped"
+                else:
+                    result["person"] = "exists"
+
+                results.append(result)
+
+            dropped_students = []
+            if sync:
+                dropped_students = [s for username, s in sorted(student_objs.items())
+                                    if username not in roster_students and not s.dropped]
+                for student_obj in dropped_students:
+                    student_obj.dropped = True
+
+            if not dry_run:
+                try:
+                    with transaction.atomic():
+                        User.objects.bulk_create([user_objs[username] for username in new_users])
+
+                        # bulk_create doesn't set the primary keys on all backends
+                        user_pks = dict(User.objects.filter(username__in = set([u for _, u in new_persons]))
+                                                    .values_list("username", "pk"))
+
+                        person_classes = {"student": Student, "instructor": Instructor, "grader": Grader}
+                        for person_type, person_class in sorted(person_classes.items()):
+                            if person_type == "student":
+                                defaults = {"extensions": default_extensions}
+                            else:
+                                defaults = {}
+                            person_class.objects.bulk_create([person_class(course = course_obj, user_id = user_pks[username], **defaults)
+                                                              for t, username in new_persons if t == person_type])
+
+                        Student.objects.bulk_update(undropped_students + dropped_students, ["dropped"])
+                        record_course_changes([course_obj.pk])
+                except Error as e:
+                    return Response({"database": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        response_data = {"users": results,
+                         "dropped": [s.user.username for s in dropped_students],
+                         "dry_run": dry_run,
+                         "users_created": len(new_users),
+                         "added": len(new_persons),
+                         "undropped": len(undropped_students),
+                         "error": len([r for r in results if "errors" in r])}
+
+        return Response(response_data, status=status.HTTP_200_OK)
+
+    
 class AssignmentList(APIView):
+    def serialize_assignment(self, assignment, include, serializer_context):
+        asr = AssignmentSerializer(assignment, context=serializer_context)
+        serialized_assignment = asr.data 
+
+        # ?fields= only applies to the assignments
+        nested_context = dict(serializer_context, fields=None)
+
+        if "rubric" in include:
+            rcs = RubricComponentSerializer(assignment.rubriccomponent_set.all(), many=True, context=nested_context)
+            serialized_assignment["rubric"] = rcs.data
+            
+        return serialized_assignment
+    
+    @course_etag
     def get(self, request, course_id, format=None):
         course_obj, roles = get_course(request, course_id)
+
+        if is_streaming_request(request):
+            return self._get(request, course_obj, roles)
+        else:
+            return get_cached_response(request, course_obj, roles, "assignment-list",
+                                       lambda: self._get(request, course_obj, roles))
+
+    def _get(self, request, course_obj, roles):
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}   
                 
         assignments = Assignment.objects.filter(course = course_obj)
         
-        serialized_assignments = []
-
         include = request.query_params.getlist("include")
 
-        for assignment in assignments:
-            asr = AssignmentSerializer(assignment, context=serializer_context)
-            serialized_assignment = asr.data 
+        if "rubric" in include:
+            rubric_components = RubricComponent.objects.order_by("order")
+            assignments = assignments.prefetch_related(Prefetch("rubriccomponent_set", queryset=rubric_components))
 
-            if "rubric" in include:
-                rcs = RubricComponentSerializer(assignment.get_rubric_components(), many=True, context=serializer_context)
-                serialized_assignment["rubric"] = rcs.data
-            
-            serialized_assignments.append(serialized_assignment)
+        assignments = only_requested_fields(request, assignments, AssignmentSerializer, "assignment_id")
         
-        return Response(serialized_assignments)        
+        if is_streaming_request(request):
+            assignments = iterate_in_chunks(assignments, "assignment_id")
+            return get_streaming_response(assignments, lambda a: self.serialize_assignment(a, include, serializer_context))
+
+        serialized_assignments = []
+
+        for assignment in assignments:
+            serialized_assignments.append(self.serialize_assignment(assignment, include, serializer_context))
         
-        serializer = AssignmentSerializer(assignments, many=True, context=serializer_context)
-        return Response(serializer.data)
+        return Response(serialized_assignments)        
 
     def post(self, request, course_id, format=None):
         course_obj, roles = get_course(request, course_id)
@@ -250,6 +435,7 @@ class AssignmentList(APIView):
 
 class AssignmentDetail(APIView):
 
+    @course_etag
     def get(self, request, course_id, assignment_id, format=None):
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}   
@@ -293,10 +479,29 @@ class AssignmentDetail(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)    
     
 
+class AssignmentStats(APIView):
+
+    @course_etag
+    def get(self, request, course_id, assignment_id, format=None):
+        course_obj, roles = get_course(request, course_id)
+
+        if not (CourseRoles.ADMIN in roles or CourseRoles.INSTRUCTOR in roles):
+            raise PermissionDenied
+
+        assignment_obj = get_assignment(course_obj, request.user, roles, assignment_id)
+        serializer = AssignmentStatsSerializer(assignment_obj.get_stats())
+        return Response(serializer.data)
+
+
 class RubricList(APIView):
    
+    @course_etag
     def get(self, request, course_id, assignment_id, format=None):
         course_obj, roles = get_course(request, course_id)
+        return get_cached_response(request, course_obj, roles, "rubric-list",
+                                   lambda: self._get(request, course_obj, roles, assignment_id))
+
+    def _get(self, request, course_obj, roles, assignment_id):
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
                    
         assignment_obj = get_assignment(course_obj, request.user, roles, assignment_id)        
@@ -327,6 +532,7 @@ class RubricList(APIView):
 
 class RubricDetail(APIView):
 
+    @course_etag
     def get(self, request, course_id, assignment_id, rubric_component_id, format=None):
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
@@ -396,16 +602,14 @@ class Register(APIView):
             student_objs = []
             other_students = students_usernames
 
+        # Looks up all the students with a single query
+        other_student_objs = dict([(s.user.username, s) for s in course_obj.student_set.filter(user__username__in = other_students)
+                                                                                       .select_related("user")])
         students_errors = []
         for student in other_students:
-            user_obj = get_user_by_username(student)
-            
-            if user_obj is not None:
-                student_obj = course_obj.get_student(user_obj)
-            else:
-                student_obj = None
+            student_obj = other_student_objs.get(student)
             
-            if user_obj is None or student_obj is None:
+            if student_obj is None:
                 msg = "User '%s' is either not a valid user or not a student in course '%s'" % (student, course_obj.course_id)
                 students_errors.append(msg)
             else:
@@ -426,95 +630,89 @@ class Register(APIView):
             
         create_team = False
         create_registration = False
-        teams = course_obj.get_teams_with_students(student_objs)                
-                
-        if len(teams) > 0:
-            # Teams that have the assignment, but are *not* a perfect match
-            have_assignment = []
-            students_have_assignment = set()
-            perfect_match = None
+        
+        with transaction.atomic():
+            # The teams any of the students are in, indexed by their members,
+            # so we can look up the team with exactly these students
+            teams_by_members = course_obj.get_teams_by_members(student_objs, assignment_obj)
+            members_key = tuple(sorted(set(students_usernames)))
+            perfect_matches = teams_by_members.get(members_key, [])
             
-            for t in teams:
-                team_student_usernames = [u.user.username for u in t.students.all()]
-                if len(team_student_usernames) == len(students_usernames):
-                    match = True
-                    for s in students_usernames:
-                        if s not in team_student_usernames:
-                            match = False
-                            break
-                        
-                    if match:
-                        if perfect_match is None:
-                            perfect_match = t
-                        else:
-                            # There shouldn't be more than one perfect match
-                            error_msg = "There is more than one team with the exact same students in it." \
-                                        "Please notify your instructor."  
-                            return Response({"fatal": [msg]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)            
-                    else:
-                        if t.is_registered_for_assignment(assignment_obj):
-                            have_assignment.append(t)
-                            students_have_assignment.update([s for s in team_student_usernames if s in students_usernames])
-                else:
-                    if t.is_registered_for_assignment(assignment_obj):
-                        have_assignment.append(t)
-                        students_have_assignment.update([s for s in team_student_usernames if s in students_usernames])
+            if len(perfect_matches) > 1:
+                # There shouldn't be more than one perfect match
+                msg = "There is more than one team with the exact same students in it." \
+                      "Please notify your instructor."  
+                return Response({"fatal": [msg]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)            
+            
+            # Students that have the assignment in a team that is *not* a perfect match
+            students_have_assignment = set()
+            for usernames, teams in teams_by_members.items():
+                if usernames != members_key and any(is_registered for _, is_registered in teams):
+                    students_have_assignment.update([s for s in usernames if s in students_usernames])
 
-            if len(have_assignment) > 0:
+            if len(students_have_assignment) > 0:
                 error_msg = "'%s' is already registered for assignment '%s' in another team"
-                error_msgs = [error_msg % (s, assignment_obj.assignment_id) for s in students_have_assignment]
+                error_msgs = [error_msg % (s, assignment_obj.assignment_id) for s in sorted(students_have_assignment)]
                 return Response({"students": error_msgs}, status=status.HTTP_400_BAD_REQUEST)                
                     
-            if perfect_match is not None:
-                team = perfect_match
-                if perfect_match.is_registered_for_assignment(assignment_obj):
+            if len(perfect_matches) == 1:
+                team_pk, is_registered = perfect_matches[0]
+                team = Team.objects.get(pk = team_pk)
+                if is_registered:
                     if is_student:
-                        tm = perfect_match.teammember_set.get(student = user_student_obj)
+                        tm = team.teammember_set.get(student = user_student_obj)
                         tm.confirmed = True
                         tm.save()
                     else:
-                        for tm in perfect_match.teammember_set.all():
-                            if not tm.confirmed:
-                                tm.confirmed = True
-                                tm.save()
+                        for tm in team.teammember_set.filter(confirmed = False):
+                            tm.confirmed = True
+                            tm.save()
                     
-                    registration = perfect_match.get_registration(assignment_obj)
+                    registration = team.get_registration(assignment_obj)
                 else:
-                    registration = Registration.objects.create(team = perfect_match,
+                    registration = Registration.objects.create(team = team,
                                                                assignment = assignment_obj)   
                     create_registration = True
             else:
                 create_team = True                        
-        else:
-            create_team = True
             
-        if create_team:
-            team_id = "-".join(sorted(students_usernames))
-
-            if course_obj.extension_policy == Course.EXT_PER_TEAM:
-                default_extensions = course_obj.default_extensions
-                extensions = default_extensions
-            else:
-                extensions = 0              
-        
-            team = Team.objects.create(course = course_obj,
-                                       team_id = team_id,
-                                       extensions = extensions)
-
-            for student_obj in student_objs:
-                if student_obj.user == request.user or not is_student:
-                    confirmed = True
+            if create_team:
+                team_id = "-".join(sorted(students_usernames))
+    
+                if course_obj.extension_policy == Course.EXT_PER_TEAM:
+                    default_extensions = course_obj.default_extensions
+                    extensions = default_extensions
                 else:
-                    confirmed = False
+                    extensions = 0              
+            
+                try:
+                    with transaction.atomic():
+                        team = Team.objects.create(course = course_obj,
+                                                   team_id = team_id,
+                                                   extensions = extensions)
+                except Error as e:
+                    return Response({"database": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+    
+                team_members = []
+                for student_obj in student_objs:
+                    if student_obj.user == request.user or not is_student:
+                        confirmed = True
+                    else:
+                        confirmed = False
+                    
+                    team_members.append(TeamMember(student = student_obj,
+                                                   team = team,
+                                                   confirmed = confirmed))
                 
-                team_member = TeamMember.objects.create(student = student_obj,
-                                                        team = team,
-                                                        confirmed = confirmed)
+                # bulk_create doesn't send post_save. The team has no
+                # submissions, so the extensions ledger doesn't change, and
+                # creating the team already recorded the change to the course
+                TeamMember.objects.bulk_create(team_members)
+                    
+                registration = Registration.objects.create(team = team,
+                                                           assignment = assignment_obj)           
                 
-            registration = Registration.objects.create(team = team,
-                                                       assignment = assignment_obj)           
-            
-            create_registration = True     
+                create_registration = True     
                 
         if create_team or create_registration:
             response_status = status.HTTP_201_CREATED
@@ -523,7 +721,7 @@ class Register(APIView):
             
         response_data = {"new_team": create_team,
                          "team": team,
-                         "team_members": list(team.get_team_members()),
+                         "team_members": list(team.get_team_members().select_related("team", "student__user")),
                          "registration": registration
                          }
             
@@ -532,6 +730,41 @@ class Register(APIView):
     
 
 class TeamList(APIView):
+    def serialize_team(self, team, include, serializer_context):
+        ts = TeamSerializer(team, context=serializer_context)
+        serialized_team = ts.data 
+
+        # ?fields= only applies to the teams
+        nested_context = dict(serializer_context, fields=None)
+
+        # TODO: This needs to be generalized and refactored
+        if "students" in include:
+            tms = TeamMemberSerializer(team.teammember_set.all(), many=True, context=nested_context)
+            serialized_team["students"] = tms.data
+
+        if "assignments__grades" in include:
+            serialized_registrations = [] 
+            registrations = team.registration_set.all()
+            
+            for registration in registrations:
+                rs = RegistrationSerializer(registration, context=nested_context)
+                serialized_registration = rs.data
+                
+                grades = registration.grade_set.all()
+                gs = GradeSerializer(grades, many=True, context=nested_context)
+                
+                serialized_registration["grades"] = gs.data
+                
+                serialized_registrations.append(serialized_registration)
+                
+            serialized_team["assignments"] = serialized_registrations
+        elif "assignments" in include:
+            rs = RegistrationSerializer(team.registration_set.all(), many=True, context=nested_context)
+            serialized_team["assignments"] = rs.data
+        
+        return serialized_team
+    
+    @course_etag
     def get(self, request, course_id, format=None):       
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
@@ -542,44 +775,24 @@ class TeamList(APIView):
             student = course_obj.get_student(request.user)  
             teams = course_obj.get_teams_with_students([student])
         else:
-            teams = []
+            teams = Team.objects.none()
         
-        serialized_teams = []
-
         include = request.query_params.getlist("include")
+        teams = prefetch_teams(teams, include)
+        teams = only_requested_fields(request, teams, TeamSerializer, "team_id")
+        
+        if is_streaming_request(request) and "page_size" not in request.query_params:
+            teams = iterate_in_chunks(teams, "team_id")
+            return get_streaming_response(teams, lambda t: self.serialize_team(t, include, serializer_context))
 
-        # TODO: This needs to be generalized and refactored
+        teams, next_url = paginate(request, teams, "team_id")
+        
+        serialized_teams = []
+        
         for team in teams:
-            ts = TeamSerializer(team, context=serializer_context)
-            serialized_team = ts.data 
-
-            if "students" in include:
-                tms = TeamMemberSerializer(team.teammember_set.all(), many=True, context=serializer_context)
-                serialized_team["students"] = tms.data
-
-            if "assignments__grades" in include:
-                serialized_registrations = [] 
-                registrations = team.registration_set.all()
-                
-                for registration in registrations:
-                    rs = RegistrationSerializer(registration, context=serializer_context)
-                    serialized_registration = rs.data
-                    
-                    grades = registration.grade_set.all()
-                    gs = GradeSerializer(grades, many=True, context=serializer_context)
-                    
-                    serialized_registration["grades"] = gs.data
-                    
-                    serialized_registrations.append(serialized_registration)
-                    
-                serialized_team["assignments"] = serialized_registrations
-            elif "assignments" in include:
-                rs = RegistrationSerializer(team.registration_set.all(), many=True, context=serializer_context)
-                serialized_team["assignments"] = rs.data
-            
-            serialized_teams.append(serialized_team)
+            serialized_teams.append(self.serialize_team(team, include, serializer_context))
         
-        return Response(serialized_teams)
+        return Response(serialized_teams, headers=get_pagination_headers(next_url))
 
     def post(self, request, course_id, format=None):
         course_obj, roles = get_course(request, course_id)
@@ -598,10 +811,178 @@ class TeamList(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)        
     
     
+class TeamBatch(APIView):
+
+    def post(self, request, course_id, format=None):
+        # Creates (or completes) many teams, with their members and 
+        # registrations, with a constant number of queries. Teams with
+        # errors are skipped, and the errors are reported for each team.
+        course_obj, roles = get_course(request, course_id)
+
+        if not (CourseRoles.ADMIN in roles or CourseRoles.INSTRUCTOR in roles):
+            raise PermissionDenied
+
+        serializer = TeamBatchRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        specs = serializer.validated_data["teams"]
+        dry_run = serializer.validated_data["dry_run"]
+
+        team_ids = set([spec["team_id"] for spec in specs])
+        usernames = set([u for spec in specs for u in spec["students"]])
+        assignment_ids = set([a for spec in specs for a in spec.get("assignments", [])])
+
+        if course_obj.extension_policy == Course.EXT_PER_TEAM:
+            default_extensions = course_obj.default_extensions
+        else:
+            default_extensions = 0
+
+        with transaction.atomic():
+            team_objs = dict([(t.team_id, t) for t in lock_rows(course_obj.team_set.filter(team_id__in = team_ids))])
+            student_objs = dict([(s.user.username, s) for s in course_obj.student_set.filter(user__username__in = usernames)
+                                                                                     .select_related("user")])
+            assignment_objs = dict([(a.assignment_id, a) for a in course_obj.assignment_set.filter(assignment_id__in = assignment_ids)])
+
+            team_members = {}
+            for team_id, username in TeamMember.objects.filter(team__in = list(team_objs.values())) \
+                                                       .values_list("team__team_id", "student__user__username"):
+                team_members.setdefault(team_id, set()).add(username)
+
+            # (assignment_id, username) -> team_id for all the students
+            # registered for the assignments in the batch
+            registered = {}
+            team_registrations = set()
+            for assignment_id, username, team_id in Registration.objects.filter(assignment__in = list(assignment_objs.values())) \
+                                                                        .values_list("assignment__assignment_id", 
+                                                                                     "team__teammember__student__user__username",
+                                                                                     "team__team_id"):
+                team_registrations.add((team_id, assignment_id))
+                if username is not None:
+                    registered[(assignment_id, username)] = team_id
+
+            results = []
+            new_teams = []
+            updated_teams = []
+            new_members = []
+            new_registrations = []
+            seen_team_ids = set()
+            now = timezone.now()
+
+            for spec in specs:
+                team_id = spec["team_id"]
+                students = spec["students"]
+                spec_assignment_ids = spec.get("assignments", [])
+                team_obj = team_objs.get(team_id)
+                errors = []
+
+                if team_id in seen_team_ids:
+                    errors.append("Team '%s' appears more than once in the batch" % team_id)
+                seen_team_ids.add(team_id)
+
+                if len(students) == 0:
+                    errors.append("No students specified.")
+                elif len(set(students)) != len(students):
+                    errors.append("A student can only appear once in a team.")
+
+                for username in students:
+                    if username not in student_objs:
+                        errors.append("User '%s' is either not a valid user or not a student in course '%s'" % (username, course_obj.course_id))
+                for assignment_id in spec_assignment_ids:
+                    if assignment_id not in assignment_objs:
+                        errors.append("Assignment '%s' does not exist in course '%s'" % (assignment_id, course_obj.course_id))
+
+                members = team_members.get(team_id, set())
+                if len(members) > 0 and members != set(students):
+                    errors.append("Team '%s' exists but it has these team members: %s" % (team_id, ", ".join(sorted(members))))
+
+                add_assignment_ids = [a for a in spec_assignment_ids if (team_id, a) not in team_registrations]
+                for assignment_id in add_assignment_ids:
+                    for username in students:
+                        if registered.get((assignment_id, username), team_id) != team_id:
+                            errors.append("'%s' is already registered for assignment '%s' in another team" % (username, assignment_id))
+
+                if len(errors) > 0:
+                    results.append({"team_id": team_id, "status": "error", "errors": errors})
+                    continue
+
+                for assignment_id in add_assignment_ids:
+                    team_registrations.add((team_id, assignment_id))
+                    for username in students:
+                        registered[(assignment_id, username)] = team_id
+
+                if team_obj is None:
+                    team_obj = Team(course = course_obj,
+                                    team_id = team_id,
+                                    extensions = spec.get("extensions", default_extensions),
+                                    active = spec.get("active", True))
+                    new_teams.append(team_obj)
+                    result_status = "created"
+                else:
+                    changed = len(members) == 0 and len(students) > 0
+                    for attr in ("extensions", "active"):
+                        if attr in spec and getattr(team_obj, attr) != spec[attr]:
+                            setattr(team_obj, attr, spec[attr])
+                            changed = True
+                    if changed:
+                        # bulk_update doesn't send pre_save (see the change feed)
+                        team_obj.updated_at = now
+                        updated_teams.append(team_obj)
+                    if changed or len(add_assignment_ids) > 0:
+                        result_status = "updated"
+                    else:
+                        result_status = "unchanged"
+
+                if len(members) == 0:
+                    new_members += [(team_id, username) for username in students]
+                new_registrations += [(team_id, assignment_id) for assignment_id in add_assignment_ids]
+                results.append({"team_id": team_id, "status": result_status})
+
+            if not dry_run:
+                try:
+                    with transaction.atomic():
+                        Team.objects.bulk_create(new_teams)
+                        Team.objects.bulk_update(updated_teams, ["extensions", "active", "updated_at"])
+
+                        # bulk_create doesn't set the primary keys on all backends
+                        team_pks = dict(course_obj.team_set.filter(team_id__in = set([t for t, _ in new_members + new_registrations]))
+                                                           .values_list("team_id", "pk"))
+
+                        TeamMember.objects.bulk_create([TeamMember(team_id = team_pks[team_id],
+                                                                   student = student_objs[username],
+                                                                   confirmed = True) 
+                                                        for team_id, username in new_members])
+                        Registration.objects.bulk_create([Registration(team_id = team_pks[team_id],
+                                                                       assignment = assignment_objs[assignment_id]) 
+                                                          for team_id, assignment_id in new_registrations])
+
+                        # Existing teams may already have submissions
+                        update_extensions_ledger(team_ids = [team_obj.pk for team_obj in updated_teams])
+                        record_course_changes([course_obj.pk])
+                except Error as e:
+                    return Response({"database": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        response_data = {"teams": results,
+                         "dry_run": dry_run}
+        for result_status in ("created", "updated", "unchanged", "error"):
+            response_data[result_status] = len([r for r in results if r["status"] == result_status])
+
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
 class TeamDetail(APIView):
             
+    @course_etag
     def get(self, request, course_id, team_id, format=None):
         course_obj, roles = get_course(request, course_id)
+        # Students can only see their own teams, so they can't share
+        # cached responses
+        students_only = (len(roles) == 1 and CourseRoles.STUDENT in roles)
+        return get_cached_response(request, course_obj, roles, "team-detail",
+                                   lambda: self._get(request, course_obj, roles, team_id),
+                                   per_user = students_only)
+
+    def _get(self, request, course_obj, roles, team_id):
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
         
         team_obj = get_team(course_obj, request.user, roles, team_id)
@@ -634,13 +1015,15 @@ class TeamDetail(APIView):
 
 class TeamMemberList(APIView):            
             
+    @course_etag
     def get(self, request, course_id, team_id, format=None):
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
         
         team_obj = get_team(course_obj, request.user, roles, team_id)
         
-        serializer = TeamMemberSerializer(team_obj.teammember_set.all(), many=True, context=serializer_context)
+        teammembers = only_requested_fields(request, team_obj.teammember_set.all(), TeamMemberSerializer)
+        serializer = TeamMemberSerializer(teammembers, many=True, context=serializer_context)
         return Response(serializer.data)
 
     def post(self, request, course_id, team_id, format=None):
@@ -668,6 +1051,7 @@ class TeamMemberList(APIView):
 
 class TeamMemberDetail(APIView):
             
+    @course_etag
     def get(self, request, course_id, team_id, student_username, format=None):
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
@@ -701,14 +1085,18 @@ class TeamMemberDetail(APIView):
     
 class RegistrationList(APIView):        
             
+    @course_etag
     def get(self, request, course_id, team_id, format=None):
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
         
         team_obj = get_team(course_obj, request.user, roles, team_id)
+        registrations = team_obj.registration_set.select_related("assignment")
+        registrations = only_requested_fields(request, registrations, RegistrationSerializer, "assignment__assignment_id")
+        registrations, next_url = paginate(request, registrations, "assignment__assignment_id")
         
-        serializer = RegistrationSerializer(team_obj.registration_set.all(), many=True, context=serializer_context)
-        return Response(serializer.data)
+        serializer = RegistrationSerializer(registrations, many=True, context=serializer_context)
+        return Response(serializer.data, headers=get_pagination_headers(next_url))
 
     def post(self, request, course_id, team_id, format=None):
         course_obj, roles = get_course(request, course_id)
@@ -731,6 +1119,7 @@ class RegistrationList(APIView):
 
 class RegistrationDetail(APIView):
 
+    @course_etag
     def get(self, request, course_id, team_id, assignment_id, format=None):
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
@@ -795,29 +1184,46 @@ class Submit(APIView):
                 msg = "Nice try! Only admins and instructors can override the number of extensions."
                 return Response({"errors": [msg]}, status=status.HTTP_400_BAD_REQUEST)
 
-
-        if extensions_override is None and registration_obj.grading_started:
-            msg = "You cannot re-submit assignment %s." % (registration_obj.assignment.assignment_id)
-            msg += " You made a submission and it has already been sent to the graders for grading."
-            msg += " Please contact an instructor if you wish to amend your submission."
-            return Response({"errors": [msg]}, status=status.HTTP_400_BAD_REQUEST)
-                
-        try:
-            submission, extensions = Submission.create(registration = registration_obj,
-                                                       commit_sha = commit_sha,
-                                                       submitted_at = now,
-                                                       submitted_by = request.user,
-                                                       extensions_override = extensions_override)
-        except SubmissionValidationException as sve:
-            return sve.error_response
-        
-        if not dry_run:
-            submission.save()
-            registration_obj.final_submission = submission
-            registration_obj.save()
-            response_status = status.HTTP_201_CREATED
-        else:
-            response_status = status.HTTP_200_OK
+        assignment_obj = registration_obj.assignment
+
+        with transaction.atomic():
+            # Concurrent submissions from the same team (or, with per-student
+            # extensions, from teams that share a student) are serialized by
+            # locking the team, its students, and the registration before
+            # reading the final submission and the extensions used so far.
+            # The locks have to be taken before anything else is read in
+            # the transaction.
+            team_obj, = lock_rows(Team.objects.filter(pk = registration_obj.team_id))
+            if course_obj.extension_policy == Course.EXT_PER_STUDENT:
+                lock_rows(Student.objects.filter(teammember__team = team_obj).order_by("pk"))
+            registration_obj, = lock_rows(Registration.objects.filter(pk = registration_obj.pk))
+            
+            team_obj.course = course_obj
+            registration_obj.team = team_obj
+            registration_obj.assignment = assignment_obj
+            
+            if extensions_override is None and registration_obj.grading_started:
+                msg = "You cannot re-submit assignment %s." % (registration_obj.assignment.assignment_id)
+                msg += " You made a submission and it has already been sent to the graders for grading."
+                msg += " Please contact an instructor if you wish to amend your submission."
+                return Response({"errors": [msg]}, status=status.HTTP_400_BAD_REQUEST)
+                    
+            try:
+                submission, extensions = Submission.create(registration = registration_obj,
+                                                           commit_sha = commit_sha,
+                                                           submitted_at = now,
+                                                           submitted_by = request.user,
+                                                           extensions_override = extensions_override)
+            except SubmissionValidationException as sve:
+                return sve.error_response
+            
+            if not dry_run:
+                submission.save()
+                registration_obj.final_submission = submission
+                registration_obj.save(update_fields = ["final_submission", "updated_at"])
+                response_status = status.HTTP_201_CREATED
+            else:
+                response_status = status.HTTP_200_OK
         
         response_data = {"submission": submission,
                          "extensions_before": extensions["extensions_available_before"],
@@ -835,13 +1241,15 @@ class Submit(APIView):
 
 class SubmissionList(APIView):     
             
+    @course_etag
     def get(self, request, course_id, team_id, assignment_id, format=None):
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
         
         registration_obj = get_registration(course_obj, request.user, roles, team_id, assignment_id)
         
-        serializer = SubmissionSerializer(registration_obj.submission_set.all(), many=True, context=serializer_context)
+        submissions = only_requested_fields(request, registration_obj.submission_set.all(), SubmissionSerializer)
+        serializer = SubmissionSerializer(submissions, many=True, context=serializer_context)
         return Response(serializer.data)
 
     def post(self, request, course_id, team_id, assignment_id, format=None):
@@ -864,6 +1272,7 @@ class SubmissionList(APIView):
     
 class SubmissionDetail(APIView):
     
+    @course_etag
     def get(self, request, course_id, team_id, assignment_id, submission_id, format=None):
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
@@ -896,13 +1305,15 @@ class SubmissionDetail(APIView):
 
 class GradeList(APIView):
             
+    @course_etag
     def get(self, request, course_id, team_id, assignment_id, format=None):
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
         
         registration_obj = get_registration(course_obj, request.user, roles, team_id, assignment_id)
         
-        serializer = GradeSerializer(registration_obj.grade_set.all(), many=True, context=serializer_context)
+        grades = only_requested_fields(request, registration_obj.grade_set.all(), GradeSerializer)
+        serializer = GradeSerializer(grades, many=True, context=serializer_context)
         return Response(serializer.data)
 
     def post(self, request, course_id, team_id, assignment_id, format=None):
@@ -925,6 +1336,7 @@ class GradeList(APIView):
     
 class GradeDetail(APIView): 
     
+    @course_etag
     def get(self, request, course_id, team_id, assignment_id, grade_id, format=None):
         course_obj, roles = get_course(request, course_id)
         serializer_context = {'request': request, 'course': course_obj, 'roles': roles}
@@ -955,7 +1367,229 @@ class GradeDetail(APIView):
         grade_obj.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)    
 
-    
+
+class GradeBatch(APIView):
+
+    def post(self, request, course_id, assignment_id, format=None):
+        course_obj, roles = get_course(request, course_id)
+
+        if not (CourseRoles.ADMIN in roles or CourseRoles.INSTRUCTOR in roles):
+            raise PermissionDenied
+
+        assignment_obj = get_assignment(course_obj, request.user, roles, assignment_id)
+        serializer = GradeBatchRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = serializer.validated_data["registrations"]
+        team_ids = [entry["team_id"] for entry in entries]
+
+        if len(set(team_ids)) != len(team_ids):
+            msg = "Each team can only appear once in a batch."
+            return Response({"registrations": [msg]}, status=status.HTTP_400_BAD_REQUEST)
+
+        rubric_components = dict([(rc.pk, rc) for rc in assignment_obj.rubriccomponent_set.all()])
+
+        with transaction.atomic():
+            registrations = Registration.objects.filter(assignment = assignment_obj, team__team_id__in = team_ids)
+            registration_objs = dict([(r.team.team_id, r) for r in lock_rows(registrations.select_related("team"))])
+
+            errors = []
+            grades = []
+            adjusted = []
+            # bulk_update doesn't send pre_save (see the change feed)
+            now = timezone.now()
+            for entry in entries:
+                team_id = entry["team_id"]
+                registration_obj = registration_objs.get(team_id)
+                if registration_obj is None:
+                    msg = "Team '%s' is not registered for assignment '%s'" % (team_id, assignment_id)
+                    errors.append(msg)
+                    continue
+
+                for grade in entry.get("grades", []):
+                    rc = rubric_components.get(grade["rubric_component_id"])
+                    if rc is None:
+                        msg = "Assignment '%s' has no rubric component with id %i" % (assignment_id, grade["rubric_component_id"])
+                        errors.append(msg)
+                    elif grade["points"] < 0 or grade["points"] > rc.points:
+                        msg = "Invalid grade value %.2f for team '%s' ('%s' must be 0 <= x <= %.2f)" % (grade["points"], team_id, rc.description, rc.points)
+                        errors.append(msg)
+                    else:
+                        grades.append((registration_obj, rc, grade["points"]))
+
+                if "grade_adjustments" in entry:
+                    registration_obj.grade_adjustments = entry["grade_adjustments"]
+                    registration_obj.updated_at = now
+                    adjusted.append(registration_obj)
+
+            if len(errors) > 0:
+                return Response({"registrations": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                with transaction.atomic():
+                    created, updated = Grade.upsert(grades)
+                    Registration.objects.bulk_update(adjusted, ["grade_adjustments", "updated_at"])
+                    record_course_changes([course_obj.pk])
+            except Error as e:
+                return Response({"database": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Return the total grade of each registration in the batch, so
+        # the client doesn't have to fetch all the grades again.
+        points = dict(Grade.objects.filter(registration__in = list(registration_objs.values()))
+                                   .values_list("registration")
+                                   .annotate(Sum("points")))
+        total_grades = {}
+        for team_id, registration_obj in registration_objs.items():
+            registration_obj.total_points = points.get(registration_obj.pk)
+            total_grades[team_id] = registration_obj.get_total_grade()
+
+        response_data = {"grades_created": created,
+                         "grades_updated": updated,
+                         "total_grades": total_grades}
+
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
+class Gradebook(APIView):
+
+    @course_etag
+    def get(self, request, course_id, format=None):
+        course_obj, roles = get_course(request, course_id)
+
+        if not (CourseRoles.ADMIN in roles or CourseRoles.INSTRUCTOR in roles):
+            raise PermissionDenied
+
+        detailed = request.query_params.get("detailed", "false") in ("true","True")
+        output = request.query_params.get("output", "json")
+
+        if output not in ("json", "csv"):
+            msg = "Unknown output format '%s' (must be 'json' or 'csv')" % output
+            return Response({"output": [msg]}, status=status.HTTP_400_BAD_REQUEST)
+
+        columns = course_obj.get_gradebook(detailed)
+
+        if output == "csv":
+            return get_csv_streaming_response(columns)
+        else:
+            return get_columnar_streaming_response(columns)
+
+
+class CourseChanges(APIView):
+
+    # The cursor returned to the client is this far behind the time of
+    # the request, so that changes made by transactions that were still
+    # in progress (whose updated_at is earlier than their commit) are
+    # not missed. This means a change may be returned more than once.
+    cursor_overlap = timedelta(seconds = 5)
+
+    def get(self, request, course_id, format=None):
+        course_obj, roles = get_course(request, course_id)
+        # ?fields= doesn't apply to the change feed
+        serializer_context = {'request': request, 'course': course_obj, 'roles': roles, 'fields': None}
+
+        since = request.query_params.get("since")
+        if since is not None:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                since = None
+            if since is None or timezone.is_naive(since):
+                msg = "Invalid cursor '%s'" % request.query_params.get("since")
+                return Response({"since": [msg]}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+
+        deletions = Deletion.objects.filter(course = course_obj)
+        if (CourseRoles.ADMIN in roles or CourseRoles.INSTRUCTOR in roles or CourseRoles.GRADER in roles):
+            teams = course_obj.get_teams()
+        elif len(roles) == 1 and CourseRoles.STUDENT in roles:
+            student = course_obj.get_student(request.user)
+            teams = course_obj.get_teams_with_students([student])
+            # Deleted teams are no longer among the student's teams
+            deletions = deletions.filter(Q(team_id__in = teams.values("team_id")) | Q(students = student)).distinct()
+        else:
+            teams = Team.objects.none()
+            deletions = Deletion.objects.none()
+
+        registrations = Registration.objects.filter(team__in = teams)
+        submissions = Submission.objects.filter(registration__team__in = teams)
+        grades = Grade.objects.filter(registration__team__in = teams)
+
+        if since is not None:
+            teams = teams.filter(updated_at__gt = since)
+            registrations = registrations.filter(updated_at__gt = since)
+            submissions = submissions.filter(updated_at__gt = since)
+            grades = grades.filter(updated_at__gt = since)
+            deletions = deletions.filter(deleted_at__gt = since)
+        else:
+            # Nothing to delete if the client doesn't have anything yet
+            deletions = Deletion.objects.none()
+
+        teams = prefetch_teams(teams, ["students"])
+        registrations = registrations.select_related("team",
+                                                     "assignment",
+                                                     "grader__user",
+                                                     "final_submission__submitted_by",
+                                                     "final_submission__registration__team",
+                                                     "final_submission__registration__assignment")
+        registrations = registrations.prefetch_related(Prefetch("grader__conflicts", queryset=Student.objects.select_related("user")))
+        submissions = submissions.select_related("registration__team", "registration__assignment", "submitted_by")
+        grades = grades.select_related("registration__team", "registration__assignment", "rubric_component__assignment")
+
+        # (timestamp, change) tuples. Python's sort is stable, so changes
+        # with the same timestamp stay in this order (teams before their
+        # registrations, etc.)
+        changes = []
+
+        for team in teams:
+            data = TeamSerializer(team, context=serializer_context).data
+            data["students"] = TeamMemberSerializer(team.teammember_set.all(), many=True, context=serializer_context).data
+            changes.append((team.updated_at, {"type": Deletion.TEAM,
+                                              "team_id": team.team_id,
+                                              "data": data}))
+
+        for registration in registrations:
+            changes.append((registration.updated_at, {"type": Deletion.REGISTRATION,
+                                                      "team_id": registration.team.team_id,
+                                                      "assignment_id": registration.assignment.assignment_id,
+                                                      "data": RegistrationSerializer(registration, context=serializer_context).data}))
+
+        for kind, serializer_class, objs in ((Deletion.SUBMISSION, SubmissionSerializer, submissions),
+                                             (Deletion.GRADE, GradeSerializer, grades)):
+            for obj in objs:
+                changes.append((obj.updated_at, {"type": kind,
+                                                 "team_id": obj.registration.team.team_id,
+                                                 "assignment_id": obj.registration.assignment.assignment_id,
+                                                 "id": obj.pk,
+                                                 "data": serializer_class(obj, context=serializer_context).data}))
+
+        for deletion in deletions:
+            change = {"type": deletion.kind,
+                      "team_id": deletion.team_id,
+                      "deleted": True}
+            if deletion.kind != Deletion.TEAM:
+                change["assignment_id"] = deletion.assignment_id
+            if deletion.object_id is not None:
+                change["id"] = deletion.object_id
+            changes.append((deletion.deleted_at, change))
+
+        changes.sort(key = lambda c: c[0])
+
+        timestamp_field = DateTimeField()
+        serialized_changes = []
+        for timestamp, change in changes:
+            change.setdefault("deleted", False)
+            change["timestamp"] = timestamp_field.to_representation(timestamp)
+            serialized_changes.append(change)
+
+        cursor = now - self.cursor_overlap
+        if since is not None and since > cursor:
+            cursor = since
+
+        return Response({"cursor": timestamp_field.to_representation(cursor),
+                         "changes": serialized_changes})
+
 class UserList(APIView):
     def get(self, request, format=None):
         if not (request.user.is_staff or request.user.is_superuser):
@@ -1049,7 +1683,7 @@ class AuthUserDetail(BaseUserDetail):
     
 class BaseUserToken(APIView):
     
-    authentication_classes = (BasicAuthentication, TokenAuthentication)
+    authentication_classes = (BasicAuthentication, CachingTokenAuthentication)
     
     def _get(self, request, username, format=None):
         try:
@@ -1091,6 +1725,15 @@ class AuthUserToken(BaseUserToken):
     
     def get(self, request, format=None):
         return self._get(request, request.user.username, format)
-        
 
 
+class CacheStats(APIView):
+
+    def get(self, request, format=None):
+        if not (request.user.is_staff or request.user.is_superuser):
+            raise PermissionDenied
+
+        # These are the hits and misses in the server process that
+        # handled this request
+        return Response({"read_cache": read_cache_stats.get()})
+
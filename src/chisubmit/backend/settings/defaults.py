@@ -59,10 +59,37 @@ STATIC_URL = '/static/'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'chisubmit.backend.api.authentication.CachingTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     )                  
 }
 
+# Validated API tokens are cached for a short time, so that every
+# request doesn't have to look up the token and its user. See
+# chisubmit.backend.api.authentication for the available settings.
+CHISUBMIT_TOKEN_CACHE = {
+    'MAX_SIZE': 1024,
+    'TTL': 60,
+    'CACHE_ALIAS': None,
+}
+
+# Responses to the most frequent GET requests on a course (the course
+# itself, its assignments and rubrics, and individual teams) are cached,
+# and invalidated whenever the course changes. See
+# chisubmit.backend.api.cache for the available settings.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        }
+    }
+}
+
+CHISUBMIT_READ_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
@@ -72,10 +72,11 @@ DEBUG = False
 @click.option('--work-dir', type=str, default=None)
 @click.option('--verbose', '-v', is_flag=True)
 @click.option('--debug', is_flag=True)
+@click.option('--no-cache', is_flag=True)
 @click.version_option(version=RELEASE)
 @catch_chisubmit_exceptions
 @click.pass_context
-def chisubmit_cmd(ctx, config, config_dir, work_dir, verbose, debug):
+def chisubmit_cmd(ctx, config, config_dir, work_dir, verbose, debug, no_cache):
     global VERBOSE, DEBUG
     
     VERBOSE = verbose
@@ -106,6 +107,7 @@ def chisubmit_cmd(ctx, config, config_dir, work_dir, verbose, debug):
     ctx.obj["work_dir"] = work_dir
     ctx.obj["verbose"] = verbose
     ctx.obj["debug"] = debug
+    ctx.obj["no_cache"] = no_cache
 
     return CHISUBMIT_SUCCESS
 
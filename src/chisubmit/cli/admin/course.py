@@ -198,7 +198,7 @@ def admin_course_load_users(ctx, course_id, csv_file, csv_username_column, csv_f
             print("CSV file %s does not have a '%s' column" % (csv_file, col))
             ctx.exit(CHISUBMIT_FAIL)
         
-    student_usernames = set()
+    users = []
         
     for entry in csvf:
         username = entry[csv_username_column]
@@ -210,69 +210,55 @@ def admin_course_load_users(ctx, course_id, csv_file, csv_username_column, csv_f
         last_name = entry[csv_lname_column]
         email = entry[csv_email_column]
         
-        print("Processing %s (%s, %s)" % (username, last_name, first_name))        
-        
         if user_type == "column":
             cur_user_type = entry[user_type_column]
             if cur_user_type not in VALID_USER_TYPES:
+                print("Processing %s (%s, %s)" % (username, last_name, first_name))        
                 print("- User %s has invalid user type '%s'." % (username, cur_user_type))
+                print()
                 continue
         else:
             cur_user_type = user_type
 
-        if cur_user_type == "student":
-            student_usernames.add(username)
+        users.append({"username": username,
+                      "first_name": first_name,
+                      "last_name": last_name,
+                      "email": email,
+                      "type": cur_user_type})
 
-        try:
-            user = ctx.obj["client"].get_user(username = username)
+    # The whole roster is sent in a single request, and the server
+    # tells us what it did (or would do, with --dry-run) with each user
+    roster = course.import_roster(users, sync = sync, dry_run = dry_run)
+        
+    for user, result in zip(users, roster["users"]):
+        username = user["username"]
+        cur_user_type = user["type"]
+        
+        print("Processing %s (%s, %s)" % (username, user["last_name"], user["first_name"]))        
+        
+        if "errors" in result:
+            for error in result["errors"]:
+                print("- ERROR: %s" % error)
+            print()
+            continue
+        
+        if result["user"] == "exists":
             print("- User %s already exists." % username)
-        except UnknownObjectException as uoe:
+        else:
             print("- Creating user %s" % username)
-            if not dry_run:
-                user = ctx.obj["client"].create_user(username = username,
-                                                     first_name = first_name,
-                                                     last_name = last_name,
-                                                     email = email)
         
-        if cur_user_type == "student":
-            try:
-                student = course.get_student(username)
-                if not student.dropped:
-                    print("- User %s is already a student in %s" % (username, course_id))
-                else:
-                    if not dry_run:
-                        student.dropped = False
-                    print("- Student had previously been marked as dropped, has been un-dropped")
-            except UnknownObjectException as uoe:
-                print("- Adding student %s to %s" % (username, course_id))
-                if not dry_run:
-                    course.add_student(user)
-        elif cur_user_type == "instructor":
-            try:
-                instructor = course.get_instructor(username)
-                print("- User %s is already an instructor in %s" % (username, course_id))
-            except UnknownObjectException as uoe:
-                print("- Adding instructor %s to %s" % (username, course_id))
-                if not dry_run:
-                    course.add_instructor(user)
-        elif cur_user_type == "grader":
-            try:
-                grader = course.get_grader(username)
-                print("- User %s is already a grader in %s" % (username, course_id))
-            except UnknownObjectException as uoe:
-                print("- Adding grader %s to %s" % (username, course_id))
-                if not dry_run:
-                    course.add_grader(user)
+        if result["person"] == "added":
+            print("- Adding %s %s to %s" % (cur_user_type, username, course_id))
+        elif result["person"] == "undropped":
+            print("- Student had previously been marked as dropped, has been un-dropped")
+        else:
+            article = "an" if cur_user_type == "instructor" else "a"
+            print("- User %s is already %s %s in %s" % (username, article, cur_user_type, course_id))
             
         print() 
     
-    if sync:
-        existing_students = course.get_students()
-        for existing_student in existing_students:
-            if existing_student.username not in student_usernames:
-                if not dry_run:
-                    existing_student.dropped = True
-                print("Dropped %s" % existing_student.username)
+    for username in roster["dropped"]:
+        print("Dropped %s" % username)
         
 
 @click.command(name="create-git-users")
@@ -334,29 +320,24 @@ def admin_course_create_individual_teams(ctx, course_id, dry_run, only):
     else:
         students = course.get_students()
         
+    # All the teams are created with a single request (or a few, for
+    # large courses)
+    teams = [{"team_id": student.username, "students": [student.username]} for student in students]
+    results = course.create_teams(teams, dry_run = dry_run)
     
-    for student in students:
+    for student, result in zip(students, results):
         print("Processing %s (%s, %s)" % (student.username, student.user.last_name, student.user.first_name))        
 
-        try:
-            team = course.get_team(student.username)
-
-            tms = team.get_team_members()
-            if len(tms) == 0:
-                # Incomplete team creation
-                if not dry_run:
-                    team.add_team_member(student.username, confirmed = True)
-                print("- Added user %s to team %s." % (student.username, team.team_id))
-            elif len(tms) == 1 and tms[0].username == student.username:
-                print("- User %s already has an individual team." % student.username)
-            else:
-                print("- ERROR: Team '%s' exists but it has these team members: %s" % (team.team_id, [tm.username for tm in tms]))
-            
-        except UnknownObjectException as uoe:
-            if not dry_run:
-                team = course.create_team(student.username)
-                team.add_team_member(student.username, confirmed = True)
+        if result["status"] == "created":
             print("- Created individual team for user %s." % student.username)
+        elif result["status"] == "updated":
+            # Incomplete team creation
+            print("- Added user %s to team %s." % (student.username, result["team_id"]))
+        elif result["status"] == "unchanged":
+            print("- User %s already has an individual team." % student.username)
+        else:
+            for error in result["errors"]:
+                print("- ERROR: %s" % error)
             
         print()
         
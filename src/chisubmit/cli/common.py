@@ -18,6 +18,7 @@ from chisubmit.config import Config, ConfigDirectoryNotFoundException
 from chisubmit.client import Chisubmit
 from chisubmit.common.utils import parse_timedelta, convert_datetime_to_utc
 from chisubmit.rubric import RubricFile, ChisubmitRubricException
+import chisubmit.common.log as log
 
 
 def __load_config_and_client(require_local):
@@ -41,7 +42,19 @@ def __load_config_and_client(require_local):
     if api_key is None:
         raise ChisubmitException("No chisubmit credentials were found!")
 
-    ctx.obj["client"] = Chisubmit(api_key, base_url=api_url, ssl_verify=ssl_verify)    
+    cache_dir = ctx.obj["config"].get_cache_dir()
+
+    # The CLI never looks at the raw JSON of the objects
+    ctx.obj["client"] = Chisubmit(api_key, base_url=api_url, ssl_verify=ssl_verify, cache_dir=cache_dir,
+                                  keep_raw_data=False, refresh_cache=ctx.obj["no_cache"])    
+    
+    if ctx.obj["debug"] and cache_dir is not None:
+        ctx.call_on_close(lambda: __log_cache_stats(ctx.obj["client"]))
+    
+
+def __log_cache_stats(client):
+    stats = client.get_cache_stats()
+    log.debug("HTTP cache: " + ", ".join(["%s=%i" % (k, v) for k, v in sorted(stats.items())]))
     
 
 def require_config(f):
@@ -295,15 +308,15 @@ class DateTimeParamType(click.ParamType):
 DATETIME = DateTimeParamType()
 
 
-def get_teams_registrations(course, assignment, only_ready_for_grading=False, grader=None, only=None, include_grades=False):
+def get_teams_registrations(course, assignment, only_ready_for_grading=False, grader=None, only=None, include_grades=False, team_fields=None):
     if only is not None:
         try:
-            team = course.get_team(only, include_assignments=True, include_grades=include_grades)
+            team = course.get_team(only, include_assignments=True, include_grades=include_grades, fields=team_fields)
             teams = [team]
         except UnknownObjectException:
             return {}
     else:
-        teams = course.get_teams(include_assignments=True, include_grades=include_grades)
+        teams = course.get_teams(include_assignments=True, include_grades=include_grades, fields=team_fields)
 
     rv = {}
     
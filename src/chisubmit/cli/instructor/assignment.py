@@ -8,7 +8,6 @@ from chisubmit.client.assignment import Assignment
 from chisubmit.common import CHISUBMIT_SUCCESS, CHISUBMIT_FAIL
 from chisubmit.common.utils import convert_datetime_to_utc, create_connection,\
     convert_datetime_to_local, is_submission_ready_for_grading
-import operator
 from chisubmit.cli.shared.assignment import shared_assignment_list,\
     shared_assignment_set_attribute
 from chisubmit.client.exceptions import UnknownObjectException,\
@@ -397,89 +396,36 @@ def instructor_assignment_cancel_submit(ctx, course, team_id, assignment_id, yes
 @click.pass_context
 def instructor_assignment_stats(ctx, course, assignment_id):
     assignment = get_assignment_or_exit(ctx, course, assignment_id)
-             
-    all_students = course.get_students()
-         
-    student_dict = {s.user.username: s.user for s in all_students if not s.dropped}
-    students = set(student_dict.keys())
-    dropped = set([s.user.username for s in all_students if s.dropped])
     
-    teams_unconfirmed = []
-    nteams = 0
-    nstudents = len(student_dict)
-    nstudents_assignment = 0
-    nsubmissions = 0
-    nstudents_submitted = 0
-    unsubmitted = []
+    stats = assignment.get_stats()
     
-    teams = course.get_teams(include_students=True, include_assignments=True)
-
-    for team in teams:
-        try:
-            registrations = team.get_assignment_registrations()
-            registrations = [r for r in registrations if r.assignment_id == assignment_id]
-            if len(registrations) == 1:
-                registration = registrations[0]
-            else:
-                continue
-        except UnknownObjectException:
-            continue
-        
-        unconfirmed = False
-        includes_dropped = False
-        team_members = team.get_team_members()
-        for tm in team_members:
-            if tm.username not in dropped:
-                try:
-                    students.remove(tm.username)
-                    nstudents_assignment += 1
-                    if not tm.confirmed:
-                        unconfirmed = True
-                except KeyError as ke:
-                    print("WARNING: Student %s seems to be in more than one team (offending team: %s)" % (tm.username, team.team_id))
-            else:
-                includes_dropped = True
-
-        if not includes_dropped:
-            nteams += 1
-            
-            if registration.final_submission is not None:
-                nsubmissions += 1
-                nstudents_submitted += len(team_members)
-            else:
-                unsubmitted.append(team)
-            
-        if unconfirmed:
-            teams_unconfirmed.append(team)
-                
-    assert(nstudents == len(students) + nstudents_assignment)                
+    for username in stats.students_in_multiple_teams:
+        print("WARNING: Student %s seems to be in more than one team" % username)
             
     title = "Assignment '%s'" % (assignment.name)
     print(title)
     print("=" * len(title))
                
     print() 
-    print("%i / %i students in %i teams have signed up for assignment %s" % (nstudents_assignment, nstudents, nteams, assignment.assignment_id))
+    print("%i / %i students in %i teams have signed up for assignment %s" % (stats.students_registered, stats.students, stats.teams, assignment.assignment_id))
     print()
-    print("%i / %i teams have submitted the assignment (%i students)" % (nsubmissions, nteams, nstudents_submitted))
+    print("%i / %i teams have submitted the assignment (%i students)" % (stats.teams_submitted, stats.teams, stats.students_submitted))
     
     if ctx.obj["verbose"]:
-        if len(students) > 0:
+        if len(stats.unregistered_students) > 0:
             print()
             print("Students who have not yet signed up")
             print("-----------------------------------")
-            not_signed_up = [student_dict[sid] for sid in students]
-            not_signed_up.sort(key=operator.attrgetter("last_name"))
-            for s in not_signed_up:
+            for s in stats.unregistered_students:
                 print("%s, %s <%s>" % (s.last_name, s.first_name, s.email))
                 
-        if len(unsubmitted) > 0:
+        if len(stats.unsubmitted_teams) > 0:
             print()
             print("Teams that have not submitted")
             print("-----------------------------")
-            for t in unsubmitted:
-                print(t.team_id)
-                
+            for team_id in stats.unsubmitted_teams:
+                print(team_id)
+
     return CHISUBMIT_SUCCESS
 
 
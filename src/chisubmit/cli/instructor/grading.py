@@ -75,48 +75,50 @@ def instructor_grading_set_grade(ctx, course, team_id, assignment_id, rubric_com
 
 @click.command(name="load-grades")
 @click.argument('assignment_id', type=str)
-@click.argument('grade_component_id', type=str)
-@click.argument('csv_file', type=click.File('rb'))
+@click.argument('rubric_component_description', type=str)
+@click.argument('csv_file', type=click.File('r'))
 @click.argument('csv_team_column', type=str)
 @click.argument('csv_grade_column', type=str)
+@catch_chisubmit_exceptions
 @require_local_config
 @pass_course
 @click.pass_context
-def instructor_grading_load_grades(ctx, course, assignment_id, grade_component_id, csv_file, csv_team_column, csv_grade_column):   
-    assignment = course.get_assignment(assignment_id)
-    if assignment is None:
-        print("Assignment %s does not exist" % assignment_id)
-        ctx.exit(CHISUBMIT_FAIL)
+def instructor_grading_load_grades(ctx, course, assignment_id, rubric_component_description, csv_file, csv_team_column, csv_grade_column):   
+    assignment = get_assignment_or_exit(ctx, course, assignment_id)
 
-    grade_component = assignment.get_grade_component(grade_component_id)
-    if not grade_component:
-        print("Assignment %s does not have a grade component '%s'" % (assignment.assignment_id, grade_component))
+    rubric_component = [rc for rc in assignment.get_rubric_components() if rc.description == rubric_component_description]
+    if len(rubric_component) == 0:
+        print("Assignment %s does not have a rubric component '%s'" % (assignment.assignment_id, rubric_component_description))
         ctx.exit(CHISUBMIT_FAIL)
+    rubric_component = rubric_component[0]
         
     csvf = csv.DictReader(csv_file)
             
     if csv_team_column not in csvf.fieldnames:
-        print("CSV file %s does not have a '%s' column" % (csv_file, csv_team_column))
+        print("CSV file %s does not have a '%s' column" % (csv_file.name, csv_team_column))
         ctx.exit(CHISUBMIT_FAIL)
         
     if csv_grade_column not in csvf.fieldnames:
-        print("CSV file %s does not have a '%s' column" % (csv_file, csv_grade_column))
+        print("CSV file %s does not have a '%s' column" % (csv_file.name, csv_grade_column))
         ctx.exit(CHISUBMIT_FAIL)
+    
+    teams_registrations = get_teams_registrations(course, assignment)
+    registrations = dict([(team.team_id, registration) for team, registration in teams_registrations.items()])
+    
+    # The grades are sent to the server in bulk once the whole
+    # CSV file has been read
+    grade_batch = assignment.grade_batch()
+    loaded = []
             
     for entry in csvf:
         team_id = entry[csv_team_column]
         
-        team = course.get_team(team_id)
-        if team is None:
-            print("%-40s SKIPPING. Not a team in course %s" % (team_id, course.id))
-            continue
-
-        ta = team.get_assignment(assignment_id)
-        if ta is None:
-            print("%-40s SKIPPING. Not registered for assignment %s" % (team_id, assignment_id))
+        registration = registrations.get(team_id)
+        if registration is None:
+            print("%-40s SKIPPING. Not a team registered for assignment %s" % (team_id, assignment_id))
             continue
         
-        if ta.submitted_at is None:
+        if registration.final_submission is None:
             print("%-40s SKIPPING. Has not submitted assignment %s yet" % (team_id, assignment_id))
             continue
     
@@ -127,15 +129,17 @@ def instructor_grading_load_grades(ctx, course, assignment_id, grade_component_i
         else:
             grade = float(grade)
 
-        if grade < 0 or grade > grade_component.points:
-            print("%-40s SKIPPING. Invalid grade value %.2f (%s must be 0 <= x <= %.2f)" % (team_id, grade, grade_component_id, grade_component.points))
+        if grade < 0 or grade > rubric_component.points:
+            print("%-40s SKIPPING. Invalid grade value %.2f (%s must be 0 <= x <= %.2f)" % (team_id, grade, rubric_component_description, rubric_component.points))
             continue
         
-        try:
-            team.set_assignment_grade(assignment_id, grade_component.id, grade)
-            print("%-40s %s <- %.2f" % (team_id, grade_component_id, grade))
-        except Exception:
-            raise
+        grade_batch.set_grade(team_id, rubric_component, grade)
+        loaded.append((team_id, grade))
+        
+    grade_batch.commit()
+    
+    for team_id, grade in loaded:
+        print("%-40s %s <- %.2f" % (team_id, rubric_component_description, grade))
             
 
 @click.command(name="add-conflict")
@@ -166,73 +170,9 @@ def instructor_grading_add_conflict(ctx, course, grader_id, student_id):
 @pass_course
 @click.pass_context
 def instructor_grading_list_grades(ctx, course, detailed):
-    students = [s for s in course.get_students() if not s.dropped]
-    assignments = course.get_assignments(include_rubric=True)
-
-    students.sort(key=operator.attrgetter("user.last_name"))
-    assignments.sort(key=operator.attrgetter("deadline"))
-
-    student_grades = dict([(s.user.username,dict([(a.assignment_id,{}) for a in assignments])) for s in students])
-
-    teams = course.get_teams(include_students=True, include_assignments=True, include_grades=True)
-
-    for team in teams:
-        registrations = team.get_assignment_registrations()
-        for registration in registrations:
-            if registration.final_submission is None:
-                continue
-            assignment_id = registration.assignment.assignment_id
-            for student in team.get_team_members():
-                student_id = student.username
-                if student_id in student_grades:
-                    g = student_grades[student_id][assignment_id]
-                    for grade in registration.get_grades():
-                        rc_description = grade.rubric_component.description
-                        if rc_description in g:
-                            print("Warning: %s already has a grade for rubric component '%s'" % (student_id, rc_description))
-                        else:
-                            g[rc_description] = grade.points
-                    g["__PENALTIES"] = registration.get_total_penalties()
-                    g["__BONUSES"] = registration.get_total_bonuses()                    
-                    g["__TOTAL"] = registration.get_total_grade()
-
-    fields = ["Username","Last Name","First Name"]
-    for assignment in assignments:
-        if detailed:
-            rubric_components = assignment.get_rubric_components()
-            fields += ["%s - %s" % (assignment.assignment_id, rc.description) for rc in rubric_components]
-            fields.append("%s - Penalties" % assignment.assignment_id)
-            fields.append("%s - Bonuses" % assignment.assignment_id) 
-            fields.append("%s - Total" % assignment.assignment_id)
-        else:
-            fields.append("%s" % assignment.assignment_id)
-
-    print(",".join(fields))
-
-    for student in students:
-        fields = [student.user.username, student.user.last_name, student.user.first_name]
-        for assignment in assignments:
-            grades = student_grades[student.user.username][assignment.assignment_id]
-            if detailed:
-                rubric_components = assignment.get_rubric_components()
-                for rc in rubric_components:
-                    if rc.description not in grades:
-                        fields.append("")
-                    else:
-                        fields.append(str(grades[rc.description]))
-                if len(grades) == 0:
-                    fields += ["","",""]
-                else:
-                    fields.append(str(grades["__PENALTIES"]))
-                    fields.append(str(grades["__BONUSES"]))
-                    fields.append(str(grades["__TOTAL"]))
-            else:
-                if len(grades) == 0:
-                    fields.append("")
-                else:
-                    fields.append(str(grades["__TOTAL"]))
-
-        print(",".join(fields))
+    gradebook = course.get_gradebook(detailed = detailed, output = "csv")
+    
+    print(gradebook, end="")
 
 @click.command(name="assign-grader")
 @click.argument('assignment_id', type=str)
@@ -479,7 +419,8 @@ def instructor_grading_list_grader_assignments(ctx, course, assignment_id, grade
 def instructor_grading_list_submissions(ctx, course, assignment_id):
     assignment = get_assignment_or_exit(ctx, course, assignment_id)
 
-    teams_registrations = get_teams_registrations(course, assignment)
+    # Only the team identifiers are needed
+    teams_registrations = get_teams_registrations(course, assignment, team_fields = ["team_id"])
     teams = sorted(list(teams_registrations.keys()), key=operator.attrgetter("team_id"))
 
     conn = create_connection(course, ctx.obj['config'])
@@ -536,7 +477,7 @@ def instructor_grading_show_grading_status(ctx, course, assignment_id, by_grader
     assignment = get_assignment_or_exit(ctx, course, assignment_id, include_rubric = True)
     rubric_components = assignment.get_rubric_components()
 
-    teams_registrations = get_teams_registrations(course, assignment, include_grades = use_stored_grades)
+    teams_registrations = get_teams_registrations(course, assignment, include_grades = use_stored_grades, team_fields = ["team_id"])
     teams = sorted(list(teams_registrations.keys()), key=operator.attrgetter("team_id"))
     
     team_status = []
@@ -894,6 +835,11 @@ def instructor_grading_collect_rubrics(ctx, course, assignment_id, dry_run, only
     teams_registrations = get_teams_registrations(course, assignment, grader=grader, only=only)
     teams = sorted(list(teams_registrations.keys()), key=operator.attrgetter("team_id"))
     
+    # The grades are sent to the server in bulk once all the
+    # rubrics have been collected
+    grade_batch = assignment.grade_batch()
+    collected = []
+    
     for team in teams:
         registration = teams_registrations[team]
         repo = GradingGitRepo.get_grading_repo(ctx.obj['config'], course, team, registration)
@@ -919,8 +865,7 @@ def instructor_grading_collect_rubrics(ctx, course, assignment_id, dry_run, only
             if grade is None:
                 points.append(0.0)
             else:
-                if not dry_run:
-                    registration.set_grade(rc, grade)
+                grade_batch.set_grade(team, rc, grade)
                 points.append(grade)
 
         adjustments = {}
@@ -936,9 +881,14 @@ def instructor_grading_collect_rubrics(ctx, course, assignment_id, dry_run, only
                 adjustments[desc] = p
                 total_bonuses += p
 
-        if not dry_run:
-            registration.grade_adjustments = adjustments
+        grade_batch.set_grade_adjustments(team, adjustments)
+
+        collected.append((team, points, total_penalties, total_bonuses))
 
+    if not dry_run:
+        total_grades = grade_batch.commit()
+
+    for team, points, total_penalties, total_bonuses in collected:
         if ctx.obj["verbose"]:
             print(team.team_id)
             print("Points Obtained: %s" % points)
@@ -946,7 +896,7 @@ def instructor_grading_collect_rubrics(ctx, course, assignment_id, dry_run, only
             print("Bonuses: %.2f" % total_bonuses)
 
         if not dry_run:
-            total_grade = registration.get_total_grade()
+            total_grade = total_grades[team.team_id]
         else:
             total_grade = sum(points) + total_penalties + total_bonuses
             
@@ -28,16 +28,82 @@
 #  POSSIBILITY OF SUCH DAMAGE.
 
 from builtins import object
+from weakref import WeakValueDictionary
 import chisubmit.client.course
 from chisubmit.client.requester import Requester
 
 class Chisubmit(object):
     
-    def __init__(self, login_or_token, base_url, password = None, deferred_save = False, ssl_verify=True):
+    def __init__(self, login_or_token, base_url, password = None, deferred_save = False, ssl_verify=True, cache_dir = None,
+                 keep_raw_data = True, identity_map = True, cache_ttls = None, refresh_cache = False):
         # TODO: Validate URL 
         
-        self._requester = Requester(login_or_token, password, base_url.rstrip("/"), ssl_verify)
+        self._requester = Requester(login_or_token, password, base_url.rstrip("/"), ssl_verify, cache_dir,
+                                    cache_ttls, refresh_cache)
         self._deferred_save = deferred_save
+        
+        # Whether the objects returned by the API keep the JSON they
+        # were decoded from (in _rawData)
+        self._keep_raw_data = keep_raw_data
+        
+        # The objects fetched in this session (while they're still in
+        # use), by URL, so looking one up again returns the same object
+        # without making another request. Any request that modifies a
+        # resource can change others too, so it clears the whole map.
+        if identity_map:
+            self._objects = WeakValueDictionary()
+            self._requester.add_write_listener(lambda method, url: self.invalidate())
+        else:
+            self._objects = None
+    
+    def __get_object_key(self, resource):
+        return self._requester.get_url(resource).rstrip("/")
+    
+    def _get_object(self, resource, include = None):
+        if self._objects is None:
+            return None
+        
+        obj = self._objects.get(self.__get_object_key(resource))
+        
+        # An object fetched without the related objects we need
+        # can't be reused
+        if obj is not None and include is not None:
+            if not all(obj._has_included(rel) for rel in include):
+                return None
+            
+        return obj
+    
+    def _add_object(self, obj):
+        if self._objects is not None and hasattr(obj, "url"):
+            self._objects[self.__get_object_key(obj.url)] = obj
+        return obj
+    
+    def invalidate(self, obj_or_url = None):
+        """
+        Forgets an object (or the object at a URL) fetched in this
+        session, or all of them, so it will be requested again the
+        next time it is looked up.
+        """
+        
+        if self._objects is None:
+            return
+        
+        if obj_or_url is None:
+            self._objects.clear()
+        else:
+            if isinstance(obj_or_url, str):
+                url = obj_or_url
+            else:
+                url = obj_or_url.url
+            self._objects.pop(self.__get_object_key(url), None)
+    
+    def get_cache_stats(self):
+        """
+        Returns how many responses were served from the on-disk cache,
+        stored in it, etc. in this session (or None if there's no cache)
+        """
+        
+        return self._requester.get_cache_stats()
     
     def get_courses(self, include_archived=False):
         """
@@ -55,12 +121,15 @@ class Chisubmit(object):
             "/courses/",
             params = params
         )
-        return [chisubmit.client.course.Course(self, headers, elem) for elem in data]    
+        return [self._add_object(chisubmit.client.course.Course(self, headers, elem)) for elem in data]    
     
-    def get_course(self, course_id, include_users=False, include_assignments=False, include_teams=False):
+    def get_course(self, course_id, include_users=False, include_assignments=False, include_teams=False,
+                   force_request=False):
         """
         :calls: GET /courses/:course
         :param course_id: string
+        :param force_request: bool (don't reuse the course if it was already
+                              fetched in this session)
         :rtype: :class:`chisubmit.client.course.Course`
         """
         assert isinstance(course_id, (str, str)), course_id
@@ -84,12 +153,17 @@ class Chisubmit(object):
         else:
             params = None            
         
+        if not force_request:
+            course = self._get_object("/courses/" + course_id, include)
+            if course is not None:
+                return course
+        
         headers, data = self._requester.request(
             "GET",
             "/courses/" + course_id,
             params = params
         )
-        return chisubmit.client.course.Course(self, headers, data)
+        return self._add_object(chisubmit.client.course.Course(self, headers, data))
  
     def create_course(self, course_id, name, git_usernames = None, git_staging_usernames = None, 
                       extension_policy = None, default_extensions = None):
@@ -58,6 +58,70 @@ class RubricComponent(ChisubmitAPIObject):
     _api_relationships = { }
     
 
+class GradeBatch(object):
+    """
+    Accumulates the grades (and grade adjustments) for many teams in an
+    assignment, and sends them to the server with as few requests as 
+    possible when commit() is called.
+    """
+    
+    DEFAULT_BATCH_SIZE = 500
+    
+    def __init__(self, assignment, batch_size = DEFAULT_BATCH_SIZE):
+        self.assignment = assignment
+        self.batch_size = batch_size
+        self.registrations = {}
+    
+    def __len__(self):
+        return len(self.registrations)
+    
+    def _get_registration(self, team_or_team_id):
+        if isinstance(team_or_team_id, (str, str)):
+            team_id = team_or_team_id
+        else:
+            team_id = team_or_team_id.team_id
+        
+        return self.registrations.setdefault(team_id, {"team_id": team_id, "grades": {}})
+    
+    def set_grade(self, team_or_team_id, rubric_component, points):
+        if points < 0 or points > rubric_component.points:
+            raise ValueError("Invalid grade value %.2f ('%s' must be 0 <= x <= %.2f)" % (points, rubric_component.description, rubric_component.points))
+        
+        registration = self._get_registration(team_or_team_id)
+        registration["grades"][rubric_component.id] = points
+        
+    def set_grade_adjustments(self, team_or_team_id, grade_adjustments):
+        registration = self._get_registration(team_or_team_id)
+        registration["grade_adjustments"] = grade_adjustments
+    
+    def commit(self):
+        """
+        :calls: POST /courses/:course/assignments/:assignment/grades
+        :rtype: dict (total grade of each team in the batch)
+        """
+        registrations = []
+        for registration in self.registrations.values():
+            r = {"team_id": registration["team_id"],
+                 "grades": [{"rubric_component_id": rc_id, "points": points} 
+                            for rc_id, points in registration["grades"].items()]}
+            if "grade_adjustments" in registration:
+                r["grade_adjustments"] = registration["grade_adjustments"]
+            registrations.append(r)
+        
+        total_grades = {}
+        for i in range(0, len(registrations), self.batch_size):
+            headers, data = self.assignment._api_client._requester.request(
+                "POST",
+                self.assignment.url + "/grades",
+                data = {"registrations": registrations[i:i+self.batch_size]}
+            )
+            total_grades.update(data["total_grades"])
+        
+        self.registrations = {}
+        
+        return total_grades
+
+
 class Assignment(ChisubmitAPIObject):
 
     _api_attributes = {                       
@@ -155,6 +219,24 @@ class Assignment(ChisubmitAPIObject):
         )
         return RegistrationResponse(self._api_client, headers, data)       
     
+    def get_stats(self):
+        """
+        :calls: GET /courses/:course/assignments/:assignment/stats
+        :rtype: :class:`chisubmit.client.assignment.AssignmentStats`
+        """
+        
+        headers, data = self._api_client._requester.request(
+            "GET",
+            self.url + "/stats"
+        )
+        return AssignmentStats(self._api_client, headers, data)
+    
+    def grade_batch(self, batch_size = GradeBatch.DEFAULT_BATCH_SIZE):
+        """
+        :param batch_size: int (maximum number of registrations per request)
+        :rtype: :class:`chisubmit.client.assignment.GradeBatch`
+        """
+        return GradeBatch(self, batch_size)
   
     
 class RegistrationResponse(ChisubmitAPIObject):
@@ -182,4 +264,51 @@ class RegistrationResponse(ChisubmitAPIObject):
     _api_relationships = { }
     
     
-        
\ No newline at end of file
+        
+    
+    
+class AssignmentStats(ChisubmitAPIObject):
+    
+    _api_attributes = {
+                       "students": Attribute(name="students", 
+                                             attrtype=APIIntegerType, 
+                                             editable=False),  
+
+                       "dropped_students": Attribute(name="dropped_students", 
+                                                     attrtype=APIIntegerType, 
+                                                     editable=False),  
+
+                       "students_registered": Attribute(name="students_registered", 
+                                                        attrtype=APIIntegerType, 
+                                                        editable=False),  
+
+                       "teams": Attribute(name="teams", 
+                                          attrtype=APIIntegerType, 
+                                          editable=False),  
+
+                       "teams_submitted": Attribute(name="teams_submitted", 
+                                                    attrtype=APIIntegerType, 
+                                                    editable=False),  
+
+                       "students_submitted": Attribute(name="students_submitted", 
+                                                       attrtype=APIIntegerType, 
+                                                       editable=False),  
+
+                       "unsubmitted_teams": Attribute(name="unsubmitted_teams", 
+                                                      attrtype=APIListType(APIStringType), 
+                                                      editable=False),  
+
+                       "unconfirmed_teams": Attribute(name="unconfirmed_teams", 
+                                                      attrtype=APIListType(APIStringType), 
+                                                      editable=False),  
+
+                       "unregistered_students": Attribute(name="unregistered_students", 
+                                                          attrtype=APIListType(APIObjectType("chisubmit.client.users.User")), 
+                                                          editable=False),  
+
+                       "students_in_multiple_teams": Attribute(name="students_in_multiple_teams", 
+                                                               attrtype=APIListType(APIStringType), 
+                                                               editable=False),  
+                      }
+    
+    _api_relationships = { }
@@ -0,0 +1,207 @@
+from builtins import object
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+class HTTPCache(object):
+    """
+    An on-disk cache of responses to GET requests. Each response is stored
+    in its own file, named after a hash of the request, so it can be reused
+    in later runs. While a response is fresh (see TTLS) it is reused without
+    making a request; after that, it is revalidated with its ETag (and reused
+    if the server replies with 304 Not Modified).
+
+    The responses are grouped by course (or, outside of courses, by top-level
+    resource), and a request that modifies anything in a course drops all the
+    responses of that course. When the cache grows beyond max_size bytes, the
+    least recently used responses are evicted.
+    """
+
+    # Only the headers that the client library looks at are kept
+    HEADERS = ["ETag", "Link", "Content-Type"]
+
+    # How long (in seconds) a response can be reused without revalidating
+    # it, by path (where * matches any single segment). Courses, assignments
+    # and their rubrics rarely change; everything else (including the
+    # assignments registered by a team, and any request with parameters,
+    # such as included teams or students) is revalidated every time.
+    TTLS = {"courses/*": 600,
+            "courses/*/assignments": 600,
+            "courses/*/assignments/*": 600,
+            "courses/*/assignments/*/rubric": 600,
+            "courses/*/assignments/*/rubric/*": 600}
+
+    MAX_SIZE = 50 * 1024 * 1024
+
+    def __init__(self, directory, base_url, ttls = None, max_size = None, refresh = False):
+        self.directory = directory
+        self.base_path = urlsplit(base_url).path.rstrip("/")
+        self.ttls = ttls if ttls is not None else self.TTLS
+        self.max_size = max_size if max_size is not None else self.MAX_SIZE
+
+        # Don't reuse any of the cached responses (but still store
+        # the new ones, and invalidate them as usual)
+        self.refresh = refresh
+
+        # The total size of the entries, which is only computed (by
+        # looking at every entry) the first time it's needed
+        self.size = None
+
+        self.stats = {"fresh": 0,
+                      "revalidated": 0,
+                      "misses": 0,
+                      "stored": 0,
+                      "invalidated": 0,
+                      "evicted": 0}
+
+    def _get_segments(self, url):
+        path = urlsplit(url).path
+        if not path.startswith(self.base_path):
+            return []
+        return [s for s in path[len(self.base_path):].split("/") if s]
+
+    def _get_ttl(self, url, params):
+        if params or urlsplit(url).query:
+            return 0
+
+        segments = self._get_segments(url)
+        for pattern, ttl in self.ttls.items():
+            pattern_segments = pattern.split("/")
+            if len(pattern_segments) == len(segments) and \
+               all([p == "*" or p == s for p, s in zip(pattern_segments, segments)]):
+                return ttl
+        return 0
+
+    def _get_scope_dir(self, scope):
+        return os.path.join(self.directory, hashlib.sha1(scope.encode("utf-8")).hexdigest()[:16])
+
+    def _get_path(self, url, params, headers):
+        # Responses depend on who's asking, so the credentials
+        # are part of the key
+        prepared_url = requests.Request("GET", url, params = params).prepare().url
+        key = json.dumps([prepared_url, str(headers.get("Authorization"))])
+        key = hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+        scope = "/".join(self._get_segments(url)[:2])
+        return os.path.join(self._get_scope_dir(scope), key)
+
+    def get(self, url, params, headers):
+        """
+        Returns the (etag, headers, content, fresh) of a cached response,
+        or None if there is no cached response.
+        """
+        if self.refresh:
+            self.stats["misses"] += 1
+            return None
+
+        path = self._get_path(url, params, headers)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            # The modification time is when the entry was last used
+            os.utime(path)
+        except (IOError, OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+
+        fresh = time.time() - entry["time"] < self._get_ttl(url, params)
+        if fresh:
+            self.stats["fresh"] += 1
+        elif entry["etag"] is None:
+            self.stats["misses"] += 1
+            return None
+
+        return entry["etag"], CaseInsensitiveDict(entry["headers"]), entry["content"], fresh
+
+    def put(self, url, params, headers, etag, response_headers, content, revalidated = False):
+        # Responses that can't be revalidated are only useful while fresh
+        if etag is None and self._get_ttl(url, params) == 0:
+            return
+
+        path = self._get_path(url, params, headers)
+        entry = {"etag": etag,
+                 "time": time.time(),
+                 "headers": dict([(h, response_headers[h]) for h in self.HEADERS if h in response_headers]),
+                 "content": content}
+
+        try:
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+
+            # The size of the entry being replaced, if any
+            try:
+                old_size = os.path.getsize(path)
+            except (IOError, OSError):
+                old_size = 0
+
+            # Write to a temporary file first, so other processes
+            # never see a partially written entry
+            fd, tmp_path = tempfile.mkstemp(dir = os.path.dirname(path))
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+
+            if revalidated:
+                self.stats["revalidated"] += 1
+            else:
+                self.stats["stored"] += 1
+
+            if self.size is None:
+                self.size = sum([size for _, size, _ in self._get_entries()])
+            else:
+                self.size += os.path.getsize(path) - old_size
+            if self.size > self.max_size:
+                self._evict()
+        except (IOError, OSError):
+            # The cache is only an optimization
+            pass
+
+    def invalidate(self, url):
+        """
+        Drops the cached responses that a request that modified
+        the resource at url could have changed.
+        """
+        segments = self._get_segments(url)
+
+        # e.g., a change to a team drops the responses of its course,
+        # and the list of courses
+        for scope in set(["/".join(segments[:1]), "/".join(segments[:2])]):
+            scope_dir = self._get_scope_dir(scope)
+            try:
+                self.stats["invalidated"] += len(os.listdir(scope_dir))
+            except (IOError, OSError):
+                continue
+            shutil.rmtree(scope_dir, ignore_errors = True)
+            self.size = None
+
+    def _get_entries(self):
+        entries = []
+        for scope_entry in os.scandir(self.directory):
+            if scope_entry.is_dir():
+                for entry in os.scandir(scope_entry.path):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        # Evict the least recently used entries, leaving some room
+        # so we don't have to do this on every new entry
+        entries = sorted(self._get_entries())
+        self.size = sum([size for _, size, _ in entries])
+
+        for _, size, path in entries:
+            if self.size <= self.max_size * 3 // 4:
+                break
+            try:
+                os.remove(path)
+                self.size -= size
+                self.stats["evicted"] += 1
+            except (IOError, OSError):
+                pass
@@ -30,8 +30,10 @@
 import chisubmit.client.users
 import chisubmit.client.assignment
 import chisubmit.client.team
+from builtins import object
 from chisubmit.client.types import ChisubmitAPIObject, Attribute, AttributeType,\
-    APIStringType, APIIntegerType, Relationship, APIObjectType, APIBooleanType
+    APIStringType, APIIntegerType, Relationship, APIObjectType, APIBooleanType,\
+    APIDateTimeType
 from chisubmit.client.users import User
 import datetime
 
@@ -241,13 +243,21 @@ class Course(ChisubmitAPIObject):
         return None
         
     
-    def get_students(self):
+    def get_students(self, page_size = None, fields = None):
         """
         :calls: GET /courses/:course/students/
+        :param page_size: int (fetch the students in pages of this size)
+        :param fields: list of str (only fetch these attributes of each student;
+                       include "url" if the students will be modified)
         :rtype: List of :class:`chisubmit.client.users.Student`
         """
         
-        students = self.get_related("students")
+        if fields is not None:
+            params = {"fields": ",".join(fields)}
+        else:
+            params = None
+        
+        students = self.get_related("students", params = params, page_size = page_size)
         
         return students     
     
@@ -313,9 +323,10 @@ class Course(ChisubmitAPIObject):
         )
         return None      
     
-    def get_assignments(self, include_rubric = False):
+    def get_assignments(self, include_rubric = False, stream = False):
         """
         :calls: GET /courses/:course/assignments/
+        :param stream: bool (parse the assignments as they are received)
         :rtype: List of :class:`chisubmit.client.assignment.Assignment`
         """
         
@@ -329,13 +340,15 @@ class Course(ChisubmitAPIObject):
         else:
             params = None
         
-        assignments = self.get_related("assignments", params = params)
+        assignments = self.get_related("assignments", params = params, stream = stream)
         
         return assignments             
     
-    def get_assignment(self, assignment_id, include_rubric = False):
+    def get_assignment(self, assignment_id, include_rubric = False, force_request = False):
         """
         :calls: GET /courses/:course/assignments/:assignment/
+        :param force_request: bool (don't reuse the assignment if it was
+                              already fetched in this session)
         :rtype: List of :class:`chisubmit.client.assignment.Assignment`
         """
         
@@ -349,12 +362,19 @@ class Course(ChisubmitAPIObject):
         else:
             params = None        
         
+        resource = "/courses/" + self.course_id + "/assignments/" + assignment_id
+        
+        if not force_request:
+            assignment = self._api_client._get_object(resource, include)
+            if assignment is not None:
+                return assignment
+        
         headers, data = self._api_client._requester.request(
             "GET",
-            "/courses/" + self.course_id + "/assignments/" + assignment_id,
+            resource,
             params = params
         )
-        return chisubmit.client.assignment.Assignment(self._api_client, headers, data)
+        return self._api_client._add_object(chisubmit.client.assignment.Assignment(self._api_client, headers, data))
     
     def create_assignment(self, assignment_id, name, deadline, min_students = None, max_students = None):
         """
@@ -392,12 +412,29 @@ class Course(ChisubmitAPIObject):
         )
         return chisubmit.client.assignment.Assignment(self._api_client, headers, data)    
     
-    def get_teams(self, include_students=False, include_assignments=False, include_grades = False):
+    def get_teams(self, include_students=False, include_assignments=False, include_grades = False, page_size = None, stream = False, fields = None):
         """
         :calls: GET /courses/:course/teams/
+        :param page_size: int (fetch the teams in pages of this size)
+        :param stream: bool (parse the teams as they are received)
+        :param fields: list of str (only fetch these attributes of each team;
+                       include the "*_url" attributes of any relationships that
+                       will be followed, and "url" if the teams will be modified)
         :rtype: List of :class:`chisubmit.client.team.Team`
         """
         
+        return list(self.iter_teams(include_students, include_assignments, include_grades, page_size, stream, fields))
+    
+    def iter_teams(self, include_students=False, include_assignments=False, include_grades = False, page_size = None, stream = False, fields = None):
+        """
+        :calls: GET /courses/:course/teams/
+        :param page_size: int (fetch the teams in pages of this size)
+        :param stream: bool (parse the teams as they are received)
+        :param fields: list of str (only fetch these attributes of each team,
+                       see :meth:`get_teams`)
+        :rtype: Generator of :class:`chisubmit.client.team.Team`
+        """
+        
         include = []
         
         if include_students:
@@ -409,19 +446,25 @@ class Course(ChisubmitAPIObject):
         if include_grades:
             include.append("assignments__grades")            
             
+        params = {}
+
         if len(include) > 0:
-            params = {"include": include}
-        else:
-            params = None
-        
-        teams = self.get_related("teams", params = params)
+            params["include"] = include
+            
+        if fields is not None:
+            params["fields"] = ",".join(fields)
         
-        return teams             
+        return self.iter_related("teams", params = params or None, page_size = page_size, stream = stream)
         
     
-    def get_team(self, team_id, include_students=False, include_assignments=False, include_grades = False):
+    def get_team(self, team_id, include_students=False, include_assignments=False, include_grades = False, fields = None,
+                 force_request = False):
         """
         :calls: GET /courses/:course/teams/
+        :param fields: list of str (only fetch these attributes of the team,
+                       see :meth:`get_teams`)
+        :param force_request: bool (don't reuse the team if it was already
+                              fetched in this session)
         :rtype: :class:`chisubmit.client.team.Team`
         """
         
@@ -438,17 +481,31 @@ class Course(ChisubmitAPIObject):
         if include_grades:
             include.append("assignments__grades")            
 
+        params = {}
+
         if len(include) > 0:
-            params = {"include": include}
-        else:
-            params = None        
+            params["include"] = include
+            
+        if fields is not None:
+            params["fields"] = ",".join(fields)
+        
+        if not force_request:
+            team = self._api_client._get_object(self.teams_url + team_id, include)
+            if team is not None:
+                return team
         
         headers, data = self._api_client._requester.request(
             "GET",
             self.teams_url + team_id,
-            params = params
+            params = params or None
         )
-        return chisubmit.client.team.Team(self._api_client, headers, data)    
+        team = chisubmit.client.team.Team(self._api_client, headers, data)
+        
+        # Only complete teams can be reused
+        if fields is None:
+            self._api_client._add_object(team)
+            
+        return team
     
     def create_team(self, team_id, extensions = None, active = None):
         """
@@ -474,3 +531,139 @@ class Course(ChisubmitAPIObject):
         )
         return chisubmit.client.team.Team(self._api_client, headers, data)        
     
+    def get_changes(self, since = None):
+        """
+        :calls: GET /courses/:course/changes
+        :param since: string (cursor returned by a previous call; if None,
+                      all the teams, registrations, submissions and grades
+                      are returned)
+        :rtype: tuple with a list of :class:`chisubmit.client.course.CourseChange`
+                (in the order in which the changes were made) and the cursor 
+                to use in the next call
+        """
+        
+        if since is not None:
+            params = {"since": since}
+        else:
+            params = None
+        
+        headers, data = self._api_client._requester.request(
+            "GET",
+            self.url + "changes",
+            params = params
+        )
+        
+        changes = [CourseChange(self._api_client, headers, change) for change in data["changes"]]
+        
+        return changes, data["cursor"]
+    
+    def create_teams(self, teams, dry_run = False, batch_size = 500):
+        """
+        :calls: POST /courses/:course/teams/batch/
+        :param teams: list of dict (each with a "team_id", a list of "students"
+                      and, optionally, a list of "assignments" to register the
+                      team for, "extensions", and "active")
+        :param dry_run: bool (only check what would be done)
+        :param batch_size: int (maximum number of teams per request)
+        :rtype: list of dict (the result for each team, with its "team_id",
+                its "status" ("created", "updated", "unchanged" or "error"),
+                and the "errors" if its status is "error")
+        """
+        
+        results = []
+        for i in range(0, len(teams), batch_size):
+            headers, data = self._api_client._requester.request(
+                "POST",
+                self.teams_url + "batch/",
+                data = {"teams": teams[i:i+batch_size],
+                        "dry_run": dry_run}
+            )
+            results += data["teams"]
+        
+        return results
+    
+    def import_roster(self, users, sync = False, dry_run = False):
+        """
+        :calls: POST /courses/:course/roster/
+        :param users: list of dict (each with a "username", "first_name",
+                      "last_name", "email", and "type", which can be
+                      "student", "instructor" or "grader")
+        :param sync: bool (mark students that are not in the roster as dropped)
+        :param dry_run: bool (only check what would be done)
+        :rtype: dict (with the result for each user in "users", with its
+                "username", "type", whether the "user" was "created" or
+                already "exists", and whether the "person" was "added" to
+                the course, "undropped", or already "exists"; or the
+                "errors" in the entry. The dropped students are in
+                "dropped", and the number of users created, persons added,
+                students undropped, and entries with errors are in
+                "users_created", "added", "undropped" and "error")
+        """
+        
+        headers, data = self._api_client._requester.request(
+            "POST",
+            self.url + "roster/",
+            data = {"users": users,
+                    "sync": sync,
+                    "dry_run": dry_run}
+        )
+        
+        return data
+    
+    def get_gradebook(self, detailed = False, output = "json"):
+        """
+        :calls: GET /courses/:course/gradebook
+        :param detailed: bool (include the points of each rubric component, 
+                               the penalties, and the bonuses)
+        :param output: string ("json" or "csv")
+        :rtype: dict mapping each column to a list of values (if output is 
+                "json") or string (if output is "csv"). If a student submitted
+                an assignment in more than one team, there is also a 
+                "Warnings" column.
+        """
+        
+        assert output in ("json", "csv"), output
+        
+        params = {"output": output}
+        
+        if detailed:
+            params["detailed"] = "true"
+        
+        headers, data = self._api_client._requester.request(
+            "GET",
+            self.url + "gradebook",
+            params = params
+        )
+        
+        if output == "csv":
+            return data["data"]
+        else:
+            return data
+
+
+class CourseChange(object):
+    """
+    A team, registration, submission or grade that was created, 
+    updated, or deleted (see :meth:`Course.get_changes`)
+    """
+    
+    # The classes (in chisubmit.client.team) of each type of object
+    TYPES = {"team": "Team",
+             "registration": "Registration",
+             "submission": "Submission",
+             "grade": "Grade"}
+    
+    def __init__(self, api_client, headers, change):
+        self.type = change["type"]
+        self.team_id = change["team_id"]
+        self.assignment_id = change.get("assignment_id")
+        self.id = change.get("id")
+        self.deleted = change["deleted"]
+        self.timestamp = APIDateTimeType.to_python(change["timestamp"], headers, api_client)
+        
+        # The object, as it is after the change (None if it was deleted)
+        if self.deleted:
+            self.obj = None
+        else:
+            obj_class = getattr(chisubmit.client.team, self.TYPES[self.type])
+            self.obj = obj_class(api_client, headers, change["data"])
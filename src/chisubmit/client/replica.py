@@ -0,0 +1,108 @@
+from builtins import object
+
+
+class CourseReplica(object):
+    """
+    A local copy of the teams in a course, with their members, their
+    registrations, and the registrations' submissions and grades. Each
+    call to sync() only fetches what changed since the previous one
+    (see :meth:`chisubmit.client.course.Course.get_changes`).
+    """
+
+    def __init__(self, course):
+        self.course = course
+        self.cursor = None
+
+        # team_id -> Team
+        self._teams = {}
+        # team_id -> {assignment_id -> Registration}
+        self._registrations = {}
+        # (team_id, assignment_id) -> {id -> Submission}
+        self._submissions = {}
+        # (team_id, assignment_id) -> {id -> Grade}
+        self._grades = {}
+
+    def sync(self):
+        """
+        :calls: GET /courses/:course/changes
+        :rtype: List of :class:`chisubmit.client.course.CourseChange` (the
+                changes that were applied)
+        """
+
+        changes, cursor = self.course.get_changes(since = self.cursor)
+
+        for change in changes:
+            self._apply(change)
+
+        self.cursor = cursor
+
+        return changes
+
+    def _apply(self, change):
+        team_id = change.team_id
+        key = (team_id, change.assignment_id)
+
+        if change.type == "team":
+            if change.deleted:
+                self._teams.pop(team_id, None)
+                for assignment_id in self._registrations.pop(team_id, {}):
+                    self._submissions.pop((team_id, assignment_id), None)
+                    self._grades.pop((team_id, assignment_id), None)
+            else:
+                self._teams[team_id] = change.obj
+        elif change.type == "registration":
+            if change.deleted:
+                self._registrations.get(team_id, {}).pop(change.assignment_id, None)
+                self._submissions.pop(key, None)
+                self._grades.pop(key, None)
+            else:
+                self._registrations.setdefault(team_id, {})[change.assignment_id] = change.obj
+        else:
+            if change.type == "submission":
+                objs = self._submissions
+            else:
+                objs = self._grades
+
+            if change.deleted:
+                objs.get(key, {}).pop(change.id, None)
+            else:
+                objs.setdefault(key, {})[change.id] = change.obj
+
+    def get_teams(self):
+        """
+        Returns the teams, sorted by team_id, with their members and
+        registrations (and the registrations' submissions and grades)
+        already fetched, as with get_teams(include_students = True,
+        include_assignments = True, include_grades = True).
+
+        :rtype: List of :class:`chisubmit.client.team.Team`
+        """
+
+        return [self.get_team(team_id) for team_id in sorted(self._teams)]
+
+    def get_team(self, team_id):
+        """
+        Returns a team, like :meth:`get_teams`, or None if the
+        replica doesn't have it.
+
+        :rtype: :class:`chisubmit.client.team.Team`
+        """
+
+        team = self._teams.get(team_id)
+        if team is None:
+            return None
+
+        registrations = self._registrations.get(team_id, {})
+        rel_assignments = []
+        for assignment_id in sorted(registrations):
+            registration = registrations[assignment_id]
+            key = (team_id, assignment_id)
+            submissions = self._submissions.get(key, {})
+            grades = self._grades.get(key, {})
+            setattr(registration, "_rel_submissions", [submissions[pk] for pk in sorted(submissions)])
+            setattr(registration, "_rel_grades", [grades[pk] for pk in sorted(grades)])
+            rel_assignments.append(registration)
+
+        setattr(team, "_rel_assignments", rel_assignments)
+
+        return team
@@ -41,6 +41,7 @@ import sys
 from requests.exceptions import HTTPError
 from chisubmit.client.exceptions import UnknownObjectException,\
     ChisubmitRequestException, BadRequestException, UnauthorizedException
+from chisubmit.client.cache import HTTPCache
 import base64
 import datetime
 
@@ -52,9 +53,54 @@ def json_serial(obj):
     
     raise TypeError("Type not serializable")
 
+def iter_json_list(chunks):
+    # Incrementally parses a JSON list of objects, yielding each
+    # element as soon as it has been completely received.
+    decoder = json.JSONDecoder()
+    buf = ""
+    started = False
+    
+    for chunk in chunks:
+        buf += chunk
+        
+        if not started:
+            buf = buf.lstrip()
+            if len(buf) == 0:
+                continue
+            if buf[0] != "[":
+                raise ValueError("Expected a JSON list")
+            buf = buf[1:]
+            started = True
+        
+        while True:
+            buf = buf.lstrip().lstrip(",").lstrip()
+            if len(buf) == 0 or buf[0] == "]":
+                break
+            try:
+                elem, end = decoder.raw_decode(buf)
+            except ValueError:
+                # Incomplete element; wait for more data
+                break
+            yield elem
+            buf = buf[end:]
+
+def get_next_page_url(headers):
+    # Paginated list endpoints include a Link header pointing to
+    # the next page of results (if there is one)
+    link = headers.get("Link")
+    if link is None:
+        return None
+    
+    for l in requests.utils.parse_header_links(link):
+        if l.get("rel") == "next":
+            return l["url"]
+        
+    return None
+
 class Requester(object):
     
-    def __init__(self, login_or_token, password, base_url, ssl_verify=True):
+    def __init__(self, login_or_token, password, base_url, ssl_verify=True, cache_dir=None,
+                 cache_ttls=None, refresh_cache=False):
         
         self.__base_url = base_url
         
@@ -70,13 +116,37 @@ class Requester(object):
         self.__ssl_verify = ssl_verify
         self.__session = requests.Session()
         self.__session.mount(base_url, HTTPAdapter(max_retries=5))
+        
+        # Called with the method and URL of every successful request
+        # that can modify a resource (i.e., anything but a GET)
+        self.__write_listeners = []
+        
+        # GET responses are stored on disk, and reused (or revalidated
+        # with If-None-Match) the next time they are requested
+        if cache_dir is not None:
+            self.__cache = HTTPCache(cache_dir, base_url, ttls = cache_ttls, refresh = refresh_cache)
+            self.add_write_listener(lambda method, url: self.__cache.invalidate(url))
+        else:
+            self.__cache = None
+
+    def add_write_listener(self, listener):
+        self.__write_listeners.append(listener)
 
-    def request(self, method, resource, data=None, headers=None, params=None):
+    def get_cache_stats(self):
+        if self.__cache is None:
+            return None
+        else:
+            return self.__cache.stats
+
+    def get_url(self, resource):
         if resource.startswith("/"):
-            url = self.__base_url + resource
+            return self.__base_url + resource
         else:
             # TODO: Validate the URL is valid given base_url
-            url = resource
+            return resource
+
+    def request(self, method, resource, data=None, headers=None, params=None, stream=False):
+        url = self.get_url(resource)
 
         all_headers = {}
         all_headers.update(self.__headers)
@@ -86,6 +156,16 @@ class Requester(object):
         if data is not None:
             data = json.dumps(data, default=json_serial)
 
+        use_cache = (method == "GET" and not stream and self.__cache is not None)
+        cached = None
+        if use_cache:
+            cached = self.__cache.get(url, params, all_headers)
+            if cached is not None:
+                etag, cached_headers, cached_content, fresh = cached
+                if fresh:
+                    return cached_headers, json.loads(cached_content)
+                all_headers["If-None-Match"] = etag
+
         # TODO: try..except
         # TODO: remove this jeinky workaround once these are resolved:
         #  - https://github.com/requests/requests/issues/4784
@@ -99,7 +179,8 @@ class Requester(object):
                                             params = params,
                                             data = data,
                                             headers = all_headers,
-                                            verify = self.__ssl_verify)
+                                            verify = self.__ssl_verify,
+                                            stream = stream)
 
                 if response.status_code == 400:
                     raise BadRequestException(method, url, params, data, all_headers, response)
@@ -113,10 +194,30 @@ class Requester(object):
                 elif 500 <= response.status_code < 600:
                     raise ChisubmitRequestException(method, url, params, data, all_headers, response)
 
+                if method != "GET":
+                    for listener in self.__write_listeners:
+                        listener(method, url)
+
+                if response.status_code == 304 and cached is not None:
+                    etag, cached_headers, cached_content, _ = cached
+                    self.__cache.put(url, params, all_headers, etag, cached_headers, cached_content,
+                                     revalidated = True)
+                    return cached_headers, json.loads(cached_content)
+
+                if stream:
+                    # The caller must consume the generator to
+                    # release the connection
+                    response.encoding = "utf-8"
+                    return response.headers, iter_json_list(response.iter_content(chunk_size=8192, decode_unicode=True))
+
                 try:
                     response_data = response.json()
                 except ValueError:
                     response_data = {"data": response.text}
+                else:
+                    if use_cache and response.status_code == 200:
+                        self.__cache.put(url, params, all_headers, response.headers.get("ETag"),
+                                         response.headers, response.text)
 
                 return response.headers, response_data
             except requests.exceptions.ConnectionError:
@@ -38,6 +38,9 @@ from chisubmit.common.utils import is_submission_ready_for_grading
 
 class Grade(ChisubmitAPIObject):
 
+    # Compact instances, without a __dict__ (see ChisubmitAPIObjectType)
+    __slots__ = ()
+
     _api_attributes = {                       
                        "rubric_component_id": Attribute(name="rubric_component_id", 
                                                         attrtype=APIIntegerType, 
@@ -57,6 +60,8 @@ class Grade(ChisubmitAPIObject):
     
 class Submission(ChisubmitAPIObject):
 
+    __slots__ = ()
+
     _api_attributes = {
                        "id": Attribute(name="id", 
                                        attrtype=APIIntegerType, 
@@ -119,6 +124,8 @@ class SubmissionResponse(ChisubmitAPIObject):
 
 class Registration(ChisubmitAPIObject):
 
+    __slots__ = ()
+
     _api_attributes = {
                        "assignment_id": Attribute(name="assignment_id", 
                                                   attrtype=APIStringType, 
@@ -325,6 +332,8 @@ class Registration(ChisubmitAPIObject):
 
 class TeamMember(ChisubmitAPIObject):
 
+    __slots__ = ()
+
     _api_attributes = {
                        "username": Attribute(name="username", 
                                              attrtype=APIStringType, 
@@ -344,6 +353,8 @@ class TeamMember(ChisubmitAPIObject):
 
 class Team(ChisubmitAPIObject):
 
+    __slots__ = ()
+
     _api_attributes = {
                        "team_id": Attribute(name="team_id", 
                                             attrtype=APIStringType, 
@@ -415,29 +426,45 @@ class Team(ChisubmitAPIObject):
         )
         return TeamMember(self._api_client, headers, data)         
     
-    def get_assignment_registrations(self):
+    def get_assignment_registrations(self, page_size = None, fields = None):
         """
         :calls: GET /courses/:course/teams/:team/assignments/
+        :param page_size: int (fetch the registrations in pages of this size)
+        :param fields: list of str (only fetch these attributes of each registration;
+                       include the "*_url" attributes of any relationships that
+                       will be followed, and "url" if the registrations will be modified)
         :rtype: List of :class:`chisubmit.client.team.Registration`
         """
         
-        registrations = self.get_related("assignments")
+        if fields is not None:
+            params = {"fields": ",".join(fields)}
+        else:
+            params = None
+        
+        registrations = self.get_related("assignments", params = params, page_size = page_size)
         
         return registrations   
     
-    def get_assignment_registration(self, assignment_id):
+    def get_assignment_registration(self, assignment_id, force_request = False):
         """
         :calls: GET /courses/:course/teams/:team/assignments/:assignment
+        :param force_request: bool (don't reuse the registration if it was
+                              already fetched in this session)
         :rtype: :class:`chisubmit.client.team.Registration`
         """
         
         assert isinstance(assignment_id, (str, str)), assignment_id
         
+        if not force_request:
+            registration = self._api_client._get_object(self.assignments_url + assignment_id)
+            if registration is not None:
+                return registration
+        
         headers, data = self._api_client._requester.request(
             "GET",
             self.assignments_url + assignment_id
         )
-        return Registration(self._api_client, headers, data)     
+        return self._api_client._add_object(Registration(self._api_client, headers, data))     
       
     def add_assignment_registration(self, assignment_or_assignment_id, grader_or_grader_username = None):
         """
@@ -4,6 +4,7 @@ import datetime
 import pytz
 from six import string_types
 from chisubmit.common.utils import parse_timedelta
+from chisubmit.client.requester import get_next_page_url
 
 class ChisubmitAPIException(Exception):
 
@@ -55,6 +56,34 @@ class AttributeValidationException(AttributeException):
         self.expected_type = expected_type
 
 
+def parse_datetime(value):
+    """
+    Parses a UTC timestamp, as returned by the server (YYYY-MM-DDTHH:MM:SSZ
+    or YYYY-MM-DDTHH:MM:SS.ffffffZ). Raises ValueError if the timestamp
+    is not valid.
+    """
+    # Picking the fields by position is much faster than strptime
+    if len(value) >= 20 and value[-1] == "Z" and value[4] == "-" and value[7] == "-" \
+       and value[10] == "T" and value[13] == ":" and value[16] == ":":
+        if len(value) == 20:
+            microsecond = 0
+        elif value[19] == "." and len(value) <= 27 and value[20:-1].isdigit():
+            microsecond = int(value[20:-1].ljust(6, "0"))
+        else:
+            microsecond = None
+        
+        if microsecond is not None:
+            return datetime.datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                                     int(value[11:13]), int(value[14:16]), int(value[17:19]),
+                                     microsecond, tzinfo = pytz.utc)
+    
+    if len(value) > 19 and value[19] == ".":
+        dt = datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ")
+    else:
+        dt = datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+    return pytz.utc.localize(dt)
+
+
 class AttributeType(object):
     STRING = 1
     INTEGER = 2
@@ -89,68 +118,83 @@ class AttributeType(object):
             
         self.attrtype = attrtype
         self.subtype = subtype
+        self._decoder = None
         
     def to_python(self, value, headers, api_client):
+        return self.get_decoder()(value, headers, api_client)
+    
+    def get_decoder(self):
+        # The decoder is a function that checks and converts a value
+        # of this type, built once so that we don't have to dispatch on
+        # the type every time we decode a value (this adds up when
+        # decoding hundreds of objects with nested objects)
+        if self._decoder is None:
+            self._decoder = self._compile_decoder()
+        return self._decoder
+    
+    def _compile_decoder(self):
+        attrtype = self
+        
         if self.attrtype == AttributeType.STRING:
-            if not isinstance(value, string_types):
-                raise AttributeTypeException(value, self)
-            return value
+            def decode(value, headers, api_client):
+                if not isinstance(value, string_types):
+                    raise AttributeTypeException(value, attrtype)
+                return value
         elif self.attrtype == AttributeType.INTEGER:
-            if not isinstance(value, (int, int)):
-                raise AttributeTypeException(value, self)
-            return value
+            def decode(value, headers, api_client):
+                if not isinstance(value, int):
+                    raise AttributeTypeException(value, attrtype)
+                return value
         elif self.attrtype == AttributeType.DECIMAL:
-            try:
-                return float(value)
-            except ValueError:
-                raise AttributeTypeException(value, self)
+            def decode(value, headers, api_client):
+                try:
+                    return float(value)
+                except ValueError:
+                    raise AttributeTypeException(value, attrtype)
         elif self.attrtype == AttributeType.BOOLEAN:
-            if not isinstance(value, bool):
-                raise AttributeTypeException(value, self)
-            return value
+            def decode(value, headers, api_client):
+                if not isinstance(value, bool):
+                    raise AttributeTypeException(value, attrtype)
+                return value
         elif self.attrtype == AttributeType.DATETIME:
-            if not isinstance(value, string_types):
-                raise AttributeTypeException(value, self)
-            try:
-                if value[19] == ".":
-                    dt = datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ")
-                else:
-                    dt = datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
-                dt = pytz.utc.localize(dt)
-            except ValueError as ve:
-                raise AttributeTypeException(value, self)
-                
-            return dt        
+            def decode(value, headers, api_client):
+                if not isinstance(value, string_types):
+                    raise AttributeTypeException(value, attrtype)
+                try:
+                    return parse_datetime(value)
+                except ValueError:
+                    raise AttributeTypeException(value, attrtype)
         elif self.attrtype == AttributeType.TIMEDELTA:
-            if not isinstance(value, string_types):
-                raise AttributeTypeException(value, self)
-            try:
-                return parse_timedelta(value)
-            except ValueError as ve:
-                raise AttributeTypeException(value, self)
-                
-            return dt        
+            def decode(value, headers, api_client):
+                if not isinstance(value, string_types):
+                    raise AttributeTypeException(value, attrtype)
+                try:
+                    return parse_timedelta(value)
+                except ValueError:
+                    raise AttributeTypeException(value, attrtype)
         elif self.attrtype == AttributeType.LIST:
-            if not isinstance(value, (list, tuple)):
-                raise AttributeTypeException(value, self)
-            rvalue = []
-            for item in value:
-                rvalue.append(self.subtype.to_python(item, headers, api_client))
-            return rvalue
+            decode_item = self.subtype.get_decoder()
+            def decode(value, headers, api_client):
+                if not isinstance(value, (list, tuple)):
+                    raise AttributeTypeException(value, attrtype)
+                return [decode_item(item, headers, api_client) for item in value]
         elif self.attrtype == AttributeType.DICT:
-            if not isinstance(value, dict):
-                raise AttributeTypeException(value, self)
-            rvalue = {}
-            for k, item in list(value.items()):
-                rvalue[k] = self.subtype.to_python(item, headers, api_client)
-            return rvalue
+            decode_item = self.subtype.get_decoder()
+            def decode(value, headers, api_client):
+                if not isinstance(value, dict):
+                    raise AttributeTypeException(value, attrtype)
+                return {k: decode_item(item, headers, api_client) for k, item in value.items()}
         elif self.attrtype == AttributeType.OBJECT:
-            if not isinstance(value, dict):
-                raise AttributeTypeException(value, self)
-            rvalue = self.subtype(api_client, headers, value)
-            return rvalue
+            klass = self.subtype
+            def decode(value, headers, api_client):
+                if not isinstance(value, dict):
+                    raise AttributeTypeException(value, attrtype)
+                return klass(api_client, headers, value)
+        else:
+            def decode(value, headers, api_client):
+                raise AttributeTypeException(value, attrtype)
                 
-        raise AttributeTypeException(value, self)
+        return decode
     
     def to_json(self, value):
         # TODO
@@ -197,16 +241,135 @@ class Relationship(object):
         self.reltype = reltype
         
 
-class ChisubmitAPIObject(object):
+class _PendingRelationship(object):
+    __slots__ = ("decode", "value")
+    
+    def __init__(self, decode, value):
+        self.decode = decode
+        self.value = value
+
+
+class _DictStorage(object):
+    """
+    Stores an attribute in the object's __dict__ (the equivalent
+    of a slot's member descriptor, for classes without __slots__).
+    """
+    
+    def __init__(self, name):
+        self.name = name
         
-    def __init__(self, api_client, headers, attributes):
-        self._api_client = api_client
-        self._headers = headers
-        self._rawData = attributes
+    def __get__(self, obj, objtype = None):
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
         
-        if self._api_client._deferred_save:
-            self.dirty = {api_attr: False for api_attr in self._api_attributes}
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = value
+
+
+class _RelationshipField(object):
+    """
+    Descriptor for the _rel_* attribute with the related objects that
+    were included in the API's representation of an object. These are
+    only decoded the first time they are accessed.
+    """
+    
+    def __init__(self, name, storage):
+        self.name = name
+        self.storage = storage
+        
+    def __get__(self, obj, objtype = None):
+        if obj is None:
+            return self
+        value = self.storage.__get__(obj, objtype)
+        if value.__class__ is _PendingRelationship:
+            value = [value.decode(elem, obj._headers, obj._api_client) for elem in value.value]
+            self.storage.__set__(obj, value)
+        return value
+    
+    def __set__(self, obj, value):
+        self.storage.__set__(obj, value)
+        
+    def has_included(self, obj, include):
+        # Whether the related objects (and, for nested includes like
+        # "grades__rubric_component", theirs) were included in the
+        # object's representation, without decoding them
+        try:
+            value = self.storage.__get__(obj, type(obj))
+        except AttributeError:
+            return False
+        
+        if not include:
+            return True
+        elif value.__class__ is _PendingRelationship:
+            return all(_raw_has_included(elem, include) for elem in value.value)
+        else:
+            return all(elem._has_included(include) for elem in value)
+
+
+def _raw_has_included(data, include):
+    rel_name, _, include = include.partition("__")
+    if rel_name not in data:
+        return False
+    elif include:
+        return all(_raw_has_included(elem, include) for elem in data[rel_name])
+    else:
+        return True
+
+
+class ChisubmitAPIObjectType(type):
+    """
+    Metaclass of ChisubmitAPIObject. Subclasses that declare empty
+    __slots__ get a slot for the url and for each API attribute,
+    relationship URL, and relationship (instead of a __dict__), which
+    makes their instances much smaller. This is worth it for the
+    classes with many instances (e.g., teams or grades), which can't
+    be given any other attributes.
+    """
+    
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        api_attributes = namespace.get("_api_attributes", {})
+        api_relationships = namespace.get("_api_relationships", {})
+        rel_names = ["_rel_" + rel_name for rel_name in api_relationships]
+        
+        if namespace.get("__slots__") == ():
+            names = ["url"] + list(api_attributes) + \
+                    [rel_name + "_url" for rel_name in api_relationships] + rel_names
+            namespace["__slots__"] = tuple(sorted(set(names)))
+        
+        cls = super(ChisubmitAPIObjectType, mcs).__new__(mcs, name, bases, namespace, **kwargs)
+        
+        for rel_name in rel_names:
+            storage = cls.__dict__.get(rel_name)
+            if storage is None:
+                storage = _DictStorage(rel_name)
+            setattr(cls, rel_name, _RelationshipField(rel_name, storage))
+        cls._setters = None
+        
+        return cls
+
 
+class ChisubmitAPIObject(object, metaclass = ChisubmitAPIObjectType):
+    
+    __slots__ = ("_api_client", "_headers", "_rawData", "dirty", "__weakref__")
+    
+    _api_attributes = { }
+    _api_relationships = { }
+    
+    def __init__(self, api_client, headers, attributes):
+        # These are not API attributes, so we bypass __setattr__
+        object.__setattr__(self, "_api_client", api_client)
+        object.__setattr__(self, "_headers", headers)
+        object.__setattr__(self, "dirty", None)
+        
+        # Nothing in the library uses the raw data, so clients
+        # can choose not to keep it around
+        if api_client._keep_raw_data:
+            object.__setattr__(self, "_rawData", attributes)
+        else:
+            object.__setattr__(self, "_rawData", None)
+        
         self._initAttributes()
         self._updateAttributes(attributes)
 
@@ -225,34 +388,67 @@ class ChisubmitAPIObject(object):
         return rel_name in self._api_relationships
         
     def _initAttributes(self):
-        for api_attr in list(self._api_attributes.keys()):
+        for api_attr in self._api_attributes:
             object.__setattr__(self, api_attr, None)
 
+    @classmethod
+    def _get_setters(cls):
+        # Maps each name that can appear in the API's representation of
+        # an object of this class to a function that decodes the value
+        # and stores it. These are built once per class, the first time
+        # an object of the class is created.
+        if cls._setters is None:
+            cls._setters = cls._compile_setters()
+        return cls._setters
+    
+    @classmethod
+    def _compile_setters(cls):
+        def raw_setter(attrname):
+            def setter(obj, value):
+                object.__setattr__(obj, attrname, value)
+            return setter
+
+        def attr_setter(attrname, decode):
+            def setter(obj, value):
+                if value is not None:
+                    value = decode(value, obj._headers, obj._api_client)
+                object.__setattr__(obj, attrname, value)
+            return setter
+
+        def rel_setter(attrname, decode):
+            # The related objects are only decoded if they are used
+            # (see _RelationshipField)
+            def setter(obj, value):
+                object.__setattr__(obj, attrname, _PendingRelationship(decode, value))
+            return setter
+
+        setters = {}
+        
+        for attrname, api_attr in cls._api_attributes.items():
+            # Other *_url attributes must belong to a relationship
+            if not attrname.endswith("_url"):
+                setters[attrname] = attr_setter(attrname, api_attr.type.get_decoder())
+                
+        for rel_name, rel in cls._api_relationships.items():
+            setters[rel_name + "_url"] = raw_setter(rel_name + "_url")
+            setters[rel_name] = rel_setter("_rel_" + rel_name, rel.reltype.get_decoder())
+            
+        setters["url"] = raw_setter("url")
+        
+        return setters
+
     def _updateAttributes(self, attributes):
-        for attrname, attrvalue in list(attributes.items()):
-            if attrname == "url":
-                object.__setattr__(self, attrname, attrvalue)
-            elif self.__is_relationship_attr(attrname):
-                if attrname.endswith("_url"):
-                    object.__setattr__(self, attrname, attrvalue)
-                else:
-                    rel = self._api_relationships[attrname]
-                    rel_values = [rel.reltype.to_python(elem, self._headers, self._api_client) for elem in attrvalue]
-                    setattr(self, "_rel_" + attrname, rel_values)
+        setters = self._get_setters()
+        
+        for attrname, attrvalue in attributes.items():
+            setter = setters.get(attrname)
+            
+            if setter is not None:
+                setter(self, attrvalue)
+            elif attrname.endswith("_url"):
+                raise UnexpectedRelationshipURLException(attrname, attrvalue)
             else:
-                if attrname.endswith("_url"):
-                    raise UnexpectedRelationshipURLException(attrname, attrvalue)
-                    
-                api_attr = self.__get_api_attr(attrname)
-    
-                if api_attr is None:
-                    raise NoSuchAttributeException(attrname, attrvalue)
-                else:
-                    if attrvalue is None:
-                        checked_value = None
-                    else:
-                        checked_value = api_attr.to_python(attrvalue, self._headers, self._api_client)
-                    object.__setattr__(self, attrname, checked_value)       
+                raise NoSuchAttributeException(attrname, attrvalue)
 
     def __setattr__(self, name, value):
         if self.__is_relationship_attr("_rel_" + name):
@@ -266,40 +462,78 @@ class ChisubmitAPIObject(object):
                 raise AttributeNotEditableException(name, value)
             else:
                 if self._api_client._deferred_save:
-                    self.dirty[name] = True
+                    # The attributes that have been edited since
+                    # the last save
+                    if self.dirty is None:
+                        object.__setattr__(self, "dirty", set())
+                    self.dirty.add(name)
                 else:
                     self.edit(**{name: value})                
                 object.__setattr__(self, name, value)
                     
-    def get_related(self, name, force_request=False, params = None):
+    def _has_included(self, include):
+        # Whether the API's representation of the object included the
+        # related objects in include (e.g., "assignments__grades")
+        rel_name, _, include = include.partition("__")
+        if rel_name not in self._api_relationships:
+            return False
+        return getattr(type(self), "_rel_" + rel_name).has_included(self, include)
+
+    def get_related(self, name, force_request=False, params = None, page_size = None, stream = False):
+        return list(self.iter_related(name, force_request, params, page_size, stream))
+        
+    def iter_related(self, name, force_request=False, params = None, page_size = None, stream = False):
         rel = self._api_relationships.get(name, None)
 
         if rel is None:
             raise NoSuchAttributeException(name, None)
         
-        if not force_request and params is None:
+        if not force_request and params is None and page_size is None and not stream:
             if hasattr(self, "_rel_" + name):
                 cached_rel = getattr(self, "_rel_" + name)
                 if cached_rel is not None:
-                    return cached_rel
+                    for elem in cached_rel:
+                        yield elem
+                    return
+        
+        if page_size is not None:
+            params = dict(params or {})
+            params["page_size"] = page_size
+        elif stream:
+            params = dict(params or {})
+            params["stream"] = "true"
         
         rel_url = getattr(self, name + "_url")
-        headers, data = self._api_client._requester.request(
-            "GET",
-            rel_url,
-            params = params
-        )
         
-        return [rel.reltype.to_python(elem, headers, self._api_client) for elem in data]                
+        # Objects with only some of their attributes can't be reused
+        # (see Chisubmit._get_object)
+        complete = params is None or "fields" not in params
+        
+        # If the server paginates the results, follow the "next" links
+        # until we run out of pages.
+        while rel_url is not None:
+            headers, data = self._api_client._requester.request(
+                "GET",
+                rel_url,
+                params = params,
+                stream = stream and page_size is None
+            )
+            
+            for elem in data:
+                obj = rel.reltype.to_python(elem, headers, self._api_client)
+                if complete:
+                    self._api_client._add_object(obj)
+                yield obj
+            
+            # The next page URL already includes all the query parameters
+            rel_url = get_next_page_url(headers)
+            params = None
                     
     def save(self):
         if self._api_client._deferred_save:
-            attrs = {}
-            for attrname, dirty in list(self.dirty.items()):
-                if dirty:
-                    attrs[attrname] = getattr(self, attrname)
-                    self.dirty[attrname] = False
-            if len(attrs) > 0:
+            if self.dirty:
+                attrs = dict([(attrname, getattr(self, attrname)) for attrname in self.dirty])
+                object.__setattr__(self, "dirty", None)
                 self.edit(**attrs)            
         else:
             # TODO: Log a warning?
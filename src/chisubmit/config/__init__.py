@@ -178,6 +178,12 @@ class Config(object):
             return "{}/chisubmit.conf".format(self.config_dir)
 
 
+    def get_cache_dir(self):
+        if self.config_dir is None:
+            return None
+        else:
+            return "{}/cache".format(self.config_dir)
+
     def get_api_url(self):
         return self.config_values[Config.OPTION_API_URL]
     
@@ -169,6 +169,24 @@ class CLIAdminCourseLoadUsers(ChisubmitCLITestCase):
         self.assertEqual(len(student_objs), len(students))
         
         
+    @cli_test
+    def test_admin_course_load_students_dry_run(self, runner):
+        admin, _, _, _ = self.create_clients(runner, "admin")
+        
+        students = self.gen_students(["student1", "student2", "student3", "student4"])
+        csv_file = "students.csv"
+        self.gen_csv(students, csv_file)
+        
+        result = admin.run("admin course load-users",
+                           [COURSE1_ID, csv_file, "username", "first", "last", "email", "--user-type", "student", "--dry-run"])        
+        self.assertEqual(result.exit_code, 0)
+
+        user_objs = User.objects.all()
+        student_objs = Student.objects.filter(course__course_id = COURSE1_ID)
+
+        self.assertEqual(len(user_objs), 1)
+        self.assertEqual(len(student_objs), 0)
+        
     @cli_test
     def test_admin_course_load_students_two(self, runner):
         admin, _, _, _ = self.create_clients(runner, "admin")
@@ -0,0 +1,17 @@
+from chisubmit.tests.common import cli_test, ChisubmitCLITestCase
+
+class CLIInstructorAssignment(ChisubmitCLITestCase):
+            
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 
+                     'course1_pa1', 'course1_pa1_registrations_with_submissions']
+                
+    @cli_test
+    def test_instructor_assignment_stats(self, runner):
+        _, instructors, _, _ = self.create_clients(runner, "admin", instructor_ids=["instructor1"], course_id="cmsc40100")
+        
+        instructor1 = instructors[0]
+        
+        result = instructor1.run("instructor assignment stats", ["pa1"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("4 / 4 students in 2 teams have signed up for assignment pa1", result.output)
+        self.assertIn("2 / 2 teams have submitted the assignment (4 students)", result.output)
@@ -15,6 +15,12 @@ class CLIInstructorGrades(ChisubmitCLITestCase):
         
         result = instructor1.run("instructor grading list-grades --detailed")
         self.assertEqual(result.exit_code, 0)
+        self.assertIn("pa1 - First Task", result.output)
+        self.assertIn("pa1 - Total", result.output)
+        
+        result = instructor1.run("instructor grading list-grades")
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Username,Last Name,First Name,pa1,pa2", result.output)
         
     @cli_test
     def test_instructor_grading_status(self, runner):
@@ -3,7 +3,8 @@ from chisubmit import client
     
 class ChisubmitClientLibsTestCase(APILiveServerTestCase):
         
-    def get_api_client(self, api_token, password=None, deferred_save = False):
+    def get_api_client(self, api_token, password=None, deferred_save = False, cache_dir = None, cache_ttls = None):
         base_url = self.live_server_url + "/api/v1"
         
-        return client.Chisubmit(login_or_token=api_token, password=password, base_url=base_url, deferred_save=deferred_save)  
\ No newline at end of file
+        return client.Chisubmit(login_or_token=api_token, password=password, base_url=base_url, deferred_save=deferred_save,
+                                cache_dir=cache_dir, cache_ttls=cache_ttls)  
\ No newline at end of file
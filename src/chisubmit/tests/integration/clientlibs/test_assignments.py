@@ -16,6 +16,15 @@ class AssignmentTests(ChisubmitClientLibsTestCase):
         self.assertEqual(len(assignments), len(COURSE1_ASSIGNMENTS))
         self.assertCountEqual([a.assignment_id for a in assignments], COURSE1_ASSIGNMENTS)
         
+    def test_get_assignments_streaming(self):
+        c = self.get_api_client("admintoken")
+        
+        course = c.get_course("cmsc40100")
+        assignments = course.get_assignments(include_rubric = True, stream = True)
+        
+        self.assertEqual([a.assignment_id for a in assignments], sorted(COURSE1_ASSIGNMENTS))
+        self.assertEqual(len(assignments[0].get_rubric_components()), 2)
+        
     def test_get_assignment(self):
         c = self.get_api_client("admintoken")
         
@@ -145,4 +154,31 @@ class AssignmentValidationTests(ChisubmitClientLibsTestCase):
         
         self.assertEqual(len(assignments2), len(COURSE2_ASSIGNMENTS) + 1)
         self.assertCountEqual([a.assignment_id for a in assignments2], COURSE2_ASSIGNMENTS + ["pa1"])
-                  
\ No newline at end of file
+                  
+
+class AssignmentStatsTests(ChisubmitClientLibsTestCase):
+    
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 
+                'course1_pa1', 'course1_pa1_registrations', 'course1_pa2']
+    
+    def test_get_stats(self):
+        c = self.get_api_client("admintoken")
+        
+        course = c.get_course("cmsc40100")
+        assignment = course.get_assignment("pa1")
+        
+        stats = assignment.get_stats()
+        self.assertEqual(stats.students, 4)
+        self.assertEqual(stats.students_registered, 4)
+        self.assertEqual(stats.teams, 2)
+        self.assertEqual(stats.teams_submitted, 0)
+        self.assertCountEqual(stats.unsubmitted_teams, ["student1-student2", "student3-student4"])
+        self.assertEqual(stats.unregistered_students, [])
+
+        assignment = course.get_assignment("pa2")
+        
+        stats = assignment.get_stats()
+        self.assertEqual(stats.students_registered, 0)
+        self.assertEqual(stats.teams, 0)
+        self.assertCountEqual([u.username for u in stats.unregistered_students], 
+                              ["student1", "student2", "student3", "student4"])
@@ -18,6 +18,14 @@ class CoursePersonTests(ChisubmitClientLibsTestCase):
         self.assertEqual(len(instructors), len(COURSE1_INSTRUCTORS))
         self.assertCountEqual([i.username for i in instructors], COURSE1_INSTRUCTORS)
         
+    def test_get_students_paginated(self):
+        c = self.get_api_client("admintoken")
+        
+        course = c.get_course("cmsc40100")
+        students = course.get_students(page_size = 3)
+        
+        self.assertEqual([s.username for s in students], sorted(COURSE1_STUDENTS))
+        
     def test_add_instructor_by_username(self):
         c = self.get_api_client("admintoken")
 
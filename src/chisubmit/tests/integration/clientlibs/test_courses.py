@@ -1,8 +1,16 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+
 from chisubmit.backend.api.models import Course
 from chisubmit.tests.integration.clientlibs import ChisubmitClientLibsTestCase
 from chisubmit.tests.common import COURSE1_USERS, COURSE2_USERS
 from chisubmit.client.exceptions import UnknownObjectException,\
     BadRequestException
+from chisubmit.client.cache import HTTPCache
 
 class CourseTests(ChisubmitClientLibsTestCase):
     
@@ -104,6 +112,140 @@ class CourseTests(ChisubmitClientLibsTestCase):
         self.assertEqual(course.name, "Intro to Software Testing")
         self.assertEqual(course.default_extensions, 10)
         
+
+
+class CourseETagCacheTests(ChisubmitClientLibsTestCase):
+
+    fixtures = ['users', 'course1', 'course1_users']
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_course_revalidated(self):
+        # Always revalidate the cached responses
+        c = self.get_api_client("admintoken", cache_dir = self.cache_dir, cache_ttls = {})
+
+        course = c.get_course("cmsc40100")
+        self.assertEqual(course.name, "Introduction to Software Testing")
+
+        cache_files = glob.glob(self.cache_dir + "/*/*")
+        self.assertEqual(len(cache_files), 1)
+
+        # Tamper with the cached response, to check that it's the one
+        # used when the server replies with 304 Not Modified
+        with open(cache_files[0]) as f:
+            entry = json.load(f)
+        content = json.loads(entry["content"])
+        content["name"] = "Cached Software Testing"
+        entry["content"] = json.dumps(content)
+        with open(cache_files[0], "w") as f:
+            json.dump(entry, f)
+
+        # (bypassing the session's identity map, which would return
+        # the same course object without making a request)
+        course = c.get_course("cmsc40100", force_request = True)
+        self.assertEqual(course.name, "Cached Software Testing")
+
+        # After a change, the cached response is no longer valid
+        course_obj = Course.objects.get(course_id="cmsc40100")
+        course_obj.name = "Intro to Software Testing"
+        course_obj.save()
+
+        course = c.get_course("cmsc40100", force_request = True)
+        self.assertEqual(course.name, "Intro to Software Testing")
+
+    def test_cache_per_user(self):
+        c1 = self.get_api_client("admintoken", cache_dir = self.cache_dir)
+        c2 = self.get_api_client("instructor1token", cache_dir = self.cache_dir)
+
+        c1.get_course("cmsc40100")
+        c2.get_course("cmsc40100")
+
+        self.assertEqual(len(glob.glob(self.cache_dir + "/*/*")), 2)
+
+    def test_fresh_responses_reused(self):
+        c = self.get_api_client("admintoken", cache_dir = self.cache_dir)
+        c.get_course("cmsc40100")
+
+        # Courses are reused without revalidating them for a while,
+        # unless they're modified through the client
+        course_obj = Course.objects.get(course_id="cmsc40100")
+        course_obj.name = "Intro to Software Testing"
+        course_obj.save()
+
+        course = c.get_course("cmsc40100", force_request = True)
+        self.assertEqual(course.name, "Introduction to Software Testing")
+        self.assertEqual(c.get_cache_stats()["fresh"], 1)
+
+        course.edit(default_extensions = 2)
+        course = c.get_course("cmsc40100", force_request = True)
+        self.assertEqual(course.name, "Intro to Software Testing")
+        self.assertEqual(c.get_cache_stats()["invalidated"], 1)
+
+    def test_ttls(self):
+        cache = HTTPCache(self.cache_dir, "http://example.org/api/v1")
+        headers = {"Authorization": "Token admintoken"}
+        base_url = "http://example.org/api/v1/courses/cmsc40100"
+
+        def is_fresh(url, params = None):
+            cache.put(url, params, headers, 'W/"etag"', {}, "{}")
+            return cache.get(url, params, headers)[3]
+
+        self.assertTrue(is_fresh(base_url))
+        self.assertTrue(is_fresh(base_url + "/assignments/"))
+        self.assertTrue(is_fresh(base_url + "/assignments/pa1"))
+        self.assertTrue(is_fresh(base_url + "/assignments/pa1/rubric/"))
+
+        # A team's registrations, and responses with included objects,
+        # are always revalidated
+        self.assertFalse(is_fresh(base_url + "/teams/student1-student2/assignments/"))
+        self.assertFalse(is_fresh(base_url + "/teams/student1-student2/assignments/pa1"))
+        self.assertFalse(is_fresh(base_url, {"include": ["teams"]}))
+        self.assertFalse(is_fresh(base_url + "/assignments/", {"include": ["rubric"]}))
+        self.assertFalse(is_fresh(base_url + "?include=students"))
+        self.assertFalse(is_fresh(base_url + "/teams/"))
+
+    def test_eviction(self):
+        cache = HTTPCache(self.cache_dir, "http://example.org/api/v1", max_size = 4000)
+        headers = {"Authorization": "Token admintoken"}
+
+        def put(i):
+            cache.put("http://example.org/api/v1/courses/course%i/" % i, None, headers, None, {}, "x" * 1000)
+
+        now = time.time()
+        for i in range(3):
+            put(i)
+        for i, path in enumerate(sorted(glob.glob(self.cache_dir + "/*/*"), key = os.path.getmtime)):
+            os.utime(path, (now - 100 + i, now - 100 + i))
+
+        # The least recently used entries are evicted first
+        self.assertIsNotNone(cache.get("http://example.org/api/v1/courses/course0/", None, headers))
+        put(3)
+        self.assertEqual(len(glob.glob(self.cache_dir + "/*/*")), 2)
+        self.assertEqual(cache.stats["evicted"], 2)
+        self.assertIsNotNone(cache.get("http://example.org/api/v1/courses/course0/", None, headers))
+        self.assertIsNone(cache.get("http://example.org/api/v1/courses/course1/", None, headers))
+
+        cache.refresh = True
+        self.assertIsNone(cache.get("http://example.org/api/v1/courses/course0/", None, headers))
+
+    def test_overwritten_entries(self):
+        cache = HTTPCache(self.cache_dir, "http://example.org/api/v1", max_size = 4000)
+        headers = {"Authorization": "Token admintoken"}
+
+        # Replacing an entry (e.g., after revalidating it) doesn't
+        # count its size again
+        for i in range(3):
+            for j in range(10):
+                cache.put("http://example.org/api/v1/courses/course%i/" % i, None, headers, None, {}, "x" * 1000)
+
+        self.assertEqual(cache.size, sum([os.path.getsize(path) for path in glob.glob(self.cache_dir + "/*/*")]))
+        self.assertEqual(cache.stats["evicted"], 0)
+        self.assertEqual(len(glob.glob(self.cache_dir + "/*/*")), 3)
+
                  
 class CoursePermissionsTests(ChisubmitClientLibsTestCase):
     
@@ -3,7 +3,11 @@ from chisubmit.tests.common import COURSE1_ASSIGNMENTS, COURSE2_ASSIGNMENTS,\
     COURSE1_TEAMS, COURSE1_TEAM_MEMBERS
 from chisubmit.client.exceptions import BadRequestException
 from chisubmit.backend.api.models import Course, Assignment, TeamMember,\
-    Registration, Submission, Grade
+    Registration, Submission, Grade, Team
+from chisubmit.client.replica import CourseReplica
+from django.utils import timezone
+from datetime import timedelta
+from unittest import mock
 
 class TeamTests(ChisubmitClientLibsTestCase):
     
@@ -68,9 +72,54 @@ class TeamTests(ChisubmitClientLibsTestCase):
             self.assertEqual(len(team._rel_students), len(COURSE1_TEAM_MEMBERS[team.team_id]))
         
         
-    def test_get_team(self):
+    def test_get_teams_paginated(self):
+        c = self.get_api_client("admintoken")
+        
+        course = c.get_course("cmsc40100")
+        teams = course.get_teams(include_students = True, page_size = 1)
+        
+        self.assertEqual(len(teams), len(COURSE1_TEAMS))
+        self.assertEqual([t.team_id for t in teams], sorted(COURSE1_TEAMS))
+        
+        for team in teams:
+            self.assertEqual(len(team._rel_students), len(COURSE1_TEAM_MEMBERS[team.team_id]))
+
+    def test_iter_teams(self):
+        c = self.get_api_client("admintoken")
+        
+        course = c.get_course("cmsc40100")
+        teams = course.iter_teams(page_size = 1)
+        
+        self.assertEqual(next(teams).team_id, sorted(COURSE1_TEAMS)[0])
+        self.assertEqual([t.team_id for t in teams], sorted(COURSE1_TEAMS)[1:])
+        
+    def test_get_teams_streaming(self):
         c = self.get_api_client("admintoken")
         
+        course = c.get_course("cmsc40100")
+        teams = course.get_teams(include_students = True, include_assignments = True, stream = True)
+        
+        self.assertEqual([t.team_id for t in teams], sorted(COURSE1_TEAMS))
+        
+        for team in teams:
+            self.assertEqual(len(team._rel_students), len(COURSE1_TEAM_MEMBERS[team.team_id]))
+            self.assertEqual([r.assignment_id for r in team._rel_assignments], ["pa1"])
+
+    def test_get_teams_fields(self):
+        c = self.get_api_client("admintoken")
+
+        course = c.get_course("cmsc40100")
+        teams = course.get_teams(include_assignments = True, fields = ["team_id"])
+
+        self.assertCountEqual([t.team_id for t in teams], COURSE1_TEAMS)
+
+        for team in teams:
+            self.assertIsNone(team.extensions)
+            self.assertEqual([r.assignment_id for r in team.get_assignment_registrations()], ["pa1"])
+
+    def test_get_team(self):
+        c = self.get_api_client("admintoken")
+
         course = c.get_course("cmsc40100")
         
         for team_name in COURSE1_TEAMS:
@@ -98,7 +147,102 @@ class TeamTests(ChisubmitClientLibsTestCase):
         self.assertEqual(team_obj.team_id, "student2-student3")
         self.assertEqual(team_obj.extensions, 2)
         self.assertEqual(team_obj.active, False)
+
+    def test_create_teams(self):
+        c = self.get_api_client("admintoken")
+        
+        course = c.get_course("cmsc40100")
+        teams = [{"team_id": "student1", "students": ["student1"], "extensions": 2},
+                 {"team_id": "student2", "students": ["student2"], "assignments": ["pa1"]},
+                 {"team_id": "student3", "students": ["student3", "student5"]}]
+        results = course.create_teams(teams, batch_size = 2)
+        
+        self.assertEqual([r["status"] for r in results], ["created", "error", "error"])
+        
+        team_obj = Course.get_by_course_id("cmsc40100").get_team("student1")
+        self.assertIsNotNone(team_obj, "Team was not added to database")
+        self.assertEqual(team_obj.extensions, 2)
+        self.assertEqual([tm.student.user.username for tm in team_obj.get_team_members()], ["student1"])
                     
+class IdentityMapTests(ChisubmitClientLibsTestCase):
+    
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams',
+                'course1_pa1', 'course1_pa1_registrations',
+                'course1_pa2']
+    
+    def count_requests(self, c):
+        return mock.patch.object(c._requester, "request", wraps = c._requester.request)
+    
+    def test_lookups_reuse_objects(self):
+        c = self.get_api_client("admintoken")
+        
+        with self.count_requests(c) as request:
+            course = c.get_course("cmsc40100")
+            self.assertIs(c.get_course("cmsc40100"), course)
+            
+            assignment = course.get_assignment("pa1")
+            self.assertIs(course.get_assignment("pa1"), assignment)
+            
+            teams = course.get_teams()
+            team = course.get_team(COURSE1_TEAMS[0])
+            self.assertIn(team, teams)
+            
+            registration = team.get_assignment_registration("pa1")
+            self.assertIs(team.get_assignment_registration("pa1"), registration)
+        self.assertEqual(request.call_count, 4)
+        
+        with self.count_requests(c) as request:
+            self.assertIsNot(c.get_course("cmsc40100", force_request = True), course)
+            self.assertIsNot(course.get_team(COURSE1_TEAMS[0], force_request = True), team)
+        self.assertEqual(request.call_count, 2)
+        
+    def test_lookups_with_included_objects(self):
+        c = self.get_api_client("admintoken")
+        
+        course = c.get_course("cmsc40100")
+        assignment = course.get_assignment("pa1")
+        team = course.get_teams()[0]
+        
+        with self.count_requests(c) as request:
+            # Objects without the related objects we need are
+            # requested again
+            assignment_with_rubric = course.get_assignment("pa1", include_rubric = True)
+            self.assertIsNot(assignment_with_rubric, assignment)
+            self.assertIs(course.get_assignment("pa1"), assignment_with_rubric)
+            
+            teams_with_grades = course.get_teams(include_assignments = True, include_grades = True)
+            self.assertNotIn(team, teams_with_grades)
+            self.assertIs(course.get_team(team.team_id, include_assignments = True), teams_with_grades[0])
+        self.assertEqual(request.call_count, 2)
+        
+        # Teams with only some of their attributes are not reused
+        c.invalidate()
+        partial_teams = course.get_teams(fields = ["url", "team_id"])
+        with self.count_requests(c) as request:
+            self.assertIsNot(course.get_team(team.team_id), partial_teams[0])
+        self.assertEqual(request.call_count, 1)
+        
+    def test_invalidation(self):
+        c = self.get_api_client("admintoken")
+        
+        course = c.get_course("cmsc40100")
+        team = course.get_team(COURSE1_TEAMS[0])
+        
+        c.invalidate(team)
+        self.assertIs(c.get_course("cmsc40100"), course)
+        self.assertIsNot(course.get_team(COURSE1_TEAMS[0]), team)
+
+        # Modifying anything clears the whole map
+        team = course.get_team(COURSE1_TEAMS[0])
+        course.create_team(team_id = "student2-student3")
+        self.assertIsNot(c.get_course("cmsc40100"), course)
+        self.assertIsNot(course.get_team(COURSE1_TEAMS[0]), team)
+        
+        c = self.get_api_client("admintoken")
+        c._objects = None
+        course = c.get_course("cmsc40100")
+        self.assertIsNot(c.get_course("cmsc40100"), course)
+        
 class TeamMemberTests(ChisubmitClientLibsTestCase):
     
     fixtures = ['users', 'course1', 'course1_users', 'course1_teams']
@@ -335,6 +479,55 @@ class GradeTests(ChisubmitClientLibsTestCase):
                 
                 points += 5
                 
+    def test_grade_batch(self):
+        c = self.get_api_client("admintoken")
+        
+        course = c.get_course("cmsc40100")
+
+        assignment = course.get_assignment("pa1")
+        rubric_components = assignment.get_rubric_components()
+        
+        grade_batch = assignment.grade_batch(batch_size = 1)
+        
+        points = 10
+        expected_totals = {}
+        for t in COURSE1_TEAMS:
+            expected_totals[t] = -5
+            for rc in rubric_components:
+                grade_batch.set_grade(t, rc, points)
+                expected_totals[t] += points
+                points += 5
+            grade_batch.set_grade_adjustments(t, {"Penalty": -5})
+            
+        self.assertEqual(len(grade_batch), len(COURSE1_TEAMS))
+        
+        total_grades = grade_batch.commit()
+        
+        self.assertEqual(len(grade_batch), 0)
+        self.assertEqual(total_grades, expected_totals)
+        
+        for t in COURSE1_TEAMS:
+            registration_obj = Registration.objects.get(team__team_id = t, assignment__assignment_id = "pa1")
+            self.assertEqual(Grade.objects.filter(registration = registration_obj).count(), len(rubric_components))
+
+    def test_grade_batch_invalid(self):
+        c = self.get_api_client("admintoken")
+        
+        course = c.get_course("cmsc40100")
+
+        assignment = course.get_assignment("pa1")
+        rc = assignment.get_rubric_components()[0]
+        
+        grade_batch = assignment.grade_batch()
+        
+        with self.assertRaises(ValueError):
+            grade_batch.set_grade(COURSE1_TEAMS[0], rc, rc.points + 1)
+            
+        grade_batch.set_grade("no-such-team", rc, 0)
+        
+        with self.assertRaises(BadRequestException):
+            grade_batch.commit()
+            
             
 class ExistingGradeTests(ChisubmitClientLibsTestCase):
     
@@ -358,4 +551,75 @@ class ExistingGradeTests(ChisubmitClientLibsTestCase):
             
             self.assertEqual(len(grades), 2)
             self.assertCountEqual([g.rubric_component.description for g in grades], rubric_components_descriptions)
-        
\ No newline at end of file
+        
+
+class GradebookTests(ChisubmitClientLibsTestCase):
+    
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 
+                     'course1_pa1', 'course1_pa1_registrations_with_submissions', 'course1_pa1_grades',
+                     'course1_pa2']
+            
+    def test_get_gradebook(self):
+        c = self.get_api_client("admintoken")
+        
+        course = c.get_course("cmsc40100")
+        
+        gradebook = course.get_gradebook()
+        self.assertEqual(list(gradebook.keys()), ["Username", "Last Name", "First Name", "pa1", "pa2"])
+        self.assertEqual(len(gradebook["pa1"]), len(gradebook["Username"]))
+        
+        totals = dict(zip(gradebook["Username"], gradebook["pa1"]))
+        self.assertEqual(totals["student1"], 80)
+        self.assertEqual(totals["student3"], 92.5)
+
+    def test_get_gradebook_csv(self):
+        c = self.get_api_client("admintoken")
+        
+        course = c.get_course("cmsc40100")
+        
+        gradebook = course.get_gradebook(detailed = True, output = "csv")
+        lines = gradebook.splitlines()
+        self.assertTrue(lines[0].startswith("Username,Last Name,First Name,pa1 - First Task,pa1 - Second Task"))
+        student1 = [l for l in lines if l.startswith("student1,")][0].split(",")
+        self.assertEqual([float(v) for v in student1[3:8]], [45, 35, 0, 0, 80])
+
+
+class CourseReplicaTests(ChisubmitClientLibsTestCase):
+
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams',
+                         'course1_pa1', 'course1_pa1_registrations_with_submissions',
+                         'course1_pa1_grades']
+
+    def setUp(self):
+        # Make the fixtures old enough that they're not returned again
+        # by the second sync (see CourseChanges.cursor_overlap)
+        an_hour_ago = timezone.now() - timedelta(hours = 1)
+        for model in (Team, Registration, Submission, Grade):
+            model.objects.update(updated_at = an_hour_ago)
+
+    def test_sync(self):
+        c = self.get_api_client("admintoken")
+
+        course = c.get_course("cmsc40100")
+        replica = CourseReplica(course)
+        changes = replica.sync()
+        self.assertEqual(len(changes), 11)
+
+        teams = replica.get_teams()
+        self.assertEqual([t.team_id for t in teams], sorted(COURSE1_TEAMS))
+        for team in teams:
+            self.assertCountEqual([s.username for s in team._rel_students], COURSE1_TEAM_MEMBERS[team.team_id])
+            registrations = team.get_assignment_registrations()
+            self.assertEqual([r.assignment_id for r in registrations], ["pa1"])
+            self.assertEqual(len(registrations[0].get_grades()), 2)
+
+        grade = replica.get_team("student3-student4").get_assignment_registrations()[0].get_grades()[0]
+        grade.points = 10
+
+        Grade.objects.get(pk = 4).delete()
+
+        changes = replica.sync()
+        self.assertEqual([(ch.type, ch.id, ch.deleted) for ch in changes], [("grade", 3, False), ("grade", 4, True)])
+
+        registration = replica.get_team("student3-student4").get_assignment_registrations()[0]
+        self.assertEqual([(g.rubric_component_id, g.points) for g in registration.get_grades()], [(1, 10)])
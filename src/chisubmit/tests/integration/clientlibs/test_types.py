@@ -0,0 +1,121 @@
+import datetime
+from unittest import mock
+
+import pytz
+from django.test import SimpleTestCase
+
+from chisubmit.client.types import parse_datetime, APIDateTimeType,\
+    AttributeTypeException, NoSuchAttributeException,\
+    UnexpectedRelationshipURLException, _PendingRelationship
+from chisubmit.client.team import Team
+
+
+class FakeAPIClient(object):
+    _deferred_save = False
+    _keep_raw_data = True
+
+
+class AttributeDecoderTests(SimpleTestCase):
+
+    def test_parse_datetime(self):
+        for value, fmt in (("2042-01-31T12:34:56Z", "%Y-%m-%dT%H:%M:%SZ"),
+                           ("2042-01-31T12:34:56.123456Z", "%Y-%m-%dT%H:%M:%S.%fZ"),
+                           ("2042-01-31T12:34:56.5Z", "%Y-%m-%dT%H:%M:%S.%fZ")):
+            expected = pytz.utc.localize(datetime.datetime.strptime(value, fmt))
+            self.assertEqual(parse_datetime(value), expected)
+            self.assertEqual(parse_datetime(value).tzinfo, pytz.utc)
+
+    def test_invalid_datetimes(self):
+        for value in ("2042-01-31", "2042-13-31T12:34:56Z", "2042-01-31T12:34:56+00:00",
+                      "2042-01-31T12:34:56.Z", "2042-01-31 12:34:56Z", "yesterday"):
+            with self.assertRaises(AttributeTypeException):
+                APIDateTimeType.to_python(value, {}, FakeAPIClient())
+
+    def test_decode_object(self):
+        team = Team(FakeAPIClient(), {}, {"url": "http://example.org/teams/team1",
+                                          "team_id": "team1",
+                                          "extensions": 2,
+                                          "active": True,
+                                          "students_url": "http://example.org/teams/team1/students/",
+                                          "assignments_url": "http://example.org/teams/team1/assignments/",
+                                          "assignments": [{"assignment_id": "pa1",
+                                                           "final_submission_id": None,
+                                                           "grade_adjustments": {"Late": -5},
+                                                           "grading_started": False}]})
+
+        self.assertEqual(team.team_id, "team1")
+        self.assertEqual(team.students_url, "http://example.org/teams/team1/students/")
+        self.assertFalse(hasattr(team, "_rel_students"))
+
+        self.assertTrue(hasattr(team, "_rel_assignments"))
+        self.assertIs(team._rel_assignments[0], team.get_related("assignments")[0])
+        self.assertEqual(len(team._rel_assignments), 1)
+        self.assertEqual(team._rel_assignments[0].assignment_id, "pa1")
+        self.assertEqual(team._rel_assignments[0].final_submission_id, None)
+        self.assertEqual(team._rel_assignments[0].grade_adjustments, {"Late": -5.0})
+
+    def test_decode_invalid_object(self):
+        with self.assertRaises(NoSuchAttributeException):
+            Team(FakeAPIClient(), {}, {"team_id": "team1", "foo": 42})
+
+        with self.assertRaises(UnexpectedRelationshipURLException):
+            Team(FakeAPIClient(), {}, {"team_id": "team1", "foo_url": "http://example.org/"})
+
+        with self.assertRaises(AttributeTypeException):
+            Team(FakeAPIClient(), {}, {"team_id": "team1", "extensions": "two"})
+
+        # Related objects are only decoded when they are accessed
+        team = Team(FakeAPIClient(), {}, {"team_id": "team1", "assignments": [{"assignment_id": 1}]})
+        with self.assertRaises(AttributeTypeException):
+            team._rel_assignments
+
+    def test_has_included(self):
+        team = Team(FakeAPIClient(), {}, {"team_id": "team1",
+                                          "assignments": [{"assignment_id": "pa1", "grades": []},
+                                                          {"assignment_id": "pa2", "grades": []}]})
+        
+        self.assertTrue(team._has_included("assignments"))
+        self.assertTrue(team._has_included("assignments__grades"))
+        self.assertFalse(team._has_included("assignments__submissions"))
+        self.assertFalse(team._has_included("students"))
+        self.assertFalse(team._has_included("foo"))
+        
+        # The related objects are not decoded to check this
+        self.assertIs(Team._rel_assignments.storage.__get__(team, Team).__class__, _PendingRelationship)
+        
+        self.assertEqual(len(team._rel_assignments), 2)
+        self.assertTrue(team._has_included("assignments__grades"))
+        self.assertFalse(team._has_included("assignments__submissions"))
+
+    def test_compact_objects(self):
+        data = {"team_id": "team1", "extensions": 2, "students": []}
+        team = Team(FakeAPIClient(), {}, data)
+
+        self.assertFalse(hasattr(team, "__dict__"))
+        self.assertIs(team._rawData, data)
+        self.assertEqual(team.active, None)
+        self.assertFalse(hasattr(team, "url"))
+        self.assertFalse(hasattr(team, "_rel_assignments"))
+        with self.assertRaises(AttributeError):
+            team.foo = 42
+
+        team._rel_students = ["student1"]
+        self.assertEqual(team.get_related("students"), ["student1"])
+
+        api_client = FakeAPIClient()
+        api_client._keep_raw_data = False
+        self.assertIsNone(Team(api_client, {}, data)._rawData)
+
+    def test_deferred_save(self):
+        api_client = FakeAPIClient()
+        api_client._deferred_save = True
+        team = Team(api_client, {}, {"url": "http://example.org/teams/team1", "team_id": "team1", "extensions": 2})
+
+        team.extensions = 3
+        team.active = False
+        self.assertEqual(team.extensions, 3)
+
+        with mock.patch.object(Team, "edit") as edit:
+            team.save()
+            team.save()
+        edit.assert_called_once_with(extensions = 3, active = False)
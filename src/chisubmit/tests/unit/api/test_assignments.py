@@ -3,6 +3,9 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
 
+from chisubmit.backend.api.models import Course, Student, Team, TeamMember,\
+    Registration
+
 
 class AssignmentTests(APITestCase):
     
@@ -37,3 +40,56 @@ class AssignmentTests(APITestCase):
         response = self.client.post(url, data = post_data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         
+
+
+class AssignmentStatsTests(APITestCase):
+    
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 
+                'course1_pa1', 'course1_pa1_registrations_with_submissions']
+
+    def setUp(self):
+        course = Course.objects.get(course_id="cmsc40100")
+        
+        # student5 has not signed up, and student6 has dropped the course
+        Student.objects.create(course=course, user=User.objects.get(username="student5"))
+        Student.objects.create(course=course, user=User.objects.get(username="student6"), dropped=True)
+        
+        # student3-student4 has not submitted, and student4 has not 
+        # confirmed. student1 is also (incorrectly) in that team.
+        team = Team.objects.get(course=course, team_id="student3-student4")
+        TeamMember.objects.filter(team=team, student__user__username="student4").update(confirmed=False)
+        TeamMember.objects.create(team=team, student=Student.objects.get(course=course, user__username="student1"))
+        Registration.objects.filter(team=team).update(final_submission=None)
+    
+    def test_get_assignment_stats(self):
+        user = User.objects.get(username='instructor1')
+        self.client.force_authenticate(user=user)
+        
+        url = reverse('assignment-stats', args=["cmsc40100", "pa1"])
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        self.assertEqual(response.data["students"], 5)
+        self.assertEqual(response.data["dropped_students"], 1)
+        self.assertEqual(response.data["students_registered"], 4)
+        self.assertEqual(response.data["teams"], 2)
+        self.assertEqual(response.data["teams_submitted"], 1)
+        self.assertEqual(response.data["students_submitted"], 2)
+        self.assertEqual(response.data["unsubmitted_teams"], ["student3-student4"])
+        self.assertEqual(response.data["unconfirmed_teams"], ["student3-student4"])
+        self.assertEqual([u["username"] for u in response.data["unregistered_students"]], ["student5"])
+        self.assertEqual(response.data["students_in_multiple_teams"], ["student1"])
+
+    def test_get_assignment_stats_as_student(self):
+        user = User.objects.get(username='student1')
+        self.client.force_authenticate(user=user)
+        
+        url = reverse('assignment-stats', args=["cmsc40100", "pa1"])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Students can't tell whether an assignment exists
+        url = reverse('assignment-stats', args=["cmsc40100", "pa9"])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,101 @@
+from django.urls import reverse
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+
+from chisubmit.backend.api.authentication import TokenCache, get_token_cache
+
+
+class TokenCacheTests(SimpleTestCase):
+
+    def test_lru(self):
+        cache = TokenCache(max_size = 2, ttl = 60)
+        cache.set("a", (User(pk = 1), "a"))
+        cache.set("b", (User(pk = 2), "b"))
+        cache.get("a")
+        cache.set("c", (User(pk = 3), "c"))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_ttl(self):
+        cache = TokenCache(max_size = 2, ttl = 0)
+        cache.set("a", (User(pk = 1), "a"))
+
+        self.assertIsNone(cache.get("a"))
+
+    def test_invalidate_user(self):
+        cache = TokenCache(max_size = 10, ttl = 60)
+        cache.set("a", (User(pk = 1), "a"))
+        cache.set("b", (User(pk = 2), "b"))
+        cache.invalidate_user(1)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("b"))
+
+    @override_settings(CACHES = {"tokens": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+                       CHISUBMIT_TOKEN_CACHE = {"CACHE_ALIAS": "tokens"})
+    def test_shared_cache(self):
+        cache = get_token_cache()
+        cache.set("a", (User(pk = 1, username = "a"), "a"))
+        cache.clear()
+
+        user, _ = cache.get("a")
+        self.assertEqual(user.username, "a")
+
+        cache.invalidate_user(1, ["a"])
+        cache.clear()
+        self.assertIsNone(cache.get("a"))
+
+
+class CachingTokenAuthenticationTests(APITestCase):
+
+    fixtures = ['users']
+
+    def setUp(self):
+        get_token_cache().clear()
+
+    def get_user(self, token, num_queries = None):
+        url = reverse('auth-user-detail')
+        if num_queries is None:
+            return self.client.get(url, HTTP_AUTHORIZATION = "Token " + token)
+        with self.assertNumQueries(num_queries):
+            return self.client.get(url, HTTP_AUTHORIZATION = "Token " + token)
+
+    def test_token_cached(self):
+        response = self.get_user("instructor1token")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["username"], "instructor1")
+
+        # Only the query to fetch the user being shown
+        response = self.get_user("instructor1token", num_queries = 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["username"], "instructor1")
+
+    def test_invalid_token_not_cached(self):
+        for i in range(2):
+            response = self.get_user("nosuchtoken", num_queries = 1)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_reset_token(self):
+        self.assertEqual(self.get_user("instructor1token").status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('auth-user-token') + "?reset=true",
+                                   HTTP_AUTHORIZATION = "Token instructor1token")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["old_token"], "instructor1token")
+
+        self.assertEqual(self.get_user("instructor1token").status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get_user(response.data["token"]).status_code, status.HTTP_200_OK)
+
+    def test_user_deactivated(self):
+        self.assertEqual(self.get_user("instructor1token").status_code, status.HTTP_200_OK)
+
+        user = User.objects.get(username = "instructor1")
+        user.is_active = False
+        user.save()
+
+        self.assertEqual(self.get_user("instructor1token").status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,146 @@
+from django.urls import reverse
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+from django.contrib.auth.models import User
+
+from chisubmit.backend.api.models import Assignment, RubricComponent, Course,\
+    record_course_changes
+from chisubmit.backend.api.cache import read_cache_stats
+
+
+class ReadCacheTests(APITransactionTestCase):
+
+    # The read cache is only used outside transactions, so these
+    # tests can't run inside one
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 'course1_pa1']
+
+    def setUp(self):
+        caches["default"].clear()
+        read_cache_stats.reset()
+
+    def get(self, username, url, expected_cache = None, **kwargs):
+        self.client.force_authenticate(user=User.objects.get(username=username))
+        response = self.client.get(url, **kwargs)
+        if expected_cache is not None:
+            self.assertEqual(response["X-Chisubmit-Cache"], expected_cache)
+        return response
+
+    def test_course_detail(self):
+        url = reverse('course-detail', args=["cmsc40100"])
+
+        response = self.get("grader1", url, "miss")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cached_response = self.get("grader1", url, "hit")
+        self.assertEqual(cached_response.data, response.data)
+
+        # Other users with the same roles share the cached response,
+        # users with different roles don't
+        self.get("grader2", url, "hit")
+        instructor_response = self.get("instructor1", url, "miss")
+        self.assertIn("git_server_connstr", instructor_response.data)
+
+        self.assertEqual(read_cache_stats.get(), {"course-detail": {"hits": 2, "misses": 2}})
+
+    def test_query_params(self):
+        url = reverse('assignment-list', args=["cmsc40100"])
+
+        self.get("instructor1", url, "miss")
+        response = self.get("instructor1", url, "miss", data = {"include": "rubric"})
+        self.assertIn("rubric", response.data[0])
+        response = self.get("instructor1", url, "hit", data = {"include": "rubric"})
+        self.assertIn("rubric", response.data[0])
+
+    def test_assignment_list_invalidated(self):
+        url = reverse('assignment-list', args=["cmsc40100"])
+
+        self.get("instructor1", url, "miss")
+        self.get("instructor1", url, "hit")
+
+        post_data = {"assignment_id": "pa3",
+                     "name": "Programming Assignment 3",
+                     "deadline": "2042-03-21T20:00:00Z"}
+        response = self.client.post(url, data = post_data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.get("instructor1", url, "miss")
+        self.assertIn("pa3", [a["assignment_id"] for a in response.data])
+
+    def test_rubric_list_invalidated(self):
+        url = reverse('rubric-list', args=["cmsc40100", "pa1"])
+
+        response = self.get("instructor1", url, "miss")
+        self.get("instructor1", url, "hit")
+
+        rc = RubricComponent.objects.get(pk = response.data[0]["id"])
+        rc.points = 42
+        rc.save()
+
+        response = self.get("instructor1", url, "miss")
+        self.assertEqual(response.data[0]["points"], "42.00")
+
+    def test_team_detail_per_student(self):
+        url = reverse('team-detail', args=["cmsc40100", "student1-student2"])
+
+        self.get("student1", url, "miss")
+        self.get("student1", url, "hit")
+
+        # Students in other teams can't see the team, even if it's cached
+        response = self.get("student3", url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.get("student2", url, "miss")
+
+        # Graders share the cached response
+        self.get("grader1", url, "miss")
+        self.get("grader2", url, "hit")
+
+    def test_version_shared_by_processes(self):
+        url = reverse('course-detail', args=["cmsc40100"])
+
+        self.get("instructor1", url, "miss")
+        self.get("instructor1", url, "hit")
+
+        # A change made by another process only bumps the version
+        # in the database
+        Course.objects.filter(course_id = "cmsc40100").update(name = "Intro to Software Testing")
+        record_course_changes([Course.objects.get(course_id = "cmsc40100").pk])
+
+        response = self.get("instructor1", url, "miss")
+        self.assertEqual(response.data["name"], "Intro to Software Testing")
+
+    def test_errors_not_cached(self):
+        url = reverse('rubric-list', args=["cmsc40100", "pa9"])
+
+        for i in range(2):
+            response = self.get("instructor1", url)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        Assignment.objects.create(course_id = 1, assignment_id = "pa9", name = "PA9",
+                                  deadline = "2042-03-21T20:00:00Z")
+        response = self.get("instructor1", url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cache_stats(self):
+        url = reverse('cache-stats')
+
+        response = self.get("instructor1", url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.get("instructor1", reverse('course-detail', args=["cmsc40100"]), "miss")
+        response = self.get("admin", url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"read_cache": {"course-detail": {"hits": 0, "misses": 1}}})
+
+
+class ReadCacheTransactionTests(APITestCase):
+
+    fixtures = ['users', 'course1', 'course1_users']
+
+    def test_not_cached_in_transaction(self):
+        self.client.force_authenticate(user=User.objects.get(username='instructor1'))
+        url = reverse('course-detail', args=["cmsc40100"])
+
+        for i in range(2):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(response.has_header("X-Chisubmit-Cache"))
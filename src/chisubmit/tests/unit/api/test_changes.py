@@ -0,0 +1,170 @@
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+
+from chisubmit.backend.api.models import Team, Registration, Submission, Grade
+
+
+class CourseChangesTests(APITestCase):
+
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams',
+                         'course1_pa1', 'course1_pa1_registrations_with_submissions', 'course1_pa1_grades']
+
+    def setUp(self):
+        # Make everything in the fixtures an hour old, so we can
+        # tell it apart from the changes made by the tests
+        self.before = timezone.now() - timedelta(minutes = 30)
+        an_hour_ago = timezone.now() - timedelta(hours = 1)
+        for model in (Team, Registration, Submission, Grade):
+            model.objects.update(updated_at = an_hour_ago)
+
+    def get_changes(self, username, since = None):
+        self.client.force_authenticate(user=User.objects.get(username=username))
+        url = reverse('course-changes', args=["cmsc40100"])
+        if since is not None:
+            response = self.client.get(url, {"since": since})
+        else:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def get_since(self):
+        return self.before.isoformat()
+
+    def test_all_changes(self):
+        data = self.get_changes("instructor1")
+
+        types = [c["type"] for c in data["changes"]]
+        self.assertEqual(types.count("team"), 2)
+        self.assertEqual(types.count("registration"), 2)
+        self.assertEqual(types.count("submission"), 3)
+        self.assertEqual(types.count("grade"), 4)
+
+        team = [c for c in data["changes"] if c["type"] == "team"][0]
+        self.assertFalse(team["deleted"])
+        self.assertEqual(team["data"]["team_id"], team["team_id"])
+        self.assertEqual(len(team["data"]["students"]), 2)
+
+        grade = [c for c in data["changes"] if c["type"] == "grade"][0]
+        self.assertEqual(grade["data"]["points"], str(Grade.objects.get(pk = grade["id"]).points))
+
+    def test_constant_queries(self):
+        self.client.force_authenticate(user=User.objects.get(username="instructor1"))
+        url = reverse('course-changes', args=["cmsc40100"])
+
+        # The course (with the user's roles) and one query per kind of
+        # object, plus the team members
+        with self.assertNumQueries(6):
+            self.client.get(url)
+
+    def test_no_changes(self):
+        data = self.get_changes("instructor1", self.get_since())
+        self.assertEqual(data["changes"], [])
+
+    def test_changes_since(self):
+        grade = Grade.objects.get(pk = 3)
+        grade.points = 10
+        grade.save()
+
+        registration = Registration.objects.get(pk = 1)
+        registration.grade_adjustments = {"Late": -5}
+        registration.save()
+
+        data = self.get_changes("instructor1", self.get_since())
+        self.assertEqual([(c["type"], c.get("id")) for c in data["changes"]],
+                         [("grade", 3), ("registration", None)])
+        self.assertEqual(data["changes"][0]["team_id"], "student3-student4")
+        self.assertEqual(data["changes"][0]["assignment_id"], "pa1")
+        self.assertEqual(data["changes"][0]["data"]["points"], "10.00")
+
+    def test_grade_batch(self):
+        self.client.force_authenticate(user=User.objects.get(username="instructor1"))
+        url = reverse('grade-batch', args=["cmsc40100","pa1"])
+        post_data = {"registrations": [
+                        {"team_id": "student1-student2",
+                         "grades": [{"rubric_component_id": 1, "points": 40}],
+                         "grade_adjustments": {"Late": -5}}
+                     ]}
+        response = self.client.post(url, data = post_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = self.get_changes("instructor1", self.get_since())
+        self.assertCountEqual([(c["type"], c["team_id"]) for c in data["changes"]],
+                              [("grade", "student1-student2"), ("registration", "student1-student2")])
+
+    def test_team_members(self):
+        self.client.force_authenticate(user=User.objects.get(username="instructor1"))
+        url = reverse('teammember-detail', args=["cmsc40100", "student1-student2", "student2"])
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        data = self.get_changes("instructor1", self.get_since())
+        self.assertEqual(len(data["changes"]), 1)
+        self.assertEqual(data["changes"][0]["team_id"], "student1-student2")
+        self.assertEqual([s["username"] for s in data["changes"][0]["data"]["students"]], ["student1"])
+
+    def test_deletions(self):
+        Grade.objects.get(pk = 1).delete()
+
+        data = self.get_changes("instructor1", self.get_since())
+        self.assertEqual(data["changes"],
+                         [{"type": "grade", "team_id": "student1-student2", "assignment_id": "pa1", "id": 1,
+                           "deleted": True, "timestamp": data["changes"][0]["timestamp"]}])
+
+        Team.objects.get(team_id = "student3-student4").delete()
+
+        data = self.get_changes("instructor1", self.get_since())
+        deleted = [(c["type"], c["team_id"]) for c in data["changes"] if c["deleted"]]
+        self.assertIn(("team", "student3-student4"), deleted)
+        self.assertIn(("registration", "student3-student4"), deleted)
+
+        # Deletions are only reported to clients that already have the objects
+        self.assertEqual(self.get_changes("instructor1")["changes"][-1]["deleted"], False)
+
+    def test_student(self):
+        data = self.get_changes("student1")
+        self.assertEqual(set([c["team_id"] for c in data["changes"]]), set(["student1-student2"]))
+
+        Team.objects.get(team_id = "student3-student4").delete()
+        data = self.get_changes("student1", self.get_since())
+        self.assertEqual(data["changes"], [])
+
+    def test_student_team_deleted(self):
+        self.client.force_authenticate(user=User.objects.get(username="instructor1"))
+        response = self.client.delete(reverse('team-detail', args=["cmsc40100", "student1-student2"]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        # The student is no longer in the team, but still sees it go
+        data = self.get_changes("student1", self.get_since())
+        deleted = [(c["type"], c["team_id"]) for c in data["changes"] if c["deleted"]]
+        self.assertIn(("team", "student1-student2"), deleted)
+        self.assertEqual(set([c["team_id"] for c in data["changes"]]), set(["student1-student2"]))
+
+        data = self.get_changes("student3", self.get_since())
+        self.assertEqual(data["changes"], [])
+
+    def test_cursor(self):
+        data = self.get_changes("instructor1")
+        cursor = data["cursor"]
+
+        grade = Grade.objects.get(pk = 3)
+        grade.points = 10
+        grade.save()
+
+        # The cursor is a bit behind the time of the request, so the
+        # change may be returned more than once, but it's never missed
+        data = self.get_changes("instructor1", cursor)
+        self.assertEqual([(c["type"], c.get("id")) for c in data["changes"]], [("grade", 3)])
+        self.assertGreaterEqual(data["cursor"], cursor)
+
+    def test_invalid_since(self):
+        self.client.force_authenticate(user=User.objects.get(username="instructor1"))
+        url = reverse('course-changes', args=["cmsc40100"])
+
+        for since in ("yesterday", "2042-13-01T00:00:00Z", "2042-01-01T00:00:00"):
+            response = self.client.get(url, {"since": since})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -4,7 +4,8 @@ from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
 
 from pprint import pprint
-from chisubmit.backend.api.models import Course, Student, Instructor
+from chisubmit.backend.api.models import Course, Student, Instructor,\
+    CourseRoles
 
 class CourseTests(APITestCase):
     
@@ -58,7 +59,58 @@ class CourseTests(APITestCase):
 
         instructor_obj = Instructor.objects.get(course__course_id = 'cmsc40100', user__username = "instructor1")
         self.assertEqual(instructor_obj.git_username, "git-instructor1")
+
+
+class CourseRolesTests(APITestCase):
+    
+    fixtures = ['users', 'course1', 'course1_users', 'course2', 'course2_users']
+    
+    def test_get_roles(self):
+        course = Course.objects.get(course_id='cmsc40100')
         
+        instructor = User.objects.get(username='instructor1')
         
-    
+        with self.assertNumQueries(1):
+            roles = course.get_roles(instructor)
+        self.assertEqual(roles, set([CourseRoles.INSTRUCTOR]))
+        
+        self.assertEqual(course.get_roles(User.objects.get(username='grader1')), set([CourseRoles.GRADER]))
+        self.assertEqual(course.get_roles(User.objects.get(username='student1')), set([CourseRoles.STUDENT]))
+        self.assertEqual(course.get_roles(User.objects.get(username='student5')), set())
+        self.assertEqual(course.get_roles(User.objects.get(username='admin')), set([CourseRoles.ADMIN]))
+        
+    def test_get_courses_as_student(self):
+        user = User.objects.get(username='student1')
+        self.client.force_authenticate(user=user)
+        
+        url = reverse('course-list')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([c["course_id"] for c in response.data], ["cmsc40100"])
+
+    def test_get_courses_as_admin(self):
+        user = User.objects.get(username='admin')
+        self.client.force_authenticate(user=user)
         
+        url = reverse('course-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual([c["course_id"] for c in response.data], ["cmsc40100", "cmsc40110"])
+
+    def test_get_course_num_queries(self):
+        user = User.objects.get(username='student1')
+        self.client.force_authenticate(user=user)
+
+        url = reverse('course-detail', args=["cmsc40100"])
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_course_not_member(self):
+        user = User.objects.get(username='student5')
+        self.client.force_authenticate(user=user)
+
+        url = reverse('course-detail', args=["cmsc40100"])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
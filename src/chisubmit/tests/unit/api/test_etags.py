@@ -0,0 +1,114 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+
+from chisubmit.backend.api.models import Course, record_course_changes
+
+
+class ETagTests(APITestCase):
+
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 'course1_pa1']
+
+    def get(self, username, url, etag = None, **kwargs):
+        self.client.force_authenticate(user=User.objects.get(username=username))
+        if etag is not None:
+            kwargs["HTTP_IF_NONE_MATCH"] = etag
+        return self.client.get(url, **kwargs)
+
+    def test_not_modified(self):
+        url = reverse('course-detail', args=["cmsc40100"])
+
+        response = self.get("instructor1", url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        response = self.get("instructor1", url, etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        response = self.get("instructor1", url, 'W/"foo", ' + etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.get("instructor1", url, 'W/"foo"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_request(self):
+        url = reverse('assignment-list', args=["cmsc40100"])
+
+        etag = self.get("instructor1", url)["ETag"]
+        self.assertNotEqual(self.get("instructor1", url, data = {"include": "rubric"})["ETag"], etag)
+        self.assertNotEqual(self.get("grader1", url)["ETag"], etag)
+        self.assertNotEqual(self.get("instructor1", reverse('team-list', args=["cmsc40100"]))["ETag"], etag)
+
+        # Users can't reuse another user's ETag
+        response = self.get("student1", url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_changes_after_write(self):
+        url = reverse('assignment-list', args=["cmsc40100"])
+
+        etag = self.get("instructor1", url)["ETag"]
+
+        post_data = {"assignment_id": "pa3",
+                     "name": "Programming Assignment 3",
+                     "deadline": "2042-03-21T20:00:00Z"}
+        # The version is bumped once the changes are committed
+        with self.captureOnCommitCallbacks(execute = True):
+            response = self.client.post(url, data = post_data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.get("instructor1", url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("pa3", [a["assignment_id"] for a in response.data])
+
+    def test_etag_changes_after_team_member_change(self):
+        url = reverse('team-detail', args=["cmsc40100", "student1-student2"])
+
+        etag = self.get("instructor1", url)["ETag"]
+
+        team_member_url = reverse('teammember-detail', args=["cmsc40100", "student1-student2", "student2"])
+        with self.captureOnCommitCallbacks(execute = True):
+            response = self.client.delete(team_member_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.get("instructor1", url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_version_per_course(self):
+        course = Course.objects.get(course_id="cmsc40100")
+        version = course.version
+
+        course.name = "Intro to Software Testing"
+        with self.captureOnCommitCallbacks(execute = True):
+            course.save()
+        self.assertEqual(Course.objects.get(course_id="cmsc40100").version, version + 1)
+
+    def test_version_not_saved(self):
+        course = Course.objects.get(course_id="cmsc40100")
+        version = course.version
+
+        with self.captureOnCommitCallbacks(execute = True):
+            record_course_changes([course.pk])
+
+        # Saving the course (with a stale version) doesn't write it back
+        course.name = "Intro to Software Testing"
+        with self.captureOnCommitCallbacks(execute = True):
+            course.save()
+        self.assertEqual(Course.objects.get(course_id="cmsc40100").version, version + 2)
+
+    def test_version_bumped_on_commit(self):
+        course = Course.objects.get(course_id="cmsc40100")
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            record_course_changes([course.pk])
+        self.assertEqual(Course.objects.get(course_id="cmsc40100").version, course.version)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_errors_have_no_etag(self):
+        response = self.get("instructor1", reverse('rubric-list', args=["cmsc40100", "pa9"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(response.has_header("ETag"))
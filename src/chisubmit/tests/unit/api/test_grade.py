@@ -2,6 +2,13 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
+from decimal import Decimal
+import csv
+import io
+import json
+
+from chisubmit.backend.api.models import Grade, Registration, Team, TeamMember,\
+    Student
 
 
 class GradeTests(APITestCase):
@@ -21,3 +28,183 @@ class GradeTests(APITestCase):
         response = self.client.post(url, data = post_data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         
+
+
+class GradeBatchTests(APITestCase):
+    
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 
+                         'course1_pa1', 'course1_pa1_registrations', 'course1_pa1_grades']    
+
+    def test_grade_batch(self):
+        user = User.objects.get(username='instructor1')
+        self.client.force_authenticate(user=user)
+
+        url = reverse('grade-batch', args=["cmsc40100","pa1"])
+        
+        post_data = {"registrations": [
+                        {"team_id": "student1-student2",
+                         "grades": [{"rubric_component_id": 1, "points": 40},
+                                    {"rubric_component_id": 2, "points": 30}],
+                         "grade_adjustments": {"Late": -5}},
+                        {"team_id": "student3-student4",
+                         "grades": [{"rubric_component_id": 2, "points": 20}]}
+                     ]}
+        
+        # The number of queries does not depend on the size of the batch
+        # (this includes the savepoints for the transaction, locking the
+        # registrations, and bumping the course version once it's committed)
+        with self.assertNumQueries(14), self.captureOnCommitCallbacks(execute = True):
+            response = self.client.post(url, data = post_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["grades_created"], 0)
+        self.assertEqual(response.data["grades_updated"], 3)
+        self.assertEqual(response.data["total_grades"], {"student1-student2": Decimal("65"),
+                                                         "student3-student4": Decimal("62.5")})
+
+        registration = Registration.objects.get(team__team_id="student1-student2", assignment__assignment_id="pa1")
+        self.assertEqual(dict([(g.rubric_component_id, g.points) for g in registration.grade_set.all()]),
+                         {1: Decimal("40"), 2: Decimal("30")})
+        self.assertEqual(Decimal(str(registration.grade_adjustments["Late"])), Decimal("-5"))
+
+    def test_grade_batch_create(self):
+        user = User.objects.get(username='instructor1')
+        self.client.force_authenticate(user=user)
+
+        Grade.objects.all().delete()
+
+        url = reverse('grade-batch', args=["cmsc40100","pa1"])
+        
+        post_data = {"registrations": [
+                        {"team_id": "student1-student2",
+                         "grades": [{"rubric_component_id": 1, "points": 40},
+                                    {"rubric_component_id": 2, "points": 30}]}
+                     ]}
+        
+        response = self.client.post(url, data = post_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["grades_created"], 2)
+        self.assertEqual(response.data["grades_updated"], 0)
+        self.assertEqual(Grade.objects.count(), 2)
+
+    def test_grade_batch_invalid(self):
+        user = User.objects.get(username='instructor1')
+        self.client.force_authenticate(user=user)
+
+        url = reverse('grade-batch', args=["cmsc40100","pa1"])
+        
+        post_data = {"registrations": [
+                        {"team_id": "student1-student2",
+                         "grades": [{"rubric_component_id": 1, "points": 10}]},
+                        {"team_id": "student3-student4",
+                         "grades": [{"rubric_component_id": 2, "points": 60}]},
+                        {"team_id": "no-such-team",
+                         "grades": [{"rubric_component_id": 2, "points": 10}]}
+                     ]}
+        
+        response = self.client.post(url, data = post_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data["registrations"]), 2)
+
+        # Nothing in the batch is applied
+        self.assertEqual(Grade.objects.get(pk=1).points, Decimal("45"))
+
+    def test_grade_batch_as_grader(self):
+        user = User.objects.get(username='grader1')
+        self.client.force_authenticate(user=user)
+
+        url = reverse('grade-batch', args=["cmsc40100","pa1"])
+        
+        post_data = {"registrations": [
+                        {"team_id": "student1-student2",
+                         "grades": [{"rubric_component_id": 1, "points": 10}]}
+                     ]}
+        
+        response = self.client.post(url, data = post_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Grade.objects.get(pk=1).points, Decimal("45"))
+
+        url = reverse('grade-batch', args=["cmsc40100","pa9"])
+        response = self.client.post(url, data = post_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class GradebookTests(APITestCase):
+    
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 
+                'course1_pa1', 'course1_pa1_registrations_with_submissions', 'course1_pa1_grades',
+                'course1_pa2']    
+
+    def setUp(self):
+        registration = Registration.objects.get(pk=1)
+        registration.grade_adjustments = {"Penalty": -5, "Bonus": 2.5}
+        registration.save()
+
+    def test_gradebook(self):
+        user = User.objects.get(username='instructor1')
+        self.client.force_authenticate(user=user)
+
+        url = reverse('gradebook', args=["cmsc40100"])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        gradebook = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(list(gradebook.keys()), ["Username", "Last Name", "First Name", "pa1", "pa2"])
+        
+        totals = dict(zip(gradebook["Username"], gradebook["pa1"]))
+        self.assertEqual(totals["student1"], 77.5)
+        self.assertEqual(totals["student2"], 77.5)
+        self.assertEqual(totals["student3"], 92.5)
+        self.assertEqual(totals["student4"], 92.5)
+        self.assertEqual(set(gradebook["pa2"]), set([None]))
+        self.assertNotIn("Warnings", gradebook)
+
+    def test_gradebook_multiple_teams(self):
+        user = User.objects.get(username='instructor1')
+        self.client.force_authenticate(user=user)
+
+        # student1 is also (incorrectly) in student3-student4
+        TeamMember.objects.create(team=Team.objects.get(team_id="student3-student4"), 
+                                  student=Student.objects.get(user__username="student1"))
+
+        url = reverse('gradebook', args=["cmsc40100"])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        gradebook = json.loads(b"".join(response.streaming_content))
+        totals = dict(zip(gradebook["Username"], gradebook["pa1"]))
+        warnings = dict(zip(gradebook["Username"], gradebook["Warnings"]))
+        self.assertEqual(totals["student1"], 77.5)
+        self.assertEqual(warnings["student1"], "pa1: submitted in more than one team (student1-student2, student3-student4), using student1-student2")
+        self.assertIsNone(warnings["student2"])
+
+        response = self.client.get(url, {"output": "csv"})
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode("utf-8"))))
+        self.assertEqual([r["Username"] for r in rows if r["Warnings"] != ""], ["student1"])
+
+    def test_gradebook_detailed_csv(self):
+        user = User.objects.get(username='instructor1')
+        self.client.force_authenticate(user=user)
+
+        url = reverse('gradebook', args=["cmsc40100"])
+        
+        with self.assertNumQueries(6):
+            response = self.client.get(url, {"detailed": "true", "output": "csv"})
+            content = b"".join(response.streaming_content).decode("utf-8")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        rows = list(csv.DictReader(io.StringIO(content)))
+        row = [r for r in rows if r["Username"] == "student1"][0]
+        self.assertEqual(Decimal(row["pa1 - First Task"]), Decimal("45"))
+        self.assertEqual(Decimal(row["pa1 - Second Task"]), Decimal("35"))
+        self.assertEqual(Decimal(row["pa1 - Penalties"]), Decimal("-5"))
+        self.assertEqual(Decimal(row["pa1 - Bonuses"]), Decimal("2.5"))
+        self.assertEqual(Decimal(row["pa1 - Total"]), Decimal("77.5"))
+        self.assertEqual(row["pa2 - Total"], "")
+
+    def test_gradebook_as_grader(self):
+        user = User.objects.get(username='grader1')
+        self.client.force_authenticate(user=user)
+
+        url = reverse('gradebook', args=["cmsc40100"])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -2,6 +2,10 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from chisubmit.backend.api.models import Course, Team, TeamMember, Registration
 
 class RegisterTests(APITestCase):
     
@@ -131,3 +135,63 @@ class RegisterExistingTeamErrorTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)     
              
                 
+
+        self.assertEqual(response.data["students"],
+                         ["'student2' is already registered for assignment 'pa1' in another team"])
+
+
+class RegisterQueryTests(APITestCase):
+
+    fixtures = ['users', 'course1', 'course1_users', 'course1_pa1', 'course1_teams']
+
+    def register(self, username, students):
+        self.client.force_authenticate(user=User.objects.get(username=username))
+        url = reverse('register', args=["cmsc40100", "pa1"])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data = {"students": students})
+        return response, len(queries.captured_queries)
+
+    def add_teams(self, username, num_teams):
+        course = Course.objects.get(course_id = "cmsc40100")
+        student = course.get_student(User.objects.get(username = username))
+        for i in range(num_teams):
+            team = Team.objects.create(course = course, team_id = "%s-%i" % (username, i))
+            TeamMember.objects.create(team = team, student = student)
+
+    def test_queries_independent_of_teams(self):
+        # The existing student1-student2 team is a perfect match
+        response, num_queries = self.register("student1", ["student1", "student2"])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.data["new_team"])
+        Registration.objects.all().delete()
+
+        self.add_teams("student1", 10)
+        self.add_teams("student2", 10)
+
+        response, num_queries_more_teams = self.register("student1", ["student1", "student2"])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.data["new_team"])
+        self.assertEqual(num_queries_more_teams, num_queries)
+
+    def test_new_team(self):
+        self.add_teams("student1", 10)
+
+        response, _ = self.register("instructor1", ["student1", "student3"])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data["new_team"])
+        self.assertEqual(response.data["team"]["team_id"], "student1-student3")
+        self.assertCountEqual([tm["username"] for tm in response.data["team_members"]], ["student1", "student3"])
+        self.assertTrue(all([tm["confirmed"] for tm in response.data["team_members"]]))
+
+    def test_registered_in_duplicate_team(self):
+        # student1 is registered with a team that has the same members
+        # as other (unregistered) teams
+        self.add_teams("student1", 3)
+        Registration.objects.create(team = Team.objects.get(team_id = "student1-1"),
+                                    assignment = Course.objects.get(course_id = "cmsc40100").get_assignment("pa1"))
+
+        response, _ = self.register("student1", ["student1", "student2"])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["students"],
+                         ["'student1' is already registered for assignment 'pa1' in another team"])
@@ -0,0 +1,140 @@
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+
+from chisubmit.backend.api.models import Course, Student, Instructor, Grader
+
+
+class RosterImportTests(APITestCase):
+
+    fixtures = ['users', 'course1', 'course1_users']
+
+    def entry(self, username, person_type = "student"):
+        return {"username": username,
+                "first_name": "F" + username,
+                "last_name": "L" + username,
+                "email": username + "@example.org",
+                "type": person_type}
+
+    def post(self, data, username = "admin", content_type = None, params = "", expected_status = status.HTTP_200_OK):
+        self.client.force_authenticate(user=User.objects.get(username=username))
+        url = reverse('roster-import', args=["cmsc40100"]) + params
+
+        with CaptureQueriesContext(connection) as queries:
+            if content_type is None:
+                response = self.client.post(url, data = data, format="json")
+            else:
+                response = self.client.post(url, data = data, content_type = content_type)
+        self.num_queries = len(queries.captured_queries)
+        self.assertEqual(response.status_code, expected_status)
+        return response.data
+
+    def get_students(self, dropped = False):
+        return sorted(Student.objects.filter(course__course_id = "cmsc40100", dropped = dropped)
+                                     .values_list("user__username", flat=True))
+
+    def test_import_roster(self):
+        users = [self.entry("student1"), self.entry("student5"), self.entry("newstudent"),
+                 self.entry("newgrader", "grader"), self.entry("instructor1", "instructor")]
+        data = self.post({"users": users})
+
+        self.assertEqual(data["users"],
+                         [{"username": "student1", "type": "student", "user": "exists", "person": "exists"},
+                          {"username": "student5", "type": "student", "user": "exists", "person": "added"},
+                          {"username": "newstudent", "type": "student", "user": "created", "person": "added"},
+                          {"username": "newgrader", "type": "grader", "user": "created", "person": "added"},
+                          {"username": "instructor1", "type": "instructor", "user": "exists", "person": "exists"}])
+        self.assertEqual((data["users_created"], data["added"], data["undropped"], data["error"]), (2, 3, 0, 0))
+        self.assertEqual(data["dropped"], [])
+
+        user_obj = User.objects.get(username = "newstudent")
+        self.assertEqual((user_obj.first_name, user_obj.last_name, user_obj.email),
+                         ("Fnewstudent", "Lnewstudent", "newstudent@example.org"))
+        self.assertIn("newstudent", self.get_students())
+        self.assertIn("student5", self.get_students())
+        self.assertTrue(Grader.objects.filter(course__course_id = "cmsc40100", user__username = "newgrader").exists())
+        self.assertEqual(Instructor.objects.filter(course__course_id = "cmsc40100").count(), 1)
+
+    def test_default_extensions(self):
+        course_obj = Course.objects.get(course_id = "cmsc40100")
+        course_obj.extension_policy = Course.EXT_PER_STUDENT
+        course_obj.default_extensions = 3
+        course_obj.save()
+
+        self.post({"users": [self.entry("newstudent")]})
+        self.assertEqual(Student.objects.get(user__username = "newstudent").extensions, 3)
+
+    def test_sync(self):
+        Student.objects.filter(user__username = "student2").update(dropped = True)
+
+        users = [self.entry("student1"), self.entry("student2"), self.entry("student3")]
+        data = self.post({"users": users, "sync": True})
+
+        self.assertEqual(data["users"][1]["person"], "undropped")
+        self.assertEqual(data["dropped"], ["student4"])
+        self.assertEqual(self.get_students(), ["student1", "student2", "student3"])
+        self.assertEqual(self.get_students(dropped = True), ["student4"])
+
+    def test_errors(self):
+        invalid_email = self.entry("student5")
+        invalid_email["email"] = "student5"
+        users = [self.entry("student6", "ta"), invalid_email, self.entry("student7"),
+                 self.entry("student7"), self.entry("student7", "grader")]
+        data = self.post({"users": users, "sync": True})
+
+        self.assertEqual(data["users"][0]["errors"], ['type: "ta" is not a valid choice.'])
+        self.assertEqual(data["users"][1]["errors"], ["email: Enter a valid email address."])
+        self.assertEqual(data["users"][2]["person"], "added")
+        self.assertEqual(data["users"][3]["errors"], ["User 'student7' appears more than once as a student"])
+        self.assertEqual(data["users"][4]["person"], "added")
+        self.assertEqual(data["error"], 3)
+
+        # Students with errors in their entries are not dropped
+        self.assertNotIn("student5", self.get_students())
+        self.assertEqual(self.get_students(), ["student7"])
+        self.assertEqual(data["dropped"], ["student1", "student2", "student3", "student4"])
+
+    def test_dry_run(self):
+        users = [self.entry("newstudent"), self.entry("student1")]
+        data = self.post({"users": users, "sync": True, "dry_run": True})
+
+        self.assertTrue(data["dry_run"])
+        self.assertEqual(data["users_created"], 1)
+        self.assertEqual(data["dropped"], ["student2", "student3", "student4"])
+        self.assertFalse(User.objects.filter(username = "newstudent").exists())
+        self.assertEqual(self.get_students(), ["student1", "student2", "student3", "student4"])
+
+    def test_constant_queries(self):
+        self.post({"users": [self.entry("newstudent1"), self.entry("newgrader1", "grader")]})
+        num_queries = self.num_queries
+
+        self.post({"users": [self.entry("newstudent%i" % i) for i in range(2, 20)] +
+                            [self.entry("newgrader2", "grader"), self.entry("student5")]})
+        self.assertEqual(self.num_queries, num_queries)
+
+    def test_csv(self):
+        csv = "username,first_name,last_name,email,type\n" + \
+              "student5,F5,L5,student5@example.org,student\n" + \
+              "newstudent,F,L,newstudent@example.org,student\n"
+        data = self.post(csv, content_type = "text/csv", params = "?sync=true")
+
+        self.assertEqual([r["person"] for r in data["users"]], ["added", "added"])
+        self.assertEqual(self.get_students(), ["newstudent", "student5"])
+
+    def test_ndjson(self):
+        ndjson = "\n".join([json.dumps(self.entry("student5")), "", json.dumps(self.entry("newstudent"))])
+        data = self.post(ndjson, content_type = "application/x-ndjson", params = "?dry_run=1")
+
+        self.assertTrue(data["dry_run"])
+        self.assertEqual([r["user"] for r in data["users"]], ["exists", "created"])
+
+        self.post("{}\n{", content_type = "application/x-ndjson", expected_status = status.HTTP_400_BAD_REQUEST)
+
+    def test_instructors_cant_import_roster(self):
+        self.post({"users": [self.entry("newstudent")]}, username = "instructor1",
+                  expected_status = status.HTTP_403_FORBIDDEN)
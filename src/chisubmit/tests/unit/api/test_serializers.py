@@ -0,0 +1,87 @@
+from django.test import SimpleTestCase
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from django.contrib.auth.models import User
+
+from chisubmit.backend.api.models import Course, CourseRoles, Students, Read
+from chisubmit.backend.api.serializers import ChisubmitSerializer,\
+    CourseSerializer
+
+
+class SecretSerializer(ChisubmitSerializer):
+    name = serializers.CharField()
+    secret = serializers.CharField()
+    secret_url = serializers.SerializerMethodField()
+
+    hidden_fields = { "secret": Students,
+                      "secret_url": Students }
+
+    owner_override = { "secret_url": Read }
+
+    def get_secret_url(self, obj):
+        obj["secret_url_calls"] += 1
+        return "http://example.org/%s" % obj["secret"]
+
+
+class HiddenFieldsTests(SimpleTestCase):
+
+    def serialize(self, roles, is_owner = False, course = "course"):
+        request = Request(APIRequestFactory().get("/"))
+        request.user = "user"
+        obj = {"name": "foo", "secret": "bar", "secret_url_calls": 0}
+        serializer = SecretSerializer([obj, obj], many=True,
+                                      context = {"request": request, "course": course,
+                                                 "roles": roles, "is_owner": is_owner})
+        return serializer.data, obj["secret_url_calls"]
+
+    def test_hidden_fields_not_evaluated(self):
+        data, calls = self.serialize(set([CourseRoles.STUDENT]))
+        self.assertEqual([list(d.keys()) for d in data], [["name"], ["name"]])
+        self.assertEqual(calls, 0)
+
+    def test_visible_fields(self):
+        for roles in (set([CourseRoles.INSTRUCTOR]), set([CourseRoles.STUDENT, CourseRoles.GRADER])):
+            data, calls = self.serialize(roles)
+            self.assertEqual([list(d.keys()) for d in data], [["name", "secret", "secret_url"]] * 2)
+            self.assertEqual(data[0]["secret_url"], "http://example.org/bar")
+            self.assertEqual(calls, 2)
+
+    def test_owner_override(self):
+        data, calls = self.serialize(set([CourseRoles.STUDENT]), is_owner = True)
+        self.assertEqual([list(d.keys()) for d in data], [["name", "secret_url"]] * 2)
+        self.assertEqual(calls, 2)
+
+    def test_no_course(self):
+        data, calls = self.serialize(set([CourseRoles.STUDENT]), course = None)
+        self.assertEqual([list(d.keys()) for d in data], [["name", "secret", "secret_url"]] * 2)
+
+    def test_hidden_field_names_cached(self):
+        student = SecretSerializer.get_hidden_field_names(set([CourseRoles.STUDENT]), False)
+        self.assertEqual(student, frozenset(["secret", "secret_url"]))
+        self.assertIs(student, SecretSerializer.get_hidden_field_names(set([CourseRoles.STUDENT]), False))
+        self.assertEqual(SecretSerializer.get_hidden_field_names(set([CourseRoles.STUDENT]), True), frozenset(["secret"]))
+        self.assertEqual(SecretSerializer.get_hidden_field_names(set([CourseRoles.INSTRUCTOR]), False), frozenset())
+        self.assertEqual(CourseSerializer.get_hidden_field_names(set([CourseRoles.STUDENT]), False),
+                         frozenset(CourseSerializer.hidden_fields.keys()))
+
+
+class CourseSerializerHiddenFieldsTests(APITestCase):
+
+    fixtures = ['users', 'course1', 'course1_users']
+
+    def test_same_as_unpruned(self):
+        # The pruned representation must be the full representation
+        # minus the fields hidden from each role
+        course_obj = Course.objects.get(course_id="cmsc40100")
+        request = Request(APIRequestFactory().get("/"))
+        request.user = User.objects.get(username="student1")
+
+        for roles in ([CourseRoles.STUDENT], [CourseRoles.GRADER], [CourseRoles.INSTRUCTOR], [CourseRoles.ADMIN]):
+            roles = set(roles)
+            data = CourseSerializer(course_obj, context={"request": request, "course": course_obj, "roles": roles}).data
+            full = CourseSerializer(course_obj, context={"request": request}).data
+
+            expected = dict([(k, v) for k, v in full.items()
+                             if not (k in CourseSerializer.hidden_fields and roles.issubset(CourseSerializer.hidden_fields[k]))])
+            self.assertEqual(dict(data), expected)
@@ -4,7 +4,12 @@ from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
 from chisubmit.common.utils import get_datetime_now_utc
 from datetime import timedelta
-from chisubmit.backend.api.models import Assignment
+from chisubmit.backend.api.models import Assignment, Course, Student, Team,\
+    TeamMember, Registration, Submission, check_extensions_ledger
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import StringIO
+from unittest import mock
 
 class SubmitTests(APITestCase):
     
@@ -152,4 +157,194 @@ class SubmitWithExistingSubmissionsTests(APITestCase):
     fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 
                          'course1_pa1', 'course1_pa1_registrations_with_submissions']
         
-                
+    def test_resubmission_credits_extensions(self):
+        user = User.objects.get(username='student1')
+        self.client.force_authenticate(user=user)
+        
+        url = reverse('submit', args=["cmsc40100", "student1-student2", "pa1"])
+        
+        post_data = {
+                     "commit_sha": "COMMITSHATEST",
+                    }
+        response = self.client.post(url, data = post_data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["submission"]["extensions_used"], 0)
+        self.assertEqual(response.data["extensions_before"], 1)
+        self.assertEqual(response.data["extensions_after"], 2)
+        
+        registration_obj = Registration.objects.get(team__team_id = "student1-student2", assignment__assignment_id = "pa1")
+        self.assertEqual(registration_obj.final_submission.commit_sha, "COMMITSHATEST")
+        self.assertEqual(registration_obj.team.get_extensions_available(), 2)
+
+    def test_resubmission_grading_started(self):
+        user = User.objects.get(username='student1')
+        self.client.force_authenticate(user=user)
+        
+        Registration.objects.filter(team__team_id = "student1-student2").update(grading_started = True)
+        
+        url = reverse('submit', args=["cmsc40100", "student1-student2", "pa1"])
+        
+        post_data = {
+                     "commit_sha": "COMMITSHATEST",
+                    }
+        response = self.client.post(url, data = post_data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Submission.objects.filter(commit_sha = "COMMITSHATEST").count(), 0)
+
+
+class ExtensionsTests(APITestCase):
+    
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 
+                'course1_pa1', 'course1_pa2', 'course1_pa1_registrations_with_submissions']
+    
+    def setUp(self):
+        # A third team, with student1 and student3, that has used
+        # one extension in pa2
+        team_obj = Team.objects.create(course_id = 1, team_id = "student1-student3", extensions = 2)
+        TeamMember.objects.create(team = team_obj, student_id = 1, confirmed = True)
+        TeamMember.objects.create(team = team_obj, student_id = 3, confirmed = True)
+        registration_obj = Registration.objects.create(team = team_obj, assignment_id = 2)
+        submission_obj = Submission.objects.create(registration = registration_obj, extensions_used = 1,
+                                                   commit_sha = "COMMITSHA44444")
+        registration_obj.final_submission = submission_obj
+        registration_obj.save()
+        
+    def test_extensions_per_team(self):
+        for team_id, extensions_used in (("student1-student2", 1), ("student3-student4", 2), ("student1-student3", 1)):
+            team_obj = Team.objects.select_related("course").get(team_id = team_id)
+            with self.assertNumQueries(0):
+                self.assertEqual(team_obj.get_extensions_used(), extensions_used)
+                self.assertEqual(team_obj.get_extensions_available(), 2 - extensions_used)
+            
+    def test_extensions_per_student(self):
+        Course.objects.filter(course_id = "cmsc40100").update(extension_policy = Course.EXT_PER_STUDENT)
+        Student.objects.all().update(extensions = 3)
+        
+        # Extensions used in all of the student's teams
+        for student_id, extensions_used in ((1, 2), (2, 1), (3, 3), (4, 2)):
+            student_obj = Student.objects.get(pk = student_id)
+            with self.assertNumQueries(0):
+                self.assertEqual(student_obj.get_extensions_available(), 3 - extensions_used)
+        
+        # The extensions available to the student with the fewest extensions
+        for team_id, extensions_available in (("student1-student2", 1), ("student3-student4", 0), ("student1-student3", 0)):
+            team_obj = Team.objects.select_related("course").get(team_id = team_id)
+            with self.assertNumQueries(1):
+                self.assertEqual(team_obj.get_extensions_available(), extensions_available)
+
+    def assertLedger(self, teams, students):
+        self.assertEqual(dict(Team.objects.values_list("team_id", "extensions_used")), teams)
+        self.assertEqual(dict(Student.objects.values_list("pk", "extensions_used")), students)
+        self.assertEqual(check_extensions_ledger(), [])
+
+    def test_ledger_submit(self):
+        self.assertLedger({"student1-student2": 1, "student3-student4": 2, "student1-student3": 1},
+                          {1: 2, 2: 1, 3: 3, 4: 2})
+
+        # Resubmitting pa1 without using any extensions
+        user = User.objects.get(username='student1')
+        self.client.force_authenticate(user=user)
+        url = reverse('submit', args=["cmsc40100", "student1-student2", "pa1"])
+        response = self.client.post(url, data = {"commit_sha": "COMMITSHATEST"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertLedger({"student1-student2": 0, "student3-student4": 2, "student1-student3": 1},
+                          {1: 1, 2: 0, 3: 3, 4: 2})
+        
+    def test_ledger_not_overwritten_by_patch(self):
+        # The team and the student are loaded by a PATCH before a
+        # submission changes the ledger, and saved after it
+        team_obj = Team.objects.get(team_id = "student1-student2")
+        student_obj = Student.objects.get(pk = 1)
+        
+        self.client.force_authenticate(user=User.objects.get(username='student1'))
+        response = self.client.post(reverse('submit', args=["cmsc40100", "student1-student2", "pa1"]),
+                                    data = {"commit_sha": "COMMITSHATEST"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        self.client.force_authenticate(user=User.objects.get(username='instructor1'))
+        with mock.patch("chisubmit.backend.api.views.get_team", return_value = team_obj):
+            response = self.client.patch(reverse('team-detail', args=["cmsc40100", "student1-student2"]),
+                                         data = {"extensions": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with mock.patch("chisubmit.backend.api.views.get_course_person", return_value = student_obj):
+            response = self.client.patch(reverse('student-detail', args=["cmsc40100", "student1"]),
+                                         data = {"extensions": 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        self.assertLedger({"student1-student2": 0, "student3-student4": 2, "student1-student3": 1},
+                          {1: 1, 2: 0, 3: 3, 4: 2})
+        self.assertEqual(Team.objects.get(team_id = "student1-student2").extensions, 3)
+        self.assertEqual(Student.objects.get(pk = 1).extensions, 4)
+        
+    def test_ledger_cancel_and_edit_submission(self):
+        registration_obj = Registration.objects.get(team__team_id = "student3-student4")
+        submission_obj = registration_obj.final_submission
+        
+        submission_obj.extensions_used = 1
+        submission_obj.save()
+        self.assertLedger({"student1-student2": 1, "student3-student4": 1, "student1-student3": 1},
+                          {1: 2, 2: 1, 3: 2, 4: 1})
+        
+        registration_obj.final_submission = None
+        registration_obj.save()
+        self.assertLedger({"student1-student2": 1, "student3-student4": 0, "student1-student3": 1},
+                          {1: 2, 2: 1, 3: 1, 4: 0})
+
+    def test_ledger_delete_submission(self):
+        Submission.objects.get(commit_sha = "COMMITSHA44444").delete()
+        self.assertLedger({"student1-student2": 1, "student3-student4": 2, "student1-student3": 0},
+                          {1: 1, 2: 1, 3: 2, 4: 2})
+
+    def test_ledger_team_members(self):
+        TeamMember.objects.get(team__team_id = "student1-student3", student_id = 3).delete()
+        self.assertLedger({"student1-student2": 1, "student3-student4": 2, "student1-student3": 1},
+                          {1: 2, 2: 1, 3: 2, 4: 2})
+        
+        TeamMember.objects.create(team = Team.objects.get(team_id = "student1-student3"), student_id = 4)
+        self.assertLedger({"student1-student2": 1, "student3-student4": 2, "student1-student3": 1},
+                          {1: 2, 2: 1, 3: 2, 4: 3})
+        
+    def test_ledger_delete_team(self):
+        Team.objects.get(team_id = "student1-student2").delete()
+        self.assertLedger({"student3-student4": 2, "student1-student3": 1},
+                          {1: 1, 2: 0, 3: 3, 4: 2})
+
+    def test_ledger_delete_assignment(self):
+        Assignment.objects.get(assignment_id = "pa1").delete()
+        self.assertLedger({"student1-student2": 0, "student3-student4": 0, "student1-student3": 1},
+                          {1: 1, 2: 0, 3: 1, 4: 0})
+        
+    def test_check_extensions_ledger(self):
+        Team.objects.filter(team_id = "student3-student4").update(extensions_used = 0)
+        Student.objects.filter(pk = 1).update(extensions_used = 5)
+        
+        mismatches = check_extensions_ledger()
+        self.assertEqual([(obj.pk, extensions_used, actual) for obj, extensions_used, actual in mismatches],
+                         [(2, 0, 2), (1, 5, 2)])
+        self.assertIsInstance(mismatches[0][0], Team)
+        self.assertIsInstance(mismatches[1][0], Student)
+        self.assertEqual(len(check_extensions_ledger(courses = Course.objects.none())), 0)
+        
+        self.assertEqual(len(check_extensions_ledger(fix = True)), 2)
+        self.assertLedger({"student1-student2": 1, "student3-student4": 2, "student1-student3": 1},
+                          {1: 2, 2: 1, 3: 3, 4: 2})
+        
+    def test_check_extensions_command(self):
+        out = StringIO()
+        call_command("check_extensions", stdout = out)
+        self.assertIn("are correct", out.getvalue())
+        
+        Team.objects.filter(team_id = "student3-student4").update(extensions_used = 0)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("check_extensions", "--course", "cmsc40100", stdout = out)
+        self.assertIn("Team student3-student4 (cmsc40100): 0 extensions used, should be 2", out.getvalue())
+        
+        out = StringIO()
+        call_command("check_extensions", "--fix", stdout = out)
+        self.assertIn("Fixed 1 teams and students", out.getvalue())
+        self.assertEqual(check_extensions_ledger(), [])
+        
+        with self.assertRaises(CommandError):
+            call_command("check_extensions", "--course", "cmsc99999")
@@ -2,9 +2,14 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from pprint import pprint
-from chisubmit.backend.api.models import Course
+import json
+from chisubmit.backend.api.models import Course, Assignment, RubricComponent,\
+    Grader, Student, Team, TeamMember, Registration, Submission, Grade
+from chisubmit.common.utils import get_datetime_now_utc
 
 class TeamTests(APITestCase):
     
@@ -33,4 +38,329 @@ class TeamTests(APITestCase):
         url = reverse('team-list', args=["cmsc40100"])
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TeamPaginationTests(APITestCase):
+    
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 
+                'course1_pa1', 'course1_pa1_registrations', 'course1_pa2']
+    
+    def test_get_teams_unpaginated(self):
+        user = User.objects.get(username='admin')
+        self.client.force_authenticate(user=user)
+        
+        url = reverse('team-list', args=["cmsc40100"])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertFalse(response.has_header("Link"))
+
+    def test_get_teams_paginated(self):
+        user = User.objects.get(username='admin')
+        self.client.force_authenticate(user=user)
+        
+        url = reverse('team-list', args=["cmsc40100"])
+        response = self.client.get(url, {"page_size": 1, "include": "students"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([t["team_id"] for t in response.data], ["student1-student2"])
+        self.assertEqual(len(response.data[0]["students"]), 2)
+        
+        next_url = response.get("Link")
+        self.assertIn('rel="next"', next_url)
+        next_url = next_url[next_url.index("<")+1:next_url.index(">")]
+        self.assertIn("cursor=student1-student2", next_url)
+        self.assertIn("include=students", next_url)
+
+        response = self.client.get(next_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([t["team_id"] for t in response.data], ["student3-student4"])
+        self.assertEqual(len(response.data[0]["students"]), 2)
+        self.assertFalse(response.has_header("Link"))
+
+    def test_get_teams_invalid_page_size(self):
+        user = User.objects.get(username='admin')
+        self.client.force_authenticate(user=user)
+        
+        url = reverse('team-list', args=["cmsc40100"])
+        response = self.client.get(url, {"page_size": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("page_size", response.data)
+
+    def test_get_students_paginated(self):
+        user = User.objects.get(username='instructor1')
+        self.client.force_authenticate(user=user)
+        
+        url = reverse('student-list', args=["cmsc40100"])
+        response = self.client.get(url, {"page_size": 3, "cursor": "student1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([s["username"] for s in response.data], ["student2", "student3", "student4"])
+        self.assertFalse(response.has_header("Link"))
+
+    def test_get_registrations_paginated(self):
+        user = User.objects.get(username='instructor1')
+        self.client.force_authenticate(user=user)
+        
+        Registration.objects.create(team = Team.objects.get(team_id="student1-student2"),
+                                    assignment = Assignment.objects.get(assignment_id="pa2"))
+        
+        url = reverse('registration-list', args=["cmsc40100", "student1-student2"])
+        response = self.client.get(url, {"page_size": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["assignment_id"] for r in response.data], ["pa1"])
+        self.assertTrue(response.has_header("Link"))
+
+
+class TeamStreamingTests(APITestCase):
+    
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 
+                'course1_pa1', 'course1_pa1_registrations', 'course1_pa2']
+    
+    def test_get_teams_streaming(self):
+        user = User.objects.get(username='admin')
+        self.client.force_authenticate(user=user)
+        
+        url = reverse('team-list', args=["cmsc40100"])
+        include = ["students", "assignments__grades"]
+        
+        response = self.client.get(url, {"include": include})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        streaming_response = self.client.get(url, {"include": include, "stream": "true"})
+        self.assertEqual(streaming_response.status_code, status.HTTP_200_OK)
+        self.assertTrue(streaming_response.streaming)
+        
+        streamed_teams = json.loads(b"".join(streaming_response.streaming_content))
+        self.assertEqual(streamed_teams, sorted(json.loads(response.content), key=lambda t: t["team_id"]))
+        
+    def test_get_assignments_streaming(self):
+        user = User.objects.get(username='student1')
+        self.client.force_authenticate(user=user)
+        
+        url = reverse('assignment-list', args=["cmsc40100"])
+        
+        response = self.client.get(url, {"include": "rubric"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        streaming_response = self.client.get(url, {"include": "rubric", "stream": "true"})
+        self.assertEqual(streaming_response.status_code, status.HTTP_200_OK)
+        
+        streamed_assignments = json.loads(b"".join(streaming_response.streaming_content))
+        self.assertEqual(len(streamed_assignments), 2)
+        self.assertEqual(streamed_assignments, sorted(json.loads(response.content), key=lambda a: a["assignment_id"]))
+        self.assertEqual([rc["description"] for rc in streamed_assignments[0]["rubric"]], ["First Task", "Second Task"])
+
+
+class TeamBatchTests(APITestCase):
+
+    fixtures = ['users', 'course1', 'course1_users', 'course1_pa1']
+
+    def post(self, teams, username = "instructor1", dry_run = None, expected_status = status.HTTP_200_OK):
+        self.client.force_authenticate(user=User.objects.get(username=username))
+        url = reverse('team-batch', args=["cmsc40100"])
+
+        post_data = {"teams": teams}
+        if dry_run is not None:
+            post_data["dry_run"] = dry_run
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data = post_data, format="json")
+        self.num_queries = len(queries.captured_queries)
+        self.assertEqual(response.status_code, expected_status)
+        return response.data
+
+    def individual_teams(self, usernames, assignments = []):
+        return [{"team_id": u, "students": [u], "assignments": assignments} for u in usernames]
+
+    def test_create_teams(self):
+        data = self.post(self.individual_teams(["student1", "student2", "student3", "student4"], ["pa1"]))
+
+        self.assertEqual(data["created"], 4)
+        self.assertEqual([r["status"] for r in data["teams"]], ["created"] * 4)
+
+        for username in ["student1", "student2", "student3", "student4"]:
+            team = Team.objects.get(team_id = username)
+            self.assertEqual([tm.student.user.username for tm in team.get_team_members()], [username])
+            self.assertTrue(team.get_team_members()[0].confirmed)
+            self.assertEqual([r.assignment.assignment_id for r in team.get_registrations()], ["pa1"])
+
+    def test_constant_queries(self):
+        self.post(self.individual_teams(["student1"], ["pa1"]))
+        num_queries = self.num_queries
+
+        self.post(self.individual_teams(["student2", "student3", "student4"], ["pa1"]))
+        self.assertEqual(self.num_queries, num_queries)
+
+    def test_existing_teams(self):
+        self.post(self.individual_teams(["student1", "student2"]))
+        Team.objects.create(course = Course.objects.get(course_id = "cmsc40100"), team_id = "student3")
+
+        teams = self.individual_teams(["student1", "student2", "student3"])
+        teams[1]["assignments"] = ["pa1"]
+        teams[0]["extensions"] = 5
+        data = self.post(teams)
+
+        # Existing teams are completed and updated
+        self.assertEqual([r["status"] for r in data["teams"]], ["updated", "updated", "updated"])
+        self.assertEqual(Team.objects.get(team_id = "student1").extensions, 5)
+        self.assertEqual(Team.objects.get(team_id = "student2").get_registrations().count(), 1)
+        self.assertEqual(Team.objects.get(team_id = "student3").get_team_members().count(), 1)
+
+        data = self.post(teams)
+        self.assertEqual([r["status"] for r in data["teams"]], ["unchanged", "unchanged", "unchanged"])
+
+    def test_errors(self):
+        self.post([{"team_id": "student1-student2", "students": ["student1", "student2"], "assignments": ["pa1"]}])
+
+        teams = [{"team_id": "student3", "students": ["student3"], "assignments": ["pa1"]},
+                 {"team_id": "student1", "students": ["student1"], "assignments": ["pa1"]},
+                 {"team_id": "student1-student2", "students": ["student1"]},
+                 {"team_id": "student4", "students": ["student4", "student5"]},
+                 {"team_id": "student4-pa9", "students": ["student4"], "assignments": ["pa9"]},
+                 {"team_id": "student3", "students": ["student3"]}]
+        data = self.post(teams)
+
+        self.assertEqual(data["created"], 1)
+        self.assertEqual(data["error"], 5)
+        self.assertEqual(data["teams"][0], {"team_id": "student3", "status": "created"})
+        self.assertEqual(data["teams"][1]["errors"],
+                         ["'student1' is already registered for assignment 'pa1' in another team"])
+        self.assertEqual(data["teams"][2]["errors"],
+                         ["Team 'student1-student2' exists but it has these team members: student1, student2"])
+        self.assertEqual(data["teams"][3]["errors"],
+                         ["User 'student5' is either not a valid user or not a student in course 'cmsc40100'"])
+        self.assertEqual(data["teams"][4]["errors"],
+                         ["Assignment 'pa9' does not exist in course 'cmsc40100'"])
+        self.assertEqual(data["teams"][5]["errors"],
+                         ["Team 'student3' appears more than once in the batch"])
+
+        self.assertCountEqual([t.team_id for t in Team.objects.all()], ["student1-student2", "student3"])
+
+    def test_dry_run(self):
+        data = self.post(self.individual_teams(["student1", "student2"], ["pa1"]), dry_run = True)
+
+        self.assertTrue(data["dry_run"])
+        self.assertEqual(data["created"], 2)
+        self.assertEqual(Team.objects.count(), 0)
+
+    def test_students_cant_create_teams(self):
+        self.post(self.individual_teams(["student1"]), username = "student1",
+                  expected_status = status.HTTP_403_FORBIDDEN)
+
+
+class TeamListQueryTests(APITestCase):
+    
+    fixtures = ['users']
+    
+    NUM_TEAMS = 1000
+    
+    @classmethod
+    def setUpTestData(cls):
+        course = Course.objects.create(course_id="cmsc99999", name="Large Course")
+        assignment = Assignment.objects.create(course=course, assignment_id="pa1", name="PA1",
+                                               deadline=get_datetime_now_utc())
+        rcs = [RubricComponent.objects.create(assignment=assignment, order=i, description="Task %i" % i, points=50) 
+               for i in range(2)]
+        
+        grader_user = User.objects.create(username="largegrader")
+        grader = Grader.objects.create(course=course, user=grader_user)
+        
+        usernames = ["largestudent%i" % i for i in range(cls.NUM_TEAMS)]
+        User.objects.bulk_create([User(username=u) for u in usernames])
+        users = User.objects.filter(username__in=usernames)
+        Student.objects.bulk_create([Student(course=course, user=u) for u in users])
+        students = Student.objects.filter(course=course).select_related("user")
         
+        Team.objects.bulk_create([Team(course=course, team_id=s.user.username) for s in students])
+        teams = {t.team_id: t for t in Team.objects.filter(course=course)}
+        
+        TeamMember.objects.bulk_create([TeamMember(team=teams[s.user.username], student=s, confirmed=True) for s in students])
+        Registration.objects.bulk_create([Registration(team=t, assignment=assignment, grader=grader) for t in teams.values()])
+        registrations = list(Registration.objects.filter(team__course=course))
+        
+        Submission.objects.bulk_create([Submission(registration=r, extensions_used=0, commit_sha="COMMITSHA") for r in registrations])
+        submissions = {s.registration_id: s for s in Submission.objects.filter(registration__team__course=course)}
+        for r in registrations:
+            r.final_submission = submissions[r.pk]
+        Registration.objects.bulk_update(registrations, ["final_submission"])
+        
+        Grade.objects.bulk_create([Grade(registration=r, rubric_component=rc, points=25) for r in registrations for rc in rcs])
+    
+    def get_teams(self, num_queries, include = [], fields = None):
+        user = User.objects.get(username='admin')
+        self.client.force_authenticate(user=user)
+        
+        url = reverse('team-list', args=["cmsc99999"])
+        params = {"include": include}
+        if fields is not None:
+            params["fields"] = fields
+        with self.assertNumQueries(num_queries):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), self.NUM_TEAMS)
+        
+        return response.data
+    
+    def test_get_teams_num_queries(self):
+        self.get_teams(2)
+
+    def test_get_teams_include_students_num_queries(self):
+        teams = self.get_teams(3, include = ["students"])
+        
+        for team in teams:
+            self.assertEqual(len(team["students"]), 1)
+            self.assertEqual(team["students"][0]["username"], team["team_id"])
+
+    def test_get_teams_include_assignments_num_queries(self):
+        teams = self.get_teams(4, include = ["assignments"])
+        
+        for team in teams:
+            self.assertEqual(len(team["assignments"]), 1)
+            self.assertEqual(team["assignments"][0]["grader_username"], "largegrader")
+        
+    def test_get_teams_include_grades_num_queries(self):
+        teams = self.get_teams(6, include = ["students", "assignments__grades"])
+        
+        for team in teams:
+            self.assertEqual(len(team["students"]), 1)
+            self.assertEqual(len(team["assignments"]), 1)
+            self.assertEqual(len(team["assignments"][0]["grades"]), 2)
+            self.assertIsNotNone(team["assignments"][0]["final_submission"])
+
+    def test_get_teams_fields(self):
+        teams = self.get_teams(2, fields = "team_id,url")
+
+        for team in teams:
+            self.assertEqual(set(team.keys()), set(["team_id", "url"]))
+            self.assertTrue(team["url"].endswith("/teams/%s" % team["team_id"]))
+
+    def test_get_teams_fields_include_grades(self):
+        # The fields only apply to the teams, not to the included objects
+        full_teams = self.get_teams(6, include = ["students", "assignments__grades"])
+        teams = self.get_teams(6, include = ["students", "assignments__grades"], fields = "team_id")
+
+        for full_team, team in zip(full_teams, teams):
+            self.assertEqual(set(team.keys()), set(["team_id", "students", "assignments"]))
+            self.assertEqual(team["students"], full_team["students"])
+            self.assertEqual(team["assignments"], full_team["assignments"])
+
+    def test_get_teams_fields_deferred(self):
+        user = User.objects.get(username='admin')
+        self.client.force_authenticate(user=user)
+
+        url = reverse('team-list', args=["cmsc99999"])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"fields": "team_id"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0].keys()), set(["team_id"]))
+
+        # The unrequested columns are not fetched
+        teams_sql = queries.captured_queries[-1]["sql"]
+        self.assertIn('"team_id"', teams_sql)
+        self.assertNotIn('"extensions"', teams_sql)
+        self.assertNotIn('"active"', teams_sql)
+
+    def test_get_teams_unknown_fields(self):
+        teams = self.get_teams(2, fields = "team_id,nosuchfield")
+
+        for team in teams:
+            self.assertEqual(set(team.keys()), set(["team_id"]))
@@ -0,0 +1,70 @@
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.reverse import reverse as drf_reverse
+from rest_framework.test import APITestCase, APIRequestFactory
+from django.contrib.auth.models import User
+
+from chisubmit.backend.api.helpers import URLTemplates, get_url_templates
+
+class URLTemplatesTests(SimpleTestCase):
+
+    urls = [('course-detail', ["cmsc40100"]),
+            ('team-list', ["cmsc40100"]),
+            ('student-detail', ["cmsc40100", "student1"]),
+            ('rubric-detail', ["cmsc40100", "pa1", 42]),
+            ('teammember-detail', ["cmsc40100", "the-team_1", "student2"]),
+            ('submission-detail', ["cmsc40100", "team1", "pa1", 7]),
+            ('grade-detail', ["cmsc40100", "team1", "pa1", 3])]
+
+    def get_request(self, path = "/", **extra):
+        return Request(APIRequestFactory().get(path, **extra))
+
+    def assertSameURLs(self, request):
+        url_templates = URLTemplates(request)
+        for viewname, args in self.urls:
+            # Twice, so we test both building and using the template
+            for _ in range(2):
+                self.assertEqual(url_templates.reverse(viewname, args),
+                                 drf_reverse(viewname, args=args, request=request))
+
+    def test_same_urls(self):
+        self.assertSameURLs(self.get_request())
+
+    def test_same_urls_other_host(self):
+        self.assertSameURLs(self.get_request(SERVER_PORT="8080", secure=True))
+
+    def test_same_urls_format_override(self):
+        self.assertSameURLs(self.get_request("/?format=json"))
+
+    def test_templates_memoized_per_request(self):
+        request = self.get_request()
+        self.assertIs(get_url_templates(request), get_url_templates(request))
+        self.assertIsNot(get_url_templates(request), get_url_templates(self.get_request()))
+
+
+class SerializerURLTests(APITestCase):
+
+    fixtures = ['users', 'course1', 'course1_users', 'course1_teams', 'course1_pa1',
+                'course1_pa1_registrations_with_submissions', 'course1_pa1_grades']
+
+    def test_team_list_urls(self):
+        user = User.objects.get(username='instructor1')
+        self.client.force_authenticate(user=user)
+
+        url = reverse('team-list', args=["cmsc40100"])
+        response = self.client.get(url, {"include": ["students", "assignments__grades"]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(len(response.data), 0)
+
+        request = Request(APIRequestFactory().get(url))
+        for team in response.data:
+            team_id = team["team_id"]
+            self.assertEqual(team["url"], drf_reverse('team-detail', args=["cmsc40100", team_id], request=request))
+            self.assertEqual(team["students_url"], drf_reverse('teammember-list', args=["cmsc40100", team_id], request=request))
+            self.assertEqual(team["assignments_url"], drf_reverse('registration-list', args=["cmsc40100", team_id], request=request))
+            for registration in team["assignments"]:
+                assignment_id = registration["assignment_id"]
+                self.assertEqual(registration["url"], drf_reverse('registration-detail', args=["cmsc40100", team_id, assignment_id], request=request))
+                self.assertEqual(registration["grades_url"], drf_reverse('grade-list', args=["cmsc40100", team_id, assignment_id], request=request))